@@ -5,10 +5,15 @@ while leveraging our proven, reliable core functionality.
 """
 
 import logging
+import time
 from typing import Dict, Any, Optional
 from dataclasses import dataclass
 import json
 
+import deadline as deadlines
+import metrics
+from deadline import Deadline
+
 logger = logging.getLogger(__name__)
 
 @dataclass
@@ -36,10 +41,12 @@ class RadioQuestOrchestrator:
         self.conversation_history = []
         logger.info("RadioQuest ADK Orchestrator initialized with 4 specialized agents")
     
-    def process_request(self, request_type: str, **kwargs) -> Dict[str, Any]:
+    def process_request(self, request_type: str, deadline: Optional[Deadline] = None, **kwargs) -> Dict[str, Any]:
         """
-        Main orchestration method - routes requests to appropriate agent workflows
+        Main orchestration method - routes requests to appropriate agent workflows.
+        Every agent call shares `deadline` (the current request's by default).
         """
+        deadline = deadline or deadlines.current()
         request_id = f"req_{len(self.conversation_history)}"
         
         logger.info(f"Orchestrator processing {request_type} request (ID: {request_id})")
@@ -53,9 +60,9 @@ class RadioQuestOrchestrator:
         })
         
         if request_type == "story":
-            return self._orchestrate_story_workflow(request_id, kwargs.get("story_id"))
+            return self._orchestrate_story_workflow(request_id, kwargs.get("story_id"), deadline)
         elif request_type == "search":
-            return self._orchestrate_search_workflow(request_id, kwargs.get("query"))
+            return self._orchestrate_search_workflow(request_id, kwargs.get("query"), deadline)
         elif request_type == "health":
             return self._orchestrate_health_workflow(request_id)
         else:
@@ -65,7 +72,7 @@ class RadioQuestOrchestrator:
                 "error": f"Unknown request type: {request_type}"
             }
     
-    def _orchestrate_story_workflow(self, request_id: str, story_id: str) -> Dict[str, Any]:
+    def _orchestrate_story_workflow(self, request_id: str, story_id: str, deadline: Deadline) -> Dict[str, Any]:
         """
         Multi-agent workflow for story requests:
         1. Coordinator Agent validates request
@@ -76,56 +83,67 @@ class RadioQuestOrchestrator:
         workflow_steps = []
         
         # Step 1: Request validation
+        started = time.perf_counter()
         coord_validation = self.agents["coordinator"].validate_request("story", {"story_id": story_id})
-        workflow_steps.append({"agent": "coordinator", "action": "validate", "result": coord_validation.status})
+        self._record_step(workflow_steps, "coordinator", "validate", coord_validation.status, started)
         
         if coord_validation.status != "success":
             return self._build_workflow_response(request_id, "error", workflow_steps, error=coord_validation.error)
         
         # Step 2: Story content retrieval
-        story_response = self.agents["story"].fetch_story(story_id)
-        workflow_steps.append({"agent": "story", "action": "fetch", "result": story_response.status})
+        started = time.perf_counter()
+        story_response = self.agents["story"].fetch_story(story_id, deadline)
+        self._record_step(workflow_steps, "story", "fetch", story_response.status, started, deadline)
         
         if story_response.status != "success":
             return self._build_workflow_response(request_id, "error", workflow_steps, error=story_response.error)
         
         # Step 3: TTS metadata preparation (parallel agent processing)
+        started = time.perf_counter()
         tts_response = self.agents["tts"].prepare_metadata(story_response.data)
-        workflow_steps.append({"agent": "tts", "action": "prepare", "result": tts_response.status})
+        self._record_step(workflow_steps, "tts", "prepare", tts_response.status, started)
         
         # Step 4: Coordinator assembles final response
+        started = time.perf_counter()
         final_data = self.agents["coordinator"].assemble_story_response(
             story_response.data, 
             tts_response.data if tts_response.status == "success" else None
         )
-        workflow_steps.append({"agent": "coordinator", "action": "assemble", "result": "success"})
+        self._record_step(workflow_steps, "coordinator", "assemble", "success", started)
         
         return self._build_workflow_response(request_id, "success", workflow_steps, data=final_data.data)
     
-    def _orchestrate_search_workflow(self, request_id: str, query: str) -> Dict[str, Any]:
+    def _orchestrate_search_workflow(self, request_id: str, query: str, deadline: Deadline) -> Dict[str, Any]:
         """
         Multi-agent search workflow demonstrating agent collaboration
         """
         workflow_steps = []
         
         # Step 1: Query validation and preprocessing
+        started = time.perf_counter()
         coord_response = self.agents["coordinator"].validate_request("search", {"query": query})
-        workflow_steps.append({"agent": "coordinator", "action": "validate", "result": coord_response.status})
+        self._record_step(workflow_steps, "coordinator", "validate", coord_response.status, started)
         
         # Step 2: Search execution
-        search_response = self.agents["search"].execute_search(query)
-        workflow_steps.append({"agent": "search", "action": "search", "result": search_response.status})
+        started = time.perf_counter()
+        search_response = self.agents["search"].execute_search(query, deadline)
+        self._record_step(workflow_steps, "search", "search", search_response.status, started, deadline)
         
         # Step 3: Result enrichment by story agent
         if search_response.status == "success":
+            started = time.perf_counter()
             enriched_results = []
             for result in search_response.data.get("results", []):
-                story_meta = self.agents["story"].get_metadata(result["_id"])
+                if deadline.expired:
+                    # Out of budget: the remaining results go out without enrichment
+                    enriched_results.append({**result, "enrichment": None})
+                    continue
+                story_meta = self.agents["story"].get_metadata(result["_id"], deadline)
                 enriched_results.append({
                     **result,
                     "enrichment": story_meta.data if story_meta.status == "success" else None
                 })
-            workflow_steps.append({"agent": "story", "action": "enrich", "result": "success"})
+            self._record_step(workflow_steps, "story", "enrich", "success", started, deadline)
         
         # Step 4: Final assembly
         final_data = {
@@ -144,14 +162,26 @@ class RadioQuestOrchestrator:
         agent_health = {}
         
         for agent_name, agent in self.agents.items():
+            started = time.perf_counter()
             health_response = agent.health_check()
             agent_health[agent_name] = health_response.status
-            workflow_steps.append({"agent": agent_name, "action": "health_check", "result": health_response.status})
+            self._record_step(workflow_steps, agent_name, "health_check", health_response.status, started)
         
         overall_status = "success" if all(status == "success" for status in agent_health.values()) else "degraded"
         
         return self._build_workflow_response(request_id, overall_status, workflow_steps, data=agent_health)
     
+    def _record_step(self, workflow_steps: list, agent: str, action: str, status: str, started: float,
+                     deadline: Optional[Deadline] = None):
+        """Append a workflow step and observe its duration in the agent step histogram"""
+        elapsed = time.perf_counter() - started
+        metrics.AGENT_STEP_LATENCY.labels(agent, action, status).observe(elapsed)
+        step = {"agent": agent, "action": action, "result": status, "duration_ms": round(elapsed * 1000, 3)}
+        remaining = deadline.remaining() if deadline is not None else None
+        if remaining is not None:
+            step["budget_remaining_ms"] = round(remaining * 1000, 1)
+        workflow_steps.append(step)
+    
     def _build_workflow_response(self, request_id: str, status: str, workflow_steps: list, 
                                 data: Optional[Dict] = None, error: Optional[str] = None) -> Dict[str, Any]:
         """Standardized workflow response builder"""
@@ -215,14 +245,15 @@ class StoryAgent:
             self.stories_collection = None
             self.mock_stories = {}
     
-    def fetch_story(self, story_id: str) -> AgentResponse:
+    def fetch_story(self, story_id: str, deadline: Optional[Deadline] = None) -> AgentResponse:
         """Fetch story using our proven reliable approach"""
         try:
             story = None
             
             # Try MongoDB first
             if self.stories_collection is not None:
-                story = self.stories_collection.find_one({"_id": story_id})
+                with (deadline or deadlines.current()).mongo("fetch_story"), metrics.track_dependency("mongodb", "find_one"):
+                    story = self.stories_collection.find_one({"_id": story_id})
             
             # Fallback to mock data
             if not story and hasattr(self, 'mock_stories'):
@@ -236,9 +267,9 @@ class StoryAgent:
         except Exception as e:
             return AgentResponse(self.agent_id, "error", error=str(e))
     
-    def get_metadata(self, story_id: str) -> AgentResponse:
+    def get_metadata(self, story_id: str, deadline: Optional[Deadline] = None) -> AgentResponse:
         """Get story metadata for enrichment"""
-        story_response = self.fetch_story(story_id)
+        story_response = self.fetch_story(story_id, deadline)
         if story_response.status == "success":
             content = story_response.data.get("content", "")
             metadata = {
@@ -300,40 +331,40 @@ class SearchAgent:
     def __init__(self):
         self.agent_id = "search_agent"
         try:
-            from app import stories_collection, MOCK_SEARCH_RESULTS
+            from app import stories_collection, MOCK_SEARCH_RESULTS, search_cache, regex_search_page
             self.stories_collection = stories_collection
             self.mock_results = MOCK_SEARCH_RESULTS
+            self.search_cache = search_cache
+            self.search_page = regex_search_page
         except ImportError:
             self.stories_collection = None
             self.mock_results = []
+            self.search_cache = None
+            self.search_page = None
     
-    def execute_search(self, query: str) -> AgentResponse:
+    def execute_search(self, query: str, deadline: Optional[Deadline] = None) -> AgentResponse:
         """Execute search using our reliable approach"""
         try:
-            results = []
-            
-            # Try MongoDB search
-            if self.stories_collection is not None:
-                mongodb_results = list(self.stories_collection.find({
-                    "$or": [
-                        {"title": {"$regex": query, "$options": "i"}},
-                        {"content": {"$regex": query, "$options": "i"}}
-                    ]
-                }).limit(5))
-                
-                results = [{"_id": str(r["_id"]), "title": r["title"], "content": r.get("content", "")} 
-                          for r in mongodb_results]
-            
-            # Fallback to mock results
-            if not results and hasattr(self, 'mock_results'):
+            if self.search_cache is not None:
+                deadline = deadline or deadlines.current()
+                results = self.search_cache.get_or_search(query, "regex", 5,
+                                                          lambda normalized: self._search(normalized, deadline))["results"]
+            else:
                 results = [r for r in self.mock_results 
                           if query.lower() in r["title"].lower() or query.lower() in r["content"].lower()]
+            results = [{"_id": str(r["_id"]), "title": r["title"], "content": r.get("content", "")}
+                       for r in results]
             
             return AgentResponse(self.agent_id, "success", data={"results": results})
             
         except Exception as e:
             return AgentResponse(self.agent_id, "error", error=str(e))
     
+    def _search(self, query: str, deadline: Optional[Deadline] = None):
+        """First page of the shared regex search; returns (page, cacheable)"""
+        page, db_error = self.search_page(query, None, 5, deadline)
+        return page, db_error is None
+    
     def health_check(self) -> AgentResponse:
         search_status = "mongodb_available" if self.stories_collection is not None else "mock_only"
         return AgentResponse(self.agent_id, "success", data={"search_backend": search_status})
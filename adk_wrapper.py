@@ -8,8 +8,12 @@ import logging
 from typing import Dict, Any, Optional
 from dataclasses import dataclass
 
+import deadline as deadlines
+import metrics
+from deadline import Deadline
+
 # Core functionality imports (our reliable backend)
-from app import stories_collection, tts_client, MOCK_STORIES, MOCK_SEARCH_RESULTS
+from app import stories_collection, tts_client, MOCK_STORIES, search_cache, regex_search_page
 
 logger = logging.getLogger(__name__)
 
@@ -33,7 +37,7 @@ class ADKOrchestrator:
         self.search_agent = SearchAgent()
         logger.info("ADK Orchestrator initialized with 3 specialized agents")
     
-    def orchestrate_story_request(self, story_id: str) -> AgentResponse:
+    def orchestrate_story_request(self, story_id: str, deadline: Optional[Deadline] = None) -> AgentResponse:
         """
         Orchestrates a story request across multiple agents:
         1. Story Agent fetches content
@@ -42,8 +46,9 @@ class ADKOrchestrator:
         """
         logger.info(f"ADK Orchestrator: Processing story request for {story_id}")
         
-        # Agent collaboration workflow
-        story_response = self.story_agent.fetch_story(story_id)
+        # Agent collaboration workflow, every agent call inside the request's budget
+        deadline = deadline or deadlines.current()
+        story_response = self.story_agent.fetch_story(story_id, deadline)
         
         if story_response.status == "success" and story_response.data:
             # If story found, prepare TTS metadata
@@ -65,7 +70,7 @@ class ADKOrchestrator:
         
         return story_response
     
-    def orchestrate_search_request(self, query: str) -> AgentResponse:
+    def orchestrate_search_request(self, query: str, deadline: Optional[Deadline] = None) -> AgentResponse:
         """
         Orchestrates search across agents:
         1. Search Agent finds relevant stories
@@ -75,13 +80,18 @@ class ADKOrchestrator:
         logger.info(f"ADK Orchestrator: Processing search for '{query}'")
         
         # Multi-agent search workflow
-        search_response = self.search_agent.search_stories(query)
+        deadline = deadline or deadlines.current()
+        search_response = self.search_agent.search_stories(query, deadline)
         
         if search_response.status == "success" and search_response.data:
             # Enrich search results with story agent metadata
             enriched_results = []
             for result in search_response.data.get("results", []):
-                story_metadata = self.story_agent.get_story_metadata(result["_id"])
+                if deadline.expired:
+                    # Out of budget: send the remaining results without metadata
+                    enriched_results.append({**result, "metadata": None})
+                    continue
+                story_metadata = self.story_agent.get_story_metadata(result["_id"], deadline)
                 enriched_result = {
                     **result,
                     "metadata": story_metadata.data if story_metadata.status == "success" else None
@@ -110,13 +120,14 @@ class StoryAgent:
         self.agent_id = "story_agent"
         logger.info(f"Initialized {self.agent_id}")
     
-    def fetch_story(self, story_id: str) -> AgentResponse:
+    def fetch_story(self, story_id: str, deadline: Optional[Deadline] = None) -> AgentResponse:
         """Fetch story content using our reliable backend"""
         try:
             # Try MongoDB first, fallback to mock data (our proven approach)
             story = None
             if stories_collection is not None:
-                story = stories_collection.find_one({"_id": story_id})
+                with (deadline or deadlines.current()).mongo("fetch_story"), metrics.track_dependency("mongodb", "find_one"):
+                    story = stories_collection.find_one({"_id": story_id})
             
             if not story:
                 story = MOCK_STORIES.get(story_id)
@@ -142,9 +153,9 @@ class StoryAgent:
                 error=str(e)
             )
     
-    def get_story_metadata(self, story_id: str) -> AgentResponse:
+    def get_story_metadata(self, story_id: str, deadline: Optional[Deadline] = None) -> AgentResponse:
         """Get metadata for story enrichment"""
-        story_response = self.fetch_story(story_id)
+        story_response = self.fetch_story(story_id, deadline)
         if story_response.status == "success":
             metadata = {
                 "word_count": len(story_response.data.get("content", "").split()),
@@ -202,27 +213,15 @@ class SearchAgent:
         self.agent_id = "search_agent"
         logger.info(f"Initialized {self.agent_id}")
     
-    def search_stories(self, query: str) -> AgentResponse:
+    def search_stories(self, query: str, deadline: Optional[Deadline] = None) -> AgentResponse:
         """Search stories using our reliable backend approach"""
         try:
-            results = []
-            
-            # Try MongoDB search first
-            if stories_collection is not None:
-                mongodb_results = list(stories_collection.find({
-                    "$or": [
-                        {"title": {"$regex": query, "$options": "i"}},
-                        {"content": {"$regex": query, "$options": "i"}}
-                    ]
-                }).limit(10))
-                
-                results = [{"_id": str(r["_id"]), "title": r["title"], "content": r.get("content", "")} 
-                          for r in mongodb_results]
-            
-            # Fallback to mock data if no MongoDB results
-            if not results:
-                results = [r for r in MOCK_SEARCH_RESULTS 
-                          if query.lower() in r["title"].lower() or query.lower() in r["content"].lower()]
+            # Shares cache entries with /search, which runs the same query
+            deadline = deadline or deadlines.current()
+            results = search_cache.get_or_search(query, "regex", 10,
+                                                 lambda normalized: self._search(normalized, deadline))["results"]
+            results = [{"_id": str(r["_id"]), "title": r["title"], "content": r.get("content", "")}
+                       for r in results]
             
             return AgentResponse(
                 agent_id=self.agent_id,
@@ -237,6 +236,11 @@ class SearchAgent:
                 status="error",
                 error=str(e)
             )
+    
+    def _search(self, query: str, deadline: Optional[Deadline] = None):
+        """First page of the shared regex search; returns (page, cacheable)"""
+        page, db_error = regex_search_page(query, None, 10, deadline)
+        return page, db_error is None
 
 # Global orchestrator instance
 adk_orchestrator = ADKOrchestrator() 
\ No newline at end of file
@@ -0,0 +1,254 @@
+"""
+RadioQuest Admission - caps on paid TTS synthesis
+Every cache miss on /tts, /adk/tts or a story page costs a synthesize_speech
+call, so a crawler or a class refreshing the same page could run up both the
+bill and the request threads. A synthesis is only started when:
+
+  - the client's token bucket has a token (RADIOQUEST_TTS_CLIENT_RATE per second,
+    RADIOQUEST_TTS_CLIENT_BURST saved),
+  - the global bucket has one (RADIOQUEST_TTS_RATE / RADIOQUEST_TTS_BURST), and
+  - fewer than RADIOQUEST_TTS_MAX_IN_FLIGHT syntheses are running.
+
+Clients are keyed by address, and a classroom shares one NAT address: the
+per-client defaults let a class of 40 open a new segment together, and refill
+fast enough for it to keep moving through the story.
+
+The client check is charged once per request, however many audio sources its
+page needs; the global token and the slot belong to the synthesis itself
+(synthesis_slot()), so requests coalesced onto one synthesis only pay for it
+once. Cached audio never goes through admission.
+A shed synthesis raises Overloaded with a Retry-After hint; unless the client
+itself was over its rate, the work is handed to a small background queue so
+the audio exists when it comes back.
+"""
+
+import logging
+import math
+import os
+import queue
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Callable, Optional
+
+import metrics
+
+logger = logging.getLogger(__name__)
+
+
+class Overloaded(Exception):
+    """A synthesis that admission control refused; `reason` is client, global or busy"""
+
+    def __init__(self, reason: str, retry_after: float):
+        limit = {"client": "per-client rate", "global": "global rate", "busy": "concurrency"}.get(reason, reason)
+        super().__init__(f"TTS {limit} limit reached, retry in {retry_after:.1f}s")
+        self.reason = reason
+        self.retry_after = retry_after
+        self.queued = False
+
+    @property
+    def retry_after_header(self) -> str:
+        return str(max(1, math.ceil(self.retry_after)))
+
+
+class TokenBucket:
+    """`rate` tokens per second, at most `burst` saved; rate <= 0 never limits"""
+
+    def __init__(self, rate: float, burst: float, clock: Callable[[], float] = time.monotonic):
+        self.rate = rate
+        self.burst = max(1.0, burst)
+        self._clock = clock
+        self._tokens = self.burst
+        self._updated = clock()
+        self._lock = threading.Lock()
+
+    def take(self) -> float:
+        """0.0 when a token was taken, otherwise the seconds until one will be available"""
+        if self.rate <= 0:
+            return 0.0
+        with self._lock:
+            now = self._clock()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            if self._tokens >= 1.0:
+                self._tokens -= 1.0
+                return 0.0
+            return (1.0 - self._tokens) / self.rate
+
+    def give_back(self):
+        with self._lock:
+            self._tokens = min(self.burst, self._tokens + 1.0)
+
+
+class AdmissionController:
+    def __init__(self, rate: float = 2.0, burst: float = 10.0, client_rate: float = 1.0, client_burst: float = 60.0,
+                 max_in_flight: int = 4, slot_wait_s: float = 0.5, busy_retry_s: float = 2.0,
+                 max_clients: int = 4096, clock: Callable[[], float] = time.monotonic):
+        self.client_rate = client_rate
+        self.client_burst = client_burst
+        self.max_in_flight = max_in_flight
+        self.slot_wait_s = slot_wait_s
+        self.busy_retry_s = busy_retry_s
+        self.max_clients = max_clients
+        self._clock = clock
+        self._global = TokenBucket(rate, burst, clock)
+        self._clients: "OrderedDict[str, TokenBucket]" = OrderedDict()
+        self._clients_lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(max_in_flight)
+        self._in_flight = 0
+        self._in_flight_lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls) -> "AdmissionController":
+        return cls(
+            rate=float(os.environ.get("RADIOQUEST_TTS_RATE", "2")),
+            burst=float(os.environ.get("RADIOQUEST_TTS_BURST", "10")),
+            client_rate=float(os.environ.get("RADIOQUEST_TTS_CLIENT_RATE", "1")),
+            client_burst=float(os.environ.get("RADIOQUEST_TTS_CLIENT_BURST", "60")),
+            max_in_flight=int(os.environ.get("RADIOQUEST_TTS_MAX_IN_FLIGHT", "4")),
+            slot_wait_s=float(os.environ.get("RADIOQUEST_TTS_SLOT_WAIT_S", "0.5")),
+        )
+
+    @property
+    def in_flight(self) -> int:
+        return self._in_flight
+
+    def _client_bucket(self, client: str) -> TokenBucket:
+        # Least recently seen clients are forgotten first; a forgotten client starts with a full bucket
+        with self._clients_lock:
+            bucket = self._clients.pop(client, None)
+            if bucket is None:
+                bucket = TokenBucket(self.client_rate, self.client_burst, self._clock)
+                while len(self._clients) >= self.max_clients:
+                    self._clients.popitem(last=False)
+            self._clients[client] = bucket
+            return bucket
+
+    def check_client(self, client: str):
+        """Take one token from the client's own bucket, or raise Overloaded; charged per request"""
+        wait = self._client_bucket(client).take()
+        if wait:
+            metrics.ADMISSION.labels("tts", "shed_client").inc()
+            raise Overloaded("client", wait)
+
+    def refund_client(self, client: str):
+        """The client isn't to blame for everyone else's traffic"""
+        self._client_bucket(client).give_back()
+
+    def try_acquire_slot(self) -> bool:
+        """A free synthesis slot without waiting (e.g. for a hedged duplicate); release_slot() returns it"""
+        if not self._slots.acquire(blocking=False):
+            return False
+        with self._in_flight_lock:
+            self._in_flight += 1
+        return True
+
+    def release_slot(self):
+        with self._in_flight_lock:
+            self._in_flight -= 1
+        self._slots.release()
+
+    @contextmanager
+    def synthesis_slot(self, rate_limited: bool = True):
+        """
+        The synthesis' own share of admission: a global token and a slot held for the
+        block. Rate limited work waits at most slot_wait_s for the slot; background
+        work (rate_limited False) takes no token and waits for as long as it takes.
+        """
+        if rate_limited:
+            wait = self._global.take()
+            if wait:
+                metrics.ADMISSION.labels("tts", "shed_global").inc()
+                raise Overloaded("global", wait)
+        if not self._slots.acquire(timeout=self.slot_wait_s if rate_limited else None):
+            metrics.ADMISSION.labels("tts", "shed_busy").inc()
+            raise Overloaded("busy", self.busy_retry_s)
+        with self._in_flight_lock:
+            self._in_flight += 1
+        metrics.ADMISSION.labels("tts", "admitted").inc()
+        try:
+            yield
+        finally:
+            self.release_slot()
+
+    @contextmanager
+    def admit(self, client: Optional[str]):
+        """
+        check_client() and synthesis_slot() for one uncoalesced synthesis. Requests
+        (client set) are rate checked; background work (client None) is not.
+        """
+        if client is not None:
+            self.check_client(client)
+        try:
+            with self.synthesis_slot(rate_limited=client is not None):
+                yield
+        except Overloaded as e:
+            if client is not None and e.reason == "global":
+                self.refund_client(client)
+            raise
+
+
+class SynthesisQueue:
+    """
+    Bounded background queue for shed syntheses, one job per key. A single worker
+    thread runs them through the controller's slots, so queued work never takes
+    more than one slot away from live requests.
+    """
+
+    def __init__(self, controller: AdmissionController, maxsize: int = 32):
+        self.controller = controller
+        self._queue: "queue.Queue" = queue.Queue(maxsize=maxsize)
+        self._keys = set()
+        self._lock = threading.Lock()
+        self._worker: Optional[threading.Thread] = None
+
+    @classmethod
+    def from_env(cls, controller: AdmissionController) -> "SynthesisQueue":
+        return cls(controller, maxsize=int(os.environ.get("RADIOQUEST_TTS_QUEUE_SIZE", "32")))
+
+    @property
+    def pending(self) -> int:
+        return len(self._keys)
+
+    def submit(self, key: str, job: Callable[[], None]) -> bool:
+        """Queue job() unless it is already queued; False when the queue is full"""
+        with self._lock:
+            if key in self._keys:
+                return True
+            try:
+                self._queue.put_nowait((key, job))
+            except queue.Full:
+                return False
+            self._keys.add(key)
+            # Started on first use so each forked gunicorn worker gets its own thread
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(target=self._run, name="tts-queue", daemon=True)
+                self._worker.start()
+        metrics.ADMISSION.labels("tts", "queued").inc()
+        return True
+
+    def _run(self):
+        while True:
+            key, job = self._queue.get()
+            try:
+                with self.controller.admit(None):
+                    job()
+            except Exception as e:
+                logger.error(f"Queued synthesis for {key} failed: {e}")
+            finally:
+                with self._lock:
+                    self._keys.discard(key)
+
+
+def client_key(request, proxy_hops: Optional[int] = None) -> str:
+    """
+    The caller's address. Behind Cloud Run (or any proxy that appends to
+    X-Forwarded-For) the trustworthy entry is `proxy_hops` from the right;
+    anything further left is whatever the client chose to send.
+    """
+    hops = proxy_hops if proxy_hops is not None else int(os.environ.get("RADIOQUEST_PROXY_HOPS", "1"))
+    forwarded = [part.strip() for part in request.headers.get("X-Forwarded-For", "").split(",") if part.strip()]
+    if hops > 0 and forwarded:
+        return forwarded[-min(hops, len(forwarded))]
+    return request.remote_addr or "unknown"
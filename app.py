@@ -1,18 +1,45 @@
-from flask import Flask, render_template, request, abort, url_for, jsonify, redirect
+from flask import Flask, render_template, request, abort, url_for, jsonify, redirect, g, Response, send_from_directory, make_response, stream_with_context, has_request_context
 import logging
 import traceback
 import os
+import threading
+import time
 from pymongo import MongoClient
 from google.cloud import texttospeech
 import json
 from typing import Dict, Any, Optional
 from dataclasses import dataclass
 from flask_compress import Compress
+import metrics
+import profiling
+from caching import TTLCache, SingleFlight
+from fragment_cache import FragmentCache
+from search_cache import SearchCache, normalize_query
+import pagination
+from suggest import SuggestIndex
+from fuzzy_search import FuzzyIndex
+from versioning import content_hash, corpus_counter
+from assets import AssetManifest
+import audio_profiles
+import story_packs
+import service_worker
+import broadcast
+import deadline as deadlines
+import hedging
+import admission
+import episode_scheduler
+from deadline import DeadlineExceeded
+from functions import blob_store
 
 # --- Flask App Initialization ---
 app = Flask(__name__)
 Compress(app)
 
+# Content-hashed static assets built by cache_buster.py (falls back to /static/ URLs)
+asset_manifest = AssetManifest(os.path.join(app.static_folder, "dist"))
+app.jinja_env.globals["asset_url"] = asset_manifest.url
+app.jinja_env.globals["responsive_background"] = asset_manifest.responsive_background
+
 # --- Logging Configuration ---
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
@@ -167,52 +194,66 @@ class ADKOrchestrator:
     def __init__(self):
         self.workflow_steps = []
         
-    def add_workflow_step(self, agent_name, action, status, result=None, error=None):
-        """Add a step to the workflow for demo purposes"""
-        import time
+    def add_workflow_step(self, agent_name, action, status, result=None, error=None, deadline=None, timer=None):
+        """
+        Add a step to the workflow for demo purposes; `deadline` adds the request's
+        remaining budget, and `timer` (one StepTimer per workflow) the step's duration
+        """
         step = {
             "agent": agent_name,
             "action": action,
             "status": status,
             "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())
         }
+        elapsed = timer.mark(agent_name, action, status) if timer is not None else None
+        profiling.mark(agent_name, action, status)
+        if elapsed is not None:
+            step["duration_ms"] = round(elapsed * 1000, 3)
+        remaining = deadline.remaining() if deadline is not None else None
+        if remaining is not None:
+            step["budget_remaining_ms"] = round(remaining * 1000, 1)
         if result:
             step["result"] = result
         if error:
             step["error"] = error
         self.workflow_steps.append(step)
         
-    def orchestrate_story_fetch(self, story_id):
+    def orchestrate_story_fetch(self, story_id, deadline=None):
         """Orchestrate story fetching with enhanced agent-style workflow"""
         self.workflow_steps = []  # Reset workflow
+        deadline = deadline or deadlines.UNLIMITED
+        # Per call: the orchestrator is shared by every request thread
+        timer = metrics.StepTimer()
         
         # Step 1: Story Agent initialization
-        self.add_workflow_step("StoryAgent", "init", "started")
-        self.add_workflow_step("StoryAgent", "init", "success", {"agent_type": "content_fetcher", "target": story_id})
+        self.add_workflow_step("StoryAgent", "init", "started", deadline=deadline, timer=timer)
+        self.add_workflow_step("StoryAgent", "init", "success", {"agent_type": "content_fetcher", "target": story_id}, deadline=deadline, timer=timer)
         
         # Step 2: Database connection attempt
-        self.add_workflow_step("StoryAgent", "connect_db", "started")
+        self.add_workflow_step("StoryAgent", "connect_db", "started", deadline=deadline, timer=timer)
         
         try:
             # Try MongoDB first
             if stories_collection is not None:
                 try:
-                    self.add_workflow_step("StoryAgent", "connect_db", "success", {"source": "mongodb_atlas"})
-                    self.add_workflow_step("StoryAgent", "fetch_story", "started", {"query": {"_id": story_id}})
+                    self.add_workflow_step("StoryAgent", "connect_db", "success", {"source": "mongodb_atlas"}, deadline=deadline, timer=timer)
+                    self.add_workflow_step("StoryAgent", "fetch_story", "started", {"query": {"_id": story_id}}, deadline=deadline, timer=timer)
                     
-                    story = stories_collection.find_one({"_id": story_id})
+                    with deadline.mongo("fetch_story"), metrics.track_dependency("mongodb", "find_one"):
+                        story = stories_collection.find_one({"_id": story_id})
                     if story:
-                        self.add_workflow_step("StoryAgent", "fetch_story", "success", {"source": "mongodb", "title": story.get("title"), "content_length": len(story.get("content", ""))})
+                        self.add_workflow_step("StoryAgent", "fetch_story", "success", {"source": "mongodb", "title": story.get("title"), "content_length": len(story.get("content", ""))}, deadline=deadline, timer=timer)
                         return story
                     else:
-                        self.add_workflow_step("StoryAgent", "fetch_story", "not_found", {"message": "Story not found in database"})
+                        self.add_workflow_step("StoryAgent", "fetch_story", "not_found", {"message": "Story not found in database"}, deadline=deadline, timer=timer)
                 except Exception as e:
-                    self.add_workflow_step("StoryAgent", "fetch_story", "error", {"error_type": "database_auth", "message": str(e)})
+                    error_type = "deadline_exceeded" if deadlines.is_timeout(e) else "database_auth"
+                    self.add_workflow_step("StoryAgent", "fetch_story", "error", {"error_type": error_type, "message": str(e)}, deadline=deadline, timer=timer)
             else:
-                self.add_workflow_step("StoryAgent", "connect_db", "failed", {"reason": "mongodb_not_initialized"})
+                self.add_workflow_step("StoryAgent", "connect_db", "failed", {"reason": "mongodb_not_initialized"}, deadline=deadline, timer=timer)
             
             # Step 3: Fallback to mock data system
-            self.add_workflow_step("StoryAgent", "fallback_init", "started")
+            self.add_workflow_step("StoryAgent", "fallback_init", "started", deadline=deadline, timer=timer)
             story = MOCK_STORIES.get(story_id)
             if story:
                 self.add_workflow_step("StoryAgent", "fallback_fetch", "success", {
@@ -220,114 +261,145 @@ class ADKOrchestrator:
                     "title": story.get("title"), 
                     "content_length": len(story.get("content", "")),
                     "cultural_context": "goma_virunga"
-                })
-                self.add_workflow_step("StoryAgent", "complete", "success", {"final_source": "mock_data_fallback"})
+                }, deadline=deadline, timer=timer)
+                self.add_workflow_step("StoryAgent", "complete", "success", {"final_source": "mock_data_fallback"}, deadline=deadline, timer=timer)
                 return story
             else:
-                self.add_workflow_step("StoryAgent", "fallback_fetch", "error", {"message": "Story not found in mock data"})
-                self.add_workflow_step("StoryAgent", "complete", "failed")
+                self.add_workflow_step("StoryAgent", "fallback_fetch", "error", {"message": "Story not found in mock data"}, deadline=deadline, timer=timer)
+                self.add_workflow_step("StoryAgent", "complete", "failed", deadline=deadline, timer=timer)
                 raise ValueError(f"Story {story_id} not found")
                 
         except Exception as e:
-            self.add_workflow_step("StoryAgent", "complete", "error", {"final_error": str(e)})
+            self.add_workflow_step("StoryAgent", "complete", "error", {"final_error": str(e)}, deadline=deadline, timer=timer)
             raise
             
-    def orchestrate_search(self, query):
-        """Orchestrate search with enhanced agent-style workflow"""
+    def orchestrate_search(self, query, cursor=None, limit=pagination.DEFAULT_PAGE_SIZE, deadline=None):
+        """Orchestrate search with enhanced agent-style workflow; returns (results, next page's cursor)"""
         self.workflow_steps = []  # Reset workflow
+        deadline = deadline or deadlines.UNLIMITED
+        # Per call: the orchestrator is shared by every request thread
+        timer = metrics.StepTimer()
         
         # Step 1: Search Agent initialization
-        self.add_workflow_step("SearchAgent", "init", "started")
-        self.add_workflow_step("SearchAgent", "init", "success", {"agent_type": "query_processor", "query": query})
+        self.add_workflow_step("SearchAgent", "init", "started", deadline=deadline, timer=timer)
+        self.add_workflow_step("SearchAgent", "init", "success", {"agent_type": "query_processor", "query": query}, deadline=deadline, timer=timer)
         
         # Step 2: Query validation and preprocessing
-        self.add_workflow_step("SearchAgent", "validate_query", "started")
+        self.add_workflow_step("SearchAgent", "validate_query", "started", deadline=deadline, timer=timer)
         if len(query.strip()) < 2:
-            self.add_workflow_step("SearchAgent", "validate_query", "error", {"reason": "query_too_short"})
+            self.add_workflow_step("SearchAgent", "validate_query", "error", {"reason": "query_too_short"}, deadline=deadline, timer=timer)
             raise ValueError("Query too short")
-        self.add_workflow_step("SearchAgent", "validate_query", "success", {"processed_query": query.lower().strip()})
+        after = pagination.decode_cursor(cursor, query, "regex")
+        self.add_workflow_step("SearchAgent", "validate_query", "success", {"processed_query": query.lower().strip()}, deadline=deadline, timer=timer)
         
-        # Step 3: Database search attempt
-        self.add_workflow_step("SearchAgent", "execute_search", "started", {"target": "mongodb_atlas"})
+        # Repeated queries are answered from the shared search cache
+        searched = []
+        
+        def run_search(normalized):
+            searched.append(True)
+            return self._execute_search(normalized, after, limit, deadline, timer)
         
         try:
-            # Try MongoDB first
-            if stories_collection is not None:
-                try:
-                    self.add_workflow_step("SearchAgent", "db_connection", "success")
-                    results = list(stories_collection.find({
-                        "$or": [
-                            {"title": {"$regex": query, "$options": "i"}},
-                            {"content": {"$regex": query, "$options": "i"}}
-                        ]
-                    }).limit(10))
-                    
-                    if results:
-                        # Convert ObjectId to string
-                        for result in results:
-                            result['_id'] = str(result['_id'])
-                        self.add_workflow_step("SearchAgent", "execute_search", "success", {
-                            "source": "mongodb", 
-                            "results_count": len(results),
-                            "first_result": results[0].get("title") if results else None
-                        })
-                        self.add_workflow_step("SearchAgent", "complete", "success", {"final_source": "mongodb"})
-                        return results
-                    else:
-                        self.add_workflow_step("SearchAgent", "execute_search", "no_results", {"source": "mongodb"})
-                except Exception as e:
-                    self.add_workflow_step("SearchAgent", "execute_search", "error", {"error_type": "database_auth", "message": str(e)})
-            else:
-                self.add_workflow_step("SearchAgent", "db_connection", "failed", {"reason": "mongodb_not_initialized"})
-            
-            # Step 4: Fallback search in mock data
-            self.add_workflow_step("SearchAgent", "fallback_search", "started", {"target": "mock_data_system"})
-            results = [s for s in MOCK_SEARCH_RESULTS if query.lower() in s["title"].lower() or query.lower() in s["content"].lower()]
-            self.add_workflow_step("SearchAgent", "fallback_search", "success", {
-                "source": "mock_data", 
-                "results_count": len(results),
-                "cultural_context": "goma_themed_content"
-            })
-            self.add_workflow_step("SearchAgent", "complete", "success", {"final_source": "mock_data_fallback"})
-            return results
-            
+            page = cached_search_page(query, "regex", limit, after, run_search)
         except Exception as e:
-            self.add_workflow_step("SearchAgent", "complete", "error", {"final_error": str(e)})
+            self.add_workflow_step("SearchAgent", "complete", "error", {"final_error": str(e)}, deadline=deadline, timer=timer)
             raise
+        if not searched:
+            self.add_workflow_step("SearchAgent", "search_cache", "hit", {
+                "results_count": len(page["results"]),
+                "corpus_version": search_cache.corpus_version
+            }, deadline=deadline, timer=timer)
+            self.add_workflow_step("SearchAgent", "complete", "success", {"final_source": "search_cache"}, deadline=deadline, timer=timer)
+        return page["results"], page["next_cursor"]
+    
+    def _execute_search(self, query, after, limit, deadline, timer):
+        """Steps 3-4 of orchestrate_search; returns (page, cacheable)"""
+        # Step 3: Database search attempt
+        self.add_workflow_step("SearchAgent", "execute_search", "started", {"target": "mongodb_atlas"}, deadline=deadline, timer=timer)
+        if stories_collection is not None:
+            self.add_workflow_step("SearchAgent", "db_connection", "success", deadline=deadline, timer=timer)
+        else:
+            self.add_workflow_step("SearchAgent", "db_connection", "failed", {"reason": "mongodb_not_initialized"}, deadline=deadline, timer=timer)
+        
+        page, db_error = regex_search_page(query, after, limit, deadline)
+        results = page["results"]
+        if page["source"] == "mongodb":
+            self.add_workflow_step("SearchAgent", "execute_search", "success", {
+                "source": "mongodb", 
+                "results_count": len(results),
+                "first_result": results[0].get("title") if results else None
+            }, deadline=deadline, timer=timer)
+            self.add_workflow_step("SearchAgent", "complete", "success", {"final_source": "mongodb"}, deadline=deadline, timer=timer)
+            return page, True
+        if db_error:
+            error_type = "deadline_exceeded" if deadline.expired else "database_auth"
+            self.add_workflow_step("SearchAgent", "execute_search", "error", {"error_type": error_type, "message": db_error}, deadline=deadline, timer=timer)
+        elif stories_collection is not None:
+            self.add_workflow_step("SearchAgent", "execute_search", "no_results", {"source": "mongodb"}, deadline=deadline, timer=timer)
+        
+        # Step 4: Fallback search in mock data
+        self.add_workflow_step("SearchAgent", "fallback_search", "started", {"target": "mock_data_system"}, deadline=deadline, timer=timer)
+        self.add_workflow_step("SearchAgent", "fallback_search", "success", {
+            "source": "mock_data", 
+            "results_count": len(results),
+            "cultural_context": "goma_themed_content"
+        }, deadline=deadline, timer=timer)
+        self.add_workflow_step("SearchAgent", "complete", "success", {"final_source": "mock_data_fallback"}, deadline=deadline, timer=timer)
+        # Don't cache mock results that stand in for a failed database query
+        return page, db_error is None
             
-    def orchestrate_tts(self, story_content, story_id):
+    def orchestrate_tts(self, story_content, story_id, deadline=None):
         """Orchestrate TTS generation with enhanced agent-style workflow"""
+        deadline = deadline or deadlines.UNLIMITED
+        timer = metrics.StepTimer()
         # Step 1: TTS Agent initialization
-        self.add_workflow_step("TTSAgent", "init", "started")
-        self.add_workflow_step("TTSAgent", "init", "success", {"agent_type": "audio_generator", "target_story": story_id})
+        self.add_workflow_step("TTSAgent", "init", "started", deadline=deadline, timer=timer)
+        self.add_workflow_step("TTSAgent", "init", "success", {"agent_type": "audio_generator", "target_story": story_id}, deadline=deadline, timer=timer)
         
         # Step 2: Content preparation
-        self.add_workflow_step("TTSAgent", "prepare_content", "started")
+        self.add_workflow_step("TTSAgent", "prepare_content", "started", deadline=deadline, timer=timer)
         content_length = len(story_content)
         if content_length == 0:
-            self.add_workflow_step("TTSAgent", "prepare_content", "error", {"reason": "empty_content"})
+            self.add_workflow_step("TTSAgent", "prepare_content", "error", {"reason": "empty_content"}, deadline=deadline, timer=timer)
             raise ValueError("No content to synthesize")
         
         self.add_workflow_step("TTSAgent", "prepare_content", "success", {
             "content_length": content_length,
             "estimated_duration": f"{content_length // 10}s",
             "language_target": "en-NG"
-        })
+        }, deadline=deadline, timer=timer)
+        
+        # Identical narration is stored once under a content key; reuse it without calling TTS
+        profile = audio_profiles.PROFILES["hq"]
+        audio_key = audio_profiles.audio_filename(story_content, STORY_VOICE, profile)
+        if audio_store.exists(audio_key):
+            self.add_workflow_step("TTSAgent", "synthesize_audio", "cached", {"audio_key": audio_key}, deadline=deadline, timer=timer)
+            self.add_workflow_step("TTSAgent", "complete", "success", {"final_output": f"/audio/{audio_key}"}, deadline=deadline, timer=timer)
+            return f"/audio/{audio_key}"
         
         # Step 3: TTS service connection
-        self.add_workflow_step("TTSAgent", "connect_tts", "started")
+        self.add_workflow_step("TTSAgent", "connect_tts", "started", deadline=deadline, timer=timer)
         if tts_client is None:
-            self.add_workflow_step("TTSAgent", "connect_tts", "error", {"reason": "tts_client_not_initialized"})
-            self.add_workflow_step("TTSAgent", "complete", "failed")
+            self.add_workflow_step("TTSAgent", "connect_tts", "error", {"reason": "tts_client_not_initialized"}, deadline=deadline, timer=timer)
+            self.add_workflow_step("TTSAgent", "complete", "failed", deadline=deadline, timer=timer)
             raise ValueError("TTS client not initialized")
         
-        self.add_workflow_step("TTSAgent", "connect_tts", "success", {"service": "google_cloud_tts"})
+        self.add_workflow_step("TTSAgent", "connect_tts", "success", {"service": "google_cloud_tts"}, deadline=deadline, timer=timer)
+        
+        # Only start a synthesis that can finish inside the request's budget
+        try:
+            timeout = deadline.timeout(deadlines.TTS_TIMEOUT_S, deadlines.MIN_TTS_BUDGET_S, "synthesize_speech")
+        except DeadlineExceeded as e:
+            self.add_workflow_step("TTSAgent", "synthesize_audio", "skipped", {"reason": "deadline_exceeded", "message": str(e)}, deadline=deadline, timer=timer)
+            self.add_workflow_step("TTSAgent", "complete", "failed", deadline=deadline, timer=timer)
+            raise
         
         # Step 4: Audio synthesis
         self.add_workflow_step("TTSAgent", "synthesize_audio", "started", {
             "voice": "en-NG-Wavenet-A", 
-            "format": "MP3"
-        })
+            "format": "MP3",
+            "timeout_s": round(timeout, 3)
+        }, deadline=deadline, timer=timer)
         
         try:
             synthesis_input = texttospeech.SynthesisInput(text=story_content)
@@ -335,42 +407,249 @@ class ADKOrchestrator:
                 language_code="en-NG",
                 name="en-NG-Wavenet-A"
             )
-            audio_config = texttospeech.AudioConfig(
-                audio_encoding=texttospeech.AudioEncoding.MP3
-            )
+            audio_config = profile.audio_config()
             
-            response = tts_client.synthesize_speech(
-                input=synthesis_input,
-                voice=voice,
-                audio_config=audio_config
-            )
+            # Also run by the background queue when shed, so it must not touch this workflow
+            def synthesize_and_save(synthesis_timeout):
+                response = synthesize_hedged(audio_key, synthesis_timeout, input=synthesis_input,
+                                             voice=voice, audio_config=audio_config)
+                metrics.record_tts("en-NG-Wavenet-A", len(story_content), len(response.audio_content))
+                audio_store.put(audio_key, response.audio_content, profile.mimetype)
             
-            # Step 5: Audio file generation
-            self.add_workflow_step("TTSAgent", "synthesize_audio", "success", {"audio_bytes": len(response.audio_content)})
-            self.add_workflow_step("TTSAgent", "save_audio", "started")
+            render_audio(audio_key, synthesize_and_save, timeout)
             
-            audio_path = f"/tmp/{story_id}.mp3"
-            with open(audio_path, "wb") as out:
-                out.write(response.audio_content)
+            # Step 5: Audio file generation
+            self.add_workflow_step("TTSAgent", "synthesize_audio", "success", {"audio_bytes": audio_store.size(audio_key)}, deadline=deadline, timer=timer)
+            self.add_workflow_step("TTSAgent", "save_audio", "started", deadline=deadline, timer=timer)
                 
             self.add_workflow_step("TTSAgent", "save_audio", "success", {
-                "file_path": audio_path,
+                "audio_key": audio_key,
                 "cultural_voice": "nigerian_english"
-            })
-            self.add_workflow_step("TTSAgent", "complete", "success", {"final_output": audio_path})
-            return audio_path
+            }, deadline=deadline, timer=timer)
+            self.add_workflow_step("TTSAgent", "complete", "success", {"final_output": f"/audio/{audio_key}"}, deadline=deadline, timer=timer)
+            return f"/audio/{audio_key}"
             
+        except admission.Overloaded as e:
+            self.add_workflow_step("TTSAgent", "synthesize_audio", "shed", {
+                "reason": e.reason, "queued": e.queued, "retry_after_s": round(e.retry_after, 1)
+            }, deadline=deadline, timer=timer)
+            self.add_workflow_step("TTSAgent", "complete", "failed", deadline=deadline, timer=timer)
+            raise
         except Exception as e:
-            self.add_workflow_step("TTSAgent", "synthesize_audio", "error", {"error_type": "synthesis_failed", "message": str(e)})
-            self.add_workflow_step("TTSAgent", "complete", "failed")
+            error_type = "deadline_exceeded" if deadlines.is_timeout(e) else "synthesis_failed"
+            self.add_workflow_step("TTSAgent", "synthesize_audio", "error", {"error_type": error_type, "message": str(e)}, deadline=deadline, timer=timer)
+            self.add_workflow_step("TTSAgent", "complete", "failed", deadline=deadline, timer=timer)
             raise
 
 # Initialize orchestrator
 orchestrator = ADKOrchestrator()
 
+# --- Segment & Audio Read Paths ---
+# A classroom opening the same new segment produces a burst of identical misses;
+# the short-lived segment cache and single-flight groups turn that into one
+# MongoDB read and one TTS synthesis per segment.
+segment_cache = TTLCache(
+    maxsize=int(os.environ.get("RADIOQUEST_SEGMENT_CACHE_SIZE", "512")),
+    ttl=float(os.environ.get("RADIOQUEST_SEGMENT_CACHE_TTL", "30"))
+)
+segment_flight = SingleFlight()
+audio_flight = SingleFlight()
+# A synthesis still running at the observed p90 gets one duplicate (RADIOQUEST_TTS_HEDGING)
+tts_hedger = hedging.Hedger.from_env("tts")
+# Per-client and global token buckets plus an in-flight cap on paid synthesis;
+# shed misses are rendered later by one background worker
+tts_admission = admission.AdmissionController.from_env()
+tts_jobs = admission.SynthesisQueue.from_env(tts_admission)
+
+def _fetch_segment_from_db(story_id, deadline=None):
+    with (deadline or deadlines.UNLIMITED).mongo("find_one"), metrics.track_dependency("mongodb", "find_one"):
+        return stories_collection.find_one({"_id": story_id})
+
+def load_segment(story_id, deadline=None):
+    """Fetch a story segment: segment cache -> MongoDB (coalesced) -> mock data"""
+    segment = segment_cache.get(story_id)
+    metrics.record_cache("segment", segment is not None)
+    if segment is None:
+        try:
+            if stories_collection is not None:
+                # Followers wait no longer than their own budget, and retry with it if the leader's ran out
+                segment, shared = segment_flight.do(story_id, lambda: _fetch_segment_from_db(story_id, deadline),
+                                                    timeout=(deadline or deadlines.UNLIMITED).remaining(),
+                                                    rerun_if=deadlines.is_timeout)
+                if shared:
+                    metrics.COALESCED_CALLS.labels("segment").inc()
+                if segment:
+                    logger.info(f"Found story in MongoDB: {segment.get('title', 'Unknown')}")
+                    segment_cache.set(story_id, segment)
+        except Exception as db_error:
+            logger.warning(f"MongoDB error, using mock data: {db_error}")
+    if not segment:
+        segment = MOCK_STORIES.get(story_id)
+    # Callers annotate the segment (e.g. audio_url), so hand out a copy of the cached dict
+    return dict(segment) if segment else None
+
+# --- Search Cache ---
+def corpus_version():
+    """
+    Changes whenever a search result could: the corpus_meta counter writers bump,
+    or (for a database no writer has bumped yet) a hash of every searchable field.
+    """
+    if stories_collection is None:
+        return "mock"
+    deadline = deadlines.current()
+    with deadline.mongo("corpus_version"), metrics.track_dependency("mongodb", "find_one"):
+        counter = corpus_counter(stories_collection)
+    if counter is not None:
+        return f"counter-{counter}"
+    with deadline.mongo("corpus_version"), metrics.track_dependency("mongodb", "find"):
+        documents = list(stories_collection.find({}, {"title": 1, "content": 1, "text": 1}).sort("_id", 1))
+    return content_hash([[str(d.get("_id")), d.get("title"), d.get("content"), d.get("text")] for d in documents])
+
+search_cache = SearchCache(
+    maxsize=int(os.environ.get("RADIOQUEST_SEARCH_CACHE_SIZE", "256")),
+    ttl=float(os.environ.get("RADIOQUEST_SEARCH_CACHE_TTL", "300")),
+    version_fn=corpus_version,
+    check_interval=float(os.environ.get("RADIOQUEST_SEARCH_VERSION_CHECK", "60"))
+)
+
+def regex_search_hits(query, after=None, limit=None, state=None, deadline=None):
+    """
+    Regex hits in rank order, lazily from MongoDB, or from the mock data when MongoDB
+    has none, fails or runs out of `deadline`. `state` receives the source and any database error.
+    """
+    state = {} if state is None else state
+    found = False
+    if stories_collection is not None:
+        try:
+            with (deadline or deadlines.UNLIMITED).mongo("search"):
+                hits = pagination.iter_regex_hits(stories_collection, query, after, limit)
+                with metrics.track_dependency("mongodb", "find"):
+                    first = next(hits, None)
+                if first is not None:
+                    found = True
+                    state["source"] = "mongodb"
+                    yield first
+                    yield from hits
+        except Exception as db_error:
+            if found:
+                # Hits were already sent; mock data can't stand in for the rest
+                raise
+            state["error"] = str(db_error)
+            logger.warning(f"MongoDB search error, using mock data: {db_error}")
+    if not found:
+        state["source"] = "mock_data"
+        yield from pagination.iter_list_hits(MOCK_SEARCH_RESULTS, query, after)
+
+def regex_search_page(query, after=None, limit=pagination.DEFAULT_PAGE_SIZE, deadline=None):
+    """One page of regex search: ({"results", "next_cursor", "source"}, database error or None)"""
+    state = {}
+    hits = regex_search_hits(query, after, limit + 1, state, deadline)
+    try:
+        results, next_cursor = pagination.take_page(hits, limit, query, "regex")
+    finally:
+        # Leaves the deadline's pymongo.timeout() block now, not whenever the generator is collected
+        hits.close()
+    # Convert ObjectId to string for JSON serialization
+    for result in results:
+        result['_id'] = str(result['_id'])
+    return {"results": results, "next_cursor": next_cursor, "source": state.get("source")}, state.get("error")
+
+def cached_search_page(query, mode, limit, after, search_fn):
+    """First pages go through the search cache; pages after a cursor are fetched directly"""
+    if after is None:
+        return search_cache.get_or_search(query, mode, limit, search_fn)
+    return search_fn(normalize_query(query))[0]
+
+# In-memory indexes over a corpus snapshot, re-synced when the search corpus version changes:
+# the typeahead trie and the typo-tolerant (SymSpell-style) fuzzy index
+suggest_index = SuggestIndex()
+fuzzy_index = FuzzyIndex()
+
+def corpus_segments(deadline=None):
+    """
+    Snapshot of the searchable fields of every segment (mock stories without MongoDB).
+    Running out of `deadline` raises rather than passing the mock stories off as the corpus.
+    """
+    if stories_collection is not None:
+        try:
+            with (deadline or deadlines.UNLIMITED).mongo("corpus_segments"), metrics.track_dependency("mongodb", "find"):
+                return list(stories_collection.find({}, {"title": 1, "content": 1, "text": 1}))
+        except Exception as e:
+            if deadlines.is_timeout(e):
+                raise
+            logger.warning(f"Could not snapshot segments for suggestions, using mock data: {e}")
+    return list(MOCK_STORIES.values())
+
+_index_sync_locks = {id(suggest_index): threading.Lock(), id(fuzzy_index): threading.Lock()}
+
+def refresh_corpus_index(index):
+    version = search_cache.current_version()
+    if version == index.version:
+        return
+    # The first build blocks (for at most the request's budget); later rebuilds happen
+    # in one request while others use the old index
+    lock = _index_sync_locks[id(index)]
+    if index.version is None:
+        remaining = deadlines.current().remaining()
+        acquired = lock.acquire(timeout=-1 if remaining is None else remaining)
+    else:
+        acquired = lock.acquire(blocking=False)
+    if acquired:
+        try:
+            if version != index.version:
+                index.sync(corpus_segments(deadlines.current()), version)
+        except Exception as e:
+            if not deadlines.is_timeout(e):
+                raise
+            logger.warning(f"Rebuilding the index for corpus {version} ran out of budget, keeping {index.version}: {e}")
+        finally:
+            lock.release()
+
+# Manifests of exported offline packs, needed to build delta packs
+pack_store = story_packs.PackStore(os.environ.get("RADIOQUEST_PACK_DIR", "/tmp/radioquest-packs"))
+
+# Story pages: static body rendered once per segment version, votes/recap stitched in per request
+story_renderer = FragmentCache(
+    app.jinja_env,
+    render_template,
+    maxsize=int(os.environ.get("RADIOQUEST_FRAGMENT_CACHE_SIZE", "256"))
+)
+
+# Rendered narration, keyed by a hash of text + voice + profile (local disk or a GCS bucket)
+audio_store = blob_store.from_env()
+
 # Vote tracking storage (in production, this would be in MongoDB)
 vote_storage = {}
 
+# On-demand request profiler (disabled unless RADIOQUEST_PROFILE_RATE or _SECRET is set)
+request_profiler = profiling.RequestProfiler.from_env()
+
+# --- Request Metrics & Profiling ---
+
+@app.before_request
+def start_request_timer():
+    g.request_start = time.perf_counter()
+    # Every downstream call in this request takes its timeout from the same budget
+    g.deadline = deadlines.Deadline.from_ms()
+    g.profile = request_profiler.start(request.path, request.headers.get(profiling.PROFILE_HEADER))
+
+@app.after_request
+def remember_response_status(response):
+    g.response_status = response.status_code
+    return response
+
+@app.teardown_request
+def record_request_metrics(exc):
+    # Teardown runs after every after_request hook, so Flask-Compress time is included
+    start = g.pop('request_start', None)
+    if start is not None:
+        route = request.url_rule.rule if request.url_rule else "unmatched"
+        status = g.pop('response_status', 500)
+        metrics.REQUEST_LATENCY.labels(route, request.method, status).observe(time.perf_counter() - start)
+    active_profile = g.pop('profile', None)
+    if active_profile is not None:
+        request_profiler.finish(active_profile, request.url_rule.rule if request.url_rule else request.path)
+
 # --- Routes ---
 
 @app.route('/')
@@ -456,29 +735,20 @@ def story(story_id):
     logger.info(f"Fetching story for story_id: '{story_id}'")
     
     try:
-        # Try MongoDB first, fallback to enhanced mock data
-        segment = None
-        try:
-            if stories_collection is not None:
-                segment = stories_collection.find_one({"_id": story_id})
-                if segment:
-                    logger.info(f"Found story in MongoDB: {segment.get('title', 'Unknown')}")
-        except Exception as db_error:
-            logger.warning(f"MongoDB error, using mock data: {db_error}")
-        
-        if not segment:
-            logger.info(f"Using mock data for story: {story_id}")
-            segment = MOCK_STORIES.get(story_id)
+        # Segment cache, then MongoDB, then enhanced mock data
+        segment = load_segment(story_id, g.deadline)
         
         if segment:
             logger.info(f"Found story segment: {segment.get('title', 'Unknown')}")
             
-            # Generate audio if not present
+            # Generate audio if not present, in the profile the client's connection calls for.
+            # Out of budget, the page goes out without it and offers the on-demand TTS button.
             if not segment.get('audio_url'):
                 logger.info(f"Generating audio for story: {story_id}")
-                audio_success = generate_audio_for_story(segment)
-                if audio_success:
-                    segment['audio_url'] = f"/audio/{story_id}.mp3"
+                audio_sources = story_audio_sources(segment, audio_profiles.select_profile(request), g.deadline)
+                if audio_sources:
+                    segment['audio_url'] = audio_sources[0]['url']
+                    segment['audio_sources'] = audio_sources
             
             # Get vote results for this story's choices
             vote_results = {}
@@ -494,11 +764,11 @@ def story(story_id):
                 previous_story = "In our last adventure, you helped Koko make an important decision in the Congo rainforest."
                 # In a real app, this would come from user session/database
             
-            return render_template('story.html', 
-                                 segment=segment, 
-                                 vote_results=vote_results,
-                                 previous_story=previous_story,
-                                 last_choice=last_choice)
+            response = make_response(story_renderer.render(segment,
+                                                           vote_results=vote_results,
+                                                           previous_story=previous_story,
+                                                           last_choice=last_choice))
+            return audio_profiles.add_client_hint_headers(response)
         else:
             logger.warning(f"Story not found: {story_id}")
             abort(404)
@@ -512,65 +782,80 @@ def story(story_id):
 def search():
     """
     Handles story search requests.
-    Simple MongoDB text search with mock fallback!
+    Simple MongoDB text search with mock fallback! ?mode=fuzzy tolerates misspellings.
     """
     query = request.args.get('q', '')
     if not query:
         return jsonify({"error": "Please provide a search query"}), 400
+    mode = request.args.get('mode', 'regex')
+    if mode not in ("regex", "fuzzy"):
+        return jsonify({"error": "mode must be 'regex' or 'fuzzy'"}), 400
+    # ?format=ndjson streams one hit per line as they are found, then {"next_cursor": ...}
+    streaming = request.args.get('format') == 'ndjson'
+    limit = pagination.page_size(request.args.get('limit', type=int),
+                                 pagination.MAX_STREAM_SIZE if streaming else pagination.MAX_PAGE_SIZE)
+    try:
+        after = pagination.decode_cursor(request.args.get('cursor'), query, mode)
+    except pagination.InvalidCursor as e:
+        return jsonify({"error": str(e)}), 400
 
-    logger.info(f"Searching for: '{query}'")
+    logger.info(f"Searching for: '{query}' ({mode})")
+    
+    def run_fuzzy(query):
+        found = fuzzy_index.search(query, limit + 1, after)
+        hits = ((pagination.fuzzy_position(result), result) for result in found["results"])
+        results, next_cursor = pagination.take_page(hits, limit, query, "fuzzy")
+        return {"results": results, "next_cursor": next_cursor, "corrections": found["corrections"]}, True
+    
+    def run_search(query):
+        page, db_error = regex_search_page(query, after, limit, g.deadline)
+        return page, db_error is None
     
     try:
-        results = []
-        # Try MongoDB search, fallback to mock results
-        try:
-            if stories_collection is not None:
-                results = list(stories_collection.find({
-                    "$or": [
-                        {"title": {"$regex": query, "$options": "i"}},
-                        {"content": {"$regex": query, "$options": "i"}}
-                    ]
-                }).limit(10))
-                
-                if results:
-                    logger.info(f"Found {len(results)} results in MongoDB")
-        except Exception as db_error:
-            logger.warning(f"MongoDB search error, using mock data: {db_error}")
-        
-        if not results:
-            logger.info(f"Using mock search results for '{query}'")
-            results = [r for r in MOCK_SEARCH_RESULTS if query.lower() in r["title"].lower() or query.lower() in r["content"].lower()]
-        
-        # Convert ObjectId to string for JSON serialization
-        for result in results:
-            if '_id' in result:
-                result['_id'] = str(result['_id'])
+        if mode == "fuzzy":
+            refresh_corpus_index(fuzzy_index)
+        if streaming:
+            normalized = normalize_query(query)
+            if mode == "fuzzy":
+                hits = ((pagination.fuzzy_position(result), result)
+                        for result in fuzzy_index.search(normalized, limit + 1, after)["results"])
+            else:
+                hits = regex_search_hits(normalized, after, limit + 1, deadline=g.deadline)
+            return Response(stream_with_context(pagination.ndjson_lines(hits, limit, normalized, mode)),
+                            mimetype="application/x-ndjson")
         
-        logger.info(f"Found {len(results)} search results")
-        return jsonify({"results": results})
+        page = cached_search_page(query, mode, limit, after, run_fuzzy if mode == "fuzzy" else run_search)
+        logger.info(f"Found {len(page['results'])} search results")
+        return jsonify(dict(page, mode=mode))
         
     except Exception as e:
         logger.error(f"Error in search: {e}")
         return jsonify({"error": str(e)}), 500
 
+@app.route('/suggest')
+def suggest():
+    """Typeahead suggestions (titles and terms) for a partial query"""
+    query = request.args.get('q', '')
+    limit = max(1, min(request.args.get('limit', 8, type=int), 20))
+    refresh_corpus_index(suggest_index)
+    response = jsonify({"query": query, "suggestions": suggest_index.suggest(query, limit)})
+    response.headers["Cache-Control"] = "public, max-age=60"
+    return response
+
 @app.route('/tts/<story_id>')
 def generate_tts(story_id):
     """Generate Nigerian English TTS for a story segment"""
     try:
         # Get the story content
-        segment = None
-        try:
-            if stories_collection is not None:
-                segment = stories_collection.find_one({"_id": story_id})
-        except Exception as db_error:
-            logger.warning(f"MongoDB error, using mock data: {db_error}")
-        
-        if not segment:
-            segment = MOCK_STORIES.get(story_id)
+        segment = load_segment(story_id, g.deadline)
         
         if not segment:
             return jsonify({"error": "Story not found"}), 404
         
+        # Content-addressed output in the profile picked from ?profile= or client hints
+        profile = audio_profiles.select_profile(request)
+        audio_filename = audio_profiles.audio_filename(segment['content'], "en-NG-Standard-A", profile)
+        
         # Generate Nigerian English TTS
         if tts_client is not None:
             try:
@@ -581,30 +866,44 @@ def generate_tts(story_id):
                     name="en-NG-Standard-A",  # Nigerian female voice
                     ssml_gender=texttospeech.SsmlVoiceGender.FEMALE
                 )
-                audio_config = texttospeech.AudioConfig(
-                    audio_encoding=texttospeech.AudioEncoding.MP3
-                )
+                audio_config = profile.audio_config()
                 
-                response = tts_client.synthesize_speech(
-                    input=synthesis_input, 
-                    voice=voice, 
-                    audio_config=audio_config
-                )
+                def synthesize_and_save(timeout):
+                    response = synthesize_hedged(audio_filename, timeout, input=synthesis_input,
+                                                 voice=voice, audio_config=audio_config)
+                    metrics.record_tts("en-NG-Standard-A", len(segment['content']), len(response.audio_content))
+                    audio_store.put(audio_filename, response.audio_content, profile.mimetype)
                 
-                # Save audio file
-                audio_path = f"/tmp/{story_id}.mp3"
-                with open(audio_path, "wb") as out:
-                    out.write(response.audio_content)
+                # Identical narration is only ever synthesized once
+                cached = audio_store.exists(audio_filename)
+                metrics.record_cache("audio_file", cached)
+                if not cached:
+                    timeout = g.deadline.timeout(deadlines.TTS_TIMEOUT_S, deadlines.MIN_TTS_BUDGET_S, "synthesize_speech")
+                    try:
+                        render_audio(audio_filename, synthesize_and_save, timeout)
+                    except admission.Overloaded as e:
+                        logger.warning(f"TTS for {story_id} shed ({e.reason}): {e}")
+                        return tts_shed_response(e, f"/audio/{audio_filename}", voice="en-NG-Standard-A (Nigerian English)")
                 
-                logger.info(f"Nigerian TTS audio generated for {story_id}")
-                return jsonify({
+                logger.info(f"Nigerian TTS audio generated for {story_id} ({profile.name})")
+                response = jsonify({
                     "status": "success",
-                    "audio_url": f"/audio/{story_id}.mp3",
+                    "audio_url": f"/audio/{audio_filename}",
+                    "audio_type": profile.source_type,
+                    "profile": profile.name,
                     "voice": "en-NG-Standard-A (Nigerian English)",
                     "message": "Nigerian English TTS generated successfully"
                 })
+                return audio_profiles.add_client_hint_headers(response)
                 
             except Exception as tts_error:
+                if deadlines.is_timeout(tts_error):
+                    logger.warning(f"TTS for {story_id} ran out of request budget: {tts_error}")
+                    return jsonify({
+                        "status": "timeout",
+                        "error": str(tts_error),
+                        "fallback": "Narration is taking too long, please try again"
+                    }), 504
                 logger.error(f"TTS generation failed: {tts_error}")
                 return jsonify({
                     "status": "error",
@@ -616,24 +915,147 @@ def generate_tts(story_id):
                 "status": "demo",
                 "message": "TTS client not initialized - this would generate Nigerian English audio",
                 "voice": "en-NG-Standard-A (Nigerian English)",
-                "demo_url": f"/audio/{story_id}.mp3"
+                "demo_url": f"/audio/{audio_filename}"
             })
             
     except Exception as e:
         logger.error(f"Error in TTS endpoint: {e}")
         return jsonify({"error": str(e)}), 500
 
+@app.route('/assets/<path:filename>')
+def serve_asset(filename):
+    """Serves fingerprinted static assets with immutable caching and precompressed variants"""
+    return asset_manifest.serve(filename)
+
 @app.route('/audio/<audio_id>')
 def serve_audio(audio_id):
-    """Serves generated audio files"""
-    import os
-    from flask import send_file
+    """
+    Serves generated audio files. /audio/<story_id> (no extension) renders the
+    segment's narration in the profile picked from ?profile= or client hints.
+    """
+    if audio_store.exists(audio_id):
+        metrics.record_cache("audio_file", True)
+        return audio_store.serve(audio_id, audio_profiles.mimetype_for(audio_id))
     
-    audio_path = f"/tmp/{audio_id}"
-    if os.path.exists(audio_path):
-        return send_file(audio_path, mimetype='audio/mpeg')
-    else:
+    if '.' not in audio_id:
+        segment = load_segment(audio_id, g.deadline)
+        if segment:
+            profile = audio_profiles.select_profile(request)
+            try:
+                audio_url = render_story_audio(segment, profile, g.deadline)
+            except admission.Overloaded as e:
+                logger.warning(f"Audio for {audio_id} shed ({e.reason}): {e}")
+                return tts_shed_response(e, f"/audio/{story_audio_filename(segment, profile)}")
+            except Exception as e:
+                if deadlines.is_timeout(e):
+                    logger.warning(f"Audio for {audio_id} ran out of request budget: {e}")
+                    return jsonify({
+                        "status": "timeout",
+                        "error": str(e),
+                        "fallback": "Narration is taking too long, please try again"
+                    }), 504
+                logger.error(f"Audio for {audio_id} failed: {e}")
+                audio_url = None
+            if audio_url:
+                response = audio_store.serve(audio_url.rsplit('/', 1)[-1], profile.mimetype)
+                return audio_profiles.add_client_hint_headers(response)
+    
+    metrics.record_cache("audio_file", False)
+    abort(404)
+
+@app.route('/segments/<story_id>.json')
+def segment_json(story_id):
+    """A story segment as JSON (offline clients and the service worker cache these)"""
+    segment = load_segment(story_id, g.deadline)
+    if not segment:
+        return jsonify({"error": "Story not found"}), 404
+    segment['children'] = service_worker.child_ids(segment)
+    return Response(json.dumps(segment, default=str), mimetype='application/json')
+
+@app.route('/prefetch/<story_id>.json')
+def prefetch_children(story_id):
+    """URLs the service worker caches after a story page loads: each child's page, JSON and audio"""
+    segment = load_segment(story_id, g.deadline)
+    if not segment:
+        return jsonify({"error": "Story not found"}), 404
+    profile = audio_profiles.select_profile(request)
+    urls = []
+    for child_id in service_worker.child_ids(segment):
+        child = load_segment(child_id, g.deadline)
+        if not child:
+            continue
+        urls += [f"/story/{child_id}", f"/segments/{child_id}.json"]
+        # Only the preferred source: fallbacks are fetched on demand by browsers that need them.
+        # Once the budget can't fit another synthesis, only already rendered audio is listed
+        audio_url = child.get('audio_url') or generate_audio_for_story(child, profile, g.deadline)
+        if audio_url:
+            urls.append(audio_url)
+    return jsonify({"story_id": story_id, "urls": urls})
+
+@app.route('/sw.js')
+def service_worker_script():
+    """Service worker, generated so the precache list tracks the current asset fingerprints"""
+    precache_urls = service_worker.shell_urls(asset_manifest.url)
+    script = render_template('sw.js',
+                             cache_version=service_worker.cache_version(precache_urls),
+                             precache_urls=precache_urls,
+                             runtime_cache_limit=service_worker.RUNTIME_CACHE_LIMIT)
+    response = Response(script, mimetype='application/javascript')
+    # Browsers must see a new precache list promptly
+    response.headers["Cache-Control"] = "no-cache"
+    return response
+
+@app.route('/manifest.webmanifest')
+def web_manifest():
+    return Response(json.dumps(service_worker.WEB_MANIFEST), mimetype='application/manifest+json')
+
+@app.route('/broadcast')
+def broadcast_stream():
+    """Continuous audio/mpeg stream of the broadcast schedule, shared by every listener"""
+    listener = broadcast_station.connect()
+    if listener is None:
+        return jsonify({"error": "Broadcast is full, try again shortly"}), 503, {"Retry-After": "30"}
+    logger.info(f"Broadcast listener connected ({broadcast_station.listeners} listening)")
+    response = Response(listener, mimetype='audio/mpeg')
+    response.headers["Cache-Control"] = "no-cache, no-store"
+    response.headers["X-Accel-Buffering"] = "no"
+    response.headers["icy-name"] = "RadioQuest"
+    return response
+
+@app.route('/broadcast/status')
+def broadcast_status():
+    return jsonify(dict(broadcast_station.status(), schedule=BROADCAST_SCHEDULE or f"votes from {BROADCAST_ROOT}"))
+
+@app.route('/packs/<story_id>.zip')
+def story_pack(story_id):
+    """
+    Streams an offline pack: every segment reachable from story_id plus its cached
+    audio. ?since=<pack version> returns only what changed since that pack.
+    """
+    manifest, segments, audio_key_for = prepare_story_pack(
+        story_id,
+        since=request.args.get('since'),
+        profile_name=audio_profiles.select_profile(request).name,
+        max_depth=request.args.get('depth', story_packs.DEFAULT_MAX_DEPTH, type=int),
+        deadline=g.deadline
+    )
+    if not segments:
         abort(404)
+    
+    pack_version = manifest['pack_version']
+    # A ?since= delta is a different body from the full pack at the same version
+    etag = content_hash({"pack": pack_version, "since": request.args.get('since'), "profile": manifest['profile']})
+    if request.if_none_match.contains(etag):
+        return audio_profiles.add_client_hint_headers(Response(status=304, headers={"ETag": f'"{etag}"'}))
+    
+    logger.info(f"Streaming pack {pack_version} for {story_id}: "
+                f"{len(manifest['included'])}/{len(manifest['segments'])} segments")
+    response = Response(stream_with_context(story_packs.stream_pack(manifest, segments, audio_key_for, audio_store)),
+                        mimetype='application/zip')
+    response.headers["Content-Disposition"] = f'attachment; filename="{story_id}-{pack_version}.zip"'
+    response.headers["ETag"] = f'"{etag}"'
+    response.headers["X-RadioQuest-Pack-Version"] = pack_version
+    return audio_profiles.add_client_hint_headers(response)
 
 @app.route('/health')
 def health_check():
@@ -643,7 +1065,8 @@ def health_check():
         mongodb_status = "disconnected"
         if stories_collection is not None:
             try:
-                stories_collection.find_one()
+                with g.deadline.mongo("ping"), metrics.track_dependency("mongodb", "ping"):
+                    stories_collection.find_one()
                 mongodb_status = "connected"
             except Exception:
                 mongodb_status = "error"
@@ -651,16 +1074,45 @@ def health_check():
         # Test TTS client
         tts_status = "initialized" if tts_client is not None else "not_initialized"
         
+        # Not ready while an episode about to drop (or just dropped) is still being warmed
+        ready = episodes.ready
         return jsonify({
-            "status": "healthy",
+            "status": "healthy" if ready else "warming",
             "mongodb": mongodb_status,
             "tts": tts_status,
             "mock_data_available": True,
+            "search_cache": search_cache.stats(),
+            "episodes": episodes.status(),
             "timestamp": "2025-06-23T12:30:00Z"
-        }), 200
+        }), 200 if ready else 503
     except Exception as e:
         return jsonify({"status": "error", "error": str(e)}), 500
 
+@app.route('/metrics')
+def metrics_endpoint():
+    """Prometheus scrape endpoint"""
+    return Response(metrics.REGISTRY.render(), mimetype=metrics.CONTENT_TYPE)
+
+@app.route('/admin/profiles')
+def list_profiles():
+    """List captured request profiles (requires the profiling admin token)"""
+    if not request_profiler.is_admin(request.headers.get(profiling.ADMIN_TOKEN_HEADER) or request.args.get('token')):
+        abort(404)
+    return jsonify({
+        "mode": request_profiler.mode,
+        "rate": request_profiler.rate,
+        "profiles": request_profiler.list_profiles()
+    })
+
+@app.route('/admin/profiles/<path:filename>')
+def download_profile(filename):
+    """Download a .pstats, .collapsed or .steps.json profile file"""
+    if not request_profiler.is_admin(request.headers.get(profiling.ADMIN_TOKEN_HEADER) or request.args.get('token')):
+        abort(404)
+    if not filename.endswith(profiling.PROFILE_EXTENSIONS):
+        abort(404)
+    return send_from_directory(request_profiler.output_dir, filename, as_attachment=True)
+
 # --- ADK Demo Endpoints ---
 
 @app.route('/adk-demo')
@@ -690,7 +1142,7 @@ def adk_story_demo(story_id):
     logger.info(f"ADK: Fetching story with id: {story_id}")
     
     try:
-        story = orchestrator.orchestrate_story_fetch(story_id)
+        story = orchestrator.orchestrate_story_fetch(story_id, g.deadline)
         return jsonify({
             "status": "success",
             "adk_orchestration": True,
@@ -719,13 +1171,22 @@ def adk_search_demo():
     logger.info(f"ADK: Searching stories with query: {query}")
     
     try:
-        results = orchestrator.orchestrate_search(query)
+        limit = pagination.page_size(request.args.get('limit', type=int))
+        results, next_cursor = orchestrator.orchestrate_search(query, cursor=request.args.get('cursor'), limit=limit,
+                                                               deadline=g.deadline)
         return jsonify({
             "status": "success",
             "adk_orchestration": True,
             "results": results,
+            "next_cursor": next_cursor,
             "workflow": orchestrator.workflow_steps
         }), 200
+    except pagination.InvalidCursor as e:
+        return jsonify({
+            "status": "error",
+            "adk_orchestration": True,
+            "error": str(e)
+        }), 400
     except Exception as e:
         return jsonify({
             "status": "error",
@@ -741,62 +1202,278 @@ def adk_tts_demo(story_id):
     
     try:
         # First get the story content
-        story = orchestrator.orchestrate_story_fetch(story_id)
+        story = orchestrator.orchestrate_story_fetch(story_id, g.deadline)
         content = story.get("content", "")
         
-        # Then generate TTS
-        audio_path = orchestrator.orchestrate_tts(content, story_id)
+        # Then generate TTS with whatever budget the fetch left
+        audio_url = orchestrator.orchestrate_tts(content, story_id, g.deadline)
         
         return jsonify({
             "status": "success",
             "adk_orchestration": True,
-            "audio_url": f"/audio/{story_id}.mp3",
+            "audio_url": audio_url,
             "workflow": orchestrator.workflow_steps
         }), 200
+    except admission.Overloaded as e:
+        audio_key = audio_profiles.audio_filename(content, STORY_VOICE, audio_profiles.PROFILES["hq"])
+        return tts_shed_response(e, f"/audio/{audio_key}", adk_orchestration=True,
+                                 workflow=orchestrator.workflow_steps)
     except Exception as e:
+        timed_out = deadlines.is_timeout(e)
         return jsonify({
-            "status": "error",
+            "status": "timeout" if timed_out else "error",
             "adk_orchestration": True,
             "error": str(e),
             "workflow": orchestrator.workflow_steps
-        }), 500
+        }), 504 if timed_out else 500
+
+STORY_VOICE = "en-NG-Wavenet-A"
+
+def synthesize_hedged(audio_key, timeout, **request):
+    """
+    tts_client.synthesize_speech, duplicated once if it runs past the hedge delay.
+    No duplicate is sent once audio_key has been rendered by another worker.
+    """
+    def attempt(attempt_timeout):
+        with metrics.track_dependency("tts", "synthesize_speech"):
+            return tts_client.synthesize_speech(timeout=attempt_timeout, **request)
+    return tts_hedger.call(attempt, timeout, should_hedge=lambda: not audio_store.exists(audio_key),
+                           slots=tts_admission)
 
-def generate_audio_for_story(segment):
-    """Generate TTS audio for a story segment"""
+def render_audio(audio_key, synthesize, timeout):
+    """
+    synthesize(timeout) once per concurrent burst for audio_key, inside TTS admission
+    control. Each request is charged once against its own client's rate, however
+    many sources its page needs; the synthesis takes the global token and slot once,
+    for every request coalesced onto it. A shed call raises admission.Overloaded;
+    unless the client was over its own rate, the synthesis is first queued for the
+    background worker (e.queued).
+    """
+    client = admission.client_key(request) if has_request_context() else None
+    charged = False
+    if client is not None and not g.get("tts_client_charged"):
+        tts_admission.check_client(client)
+        g.tts_client_charged = charged = True
+    
+    def admitted():
+        try:
+            with tts_admission.synthesis_slot(rate_limited=client is not None):
+                synthesize(timeout)
+        except admission.Overloaded as e:
+            # Queued once, by the leader; coalesced callers share this exception
+            e.queued = tts_jobs.submit(audio_key, lambda: _render_queued(audio_key, synthesize))
+            raise
+    
     try:
-        if tts_client is None:
-            logger.warning("TTS client not initialized")
-            return False
-            
-        content = segment.get('content', '')
-        story_id = segment.get('_id', 'unknown')
-        
-        synthesis_input = texttospeech.SynthesisInput(text=content)
-        voice = texttospeech.VoiceSelectionParams(
-            language_code="en-NG",
-            name="en-NG-Wavenet-A"
-        )
-        audio_config = texttospeech.AudioConfig(
-            audio_encoding=texttospeech.AudioEncoding.MP3
-        )
-        
-        response = tts_client.synthesize_speech(
-            input=synthesis_input,
-            voice=voice,
-            audio_config=audio_config
-        )
-        
-        # Save the audio
-        audio_path = f"/tmp/{story_id}.mp3"
-        with open(audio_path, "wb") as out:
-            out.write(response.audio_content)
-        
-        logger.info(f"Generated audio: {audio_path}")
-        return True
-        
+        _, shared = audio_flight.do(audio_key, admitted, timeout=timeout, rerun_if=deadlines.is_timeout)
+    except admission.Overloaded as e:
+        if charged and e.reason == "global":
+            tts_admission.refund_client(client)
+            g.tts_client_charged = False
+        raise
+    if shared:
+        metrics.COALESCED_CALLS.labels("audio").inc()
+
+def _render_queued(audio_key, synthesize):
+    # A later request may have rendered it while the job waited; a flight that was
+    # shed (possibly the one that queued this job) is not an answer for the queue
+    if not audio_store.exists(audio_key):
+        audio_flight.do(audio_key, lambda: synthesize(deadlines.TTS_TIMEOUT_S),
+                        rerun_if=lambda e: isinstance(e, admission.Overloaded))
+
+def tts_shed_response(error, audio_url, **fields):
+    """202 with the future audio URL when the synthesis was queued, 429 otherwise; both with Retry-After"""
+    body = dict(fields, status="queued" if error.queued else "rate_limited", message=str(error),
+                retry_after=error.retry_after_header)
+    if error.queued:
+        body["audio_url"] = audio_url
+    return jsonify(body), 202 if error.queued else 429, {"Retry-After": error.retry_after_header}
+
+def _synthesize_story_audio(content, profile, audio_key, timeout=None):
+    synthesis_input = texttospeech.SynthesisInput(text=content)
+    voice = texttospeech.VoiceSelectionParams(
+        language_code="en-NG",
+        name=STORY_VOICE
+    )
+    audio_config = profile.audio_config()
+    
+    response = synthesize_hedged(audio_key, timeout, input=synthesis_input,
+                                 voice=voice, audio_config=audio_config)
+    metrics.record_tts(STORY_VOICE, len(content), len(response.audio_content))
+    
+    # Save the audio
+    audio_store.put(audio_key, response.audio_content, profile.mimetype)
+    logger.info(f"Generated audio: {audio_key}")
+
+def story_audio_filename(segment, profile):
+    return audio_profiles.audio_filename(segment.get('content', ''), STORY_VOICE, profile)
+
+def render_story_audio(segment, profile=None, deadline=None):
+    """
+    The /audio/ URL of a segment's narration in one profile, synthesizing it unless
+    it is already stored; None without a TTS client. Raises admission.Overloaded,
+    DeadlineExceeded (too little of `deadline` left to start) and synthesis errors.
+    """
+    if tts_client is None:
+        logger.warning("TTS client not initialized")
+        return None
+    
+    profile = profile or audio_profiles.get_profile(None)
+    content = segment.get('content', '')
+    filename = story_audio_filename(segment, profile)
+    cached = audio_store.exists(filename)
+    metrics.record_cache("audio_file", cached)
+    if cached:
+        return f"/audio/{filename}"
+    
+    timeout = (deadline or deadlines.UNLIMITED).timeout(deadlines.TTS_TIMEOUT_S, deadlines.MIN_TTS_BUDGET_S,
+                                                        "synthesize_speech")
+    # N simultaneous misses for the same segment cause exactly one synthesis
+    render_audio(filename, lambda synthesis_timeout: _synthesize_story_audio(content, profile, filename,
+                                                                              synthesis_timeout), timeout)
+    return f"/audio/{filename}"
+
+def generate_audio_for_story(segment, profile=None, deadline=None):
+    """
+    Generate TTS audio for a story segment in one profile, reusing audio already
+    on disk. Returns the /audio/ URL, or None when no audio could be produced
+    (including when `deadline` leaves too little time to synthesize it).
+    """
+    try:
+        return render_story_audio(segment, profile, deadline)
+    except admission.Overloaded as e:
+        # The page goes out without audio; a queued job renders it for the next visit
+        logger.warning(f"Skipping audio for {segment.get('_id')}: {e}{' (queued)' if e.queued else ''}")
+        return None
     except Exception as e:
+        if deadlines.is_timeout(e):
+            logger.warning(f"Skipping audio for {segment.get('_id')}, out of request budget: {e}")
+            return None
         logger.error(f"Error generating TTS: {e}")
-        return False
+        return None
+
+def story_audio_sources(segment, profile, deadline=None):
+    """<audio> sources for a segment: the chosen profile, then its fallbacks"""
+    sources = []
+    for source_profile in audio_profiles.fallback_chain(profile):
+        audio_url = generate_audio_for_story(segment, source_profile, deadline)
+        if audio_url:
+            sources.append({"url": audio_url, "type": source_profile.source_type})
+    return sources
+
+def prepare_story_pack(root_id, since=None, profile_name=None, max_depth=story_packs.DEFAULT_MAX_DEPTH,
+                       render_audio=False, deadline=None):
+    """
+    Walk the branch and build the pack manifest; returns (manifest, segments, audio_key_for).
+    Every segment read and synthesis shares `deadline`.
+    """
+    profile = audio_profiles.get_profile(profile_name)
+    
+    def audio_key_for(segment):
+        audio_key = story_audio_filename(segment, profile)
+        if render_audio and not audio_store.exists(audio_key):
+            generate_audio_for_story(segment, profile, deadline)
+        return audio_key if audio_store.exists(audio_key) else None
+    
+    segments = story_packs.walk_story_graph(lambda story_id: load_segment(story_id, deadline), root_id, max_depth)
+    if not segments:
+        return None, [], audio_key_for
+    base = pack_store.get(since) if since else None
+    if since and base is None:
+        logger.info(f"Unknown pack version {since}; sending a full pack")
+    manifest = story_packs.build_manifest(segments, root_id, profile.name, audio_key_for, audio_store, base=base)
+    # Deltas are computed against the segment list, so store every pack as if it were full
+    pack_store.save(dict(manifest, base_version=None, included=list(manifest['segments']), included_audio=[],
+                         removed=[]))
+    return manifest, segments, audio_key_for
+
+# --- Broadcast ---
+# An explicit comma-separated episode path, or (when unset) the vote-winning branch from BROADCAST_ROOT
+BROADCAST_SCHEDULE = [s.strip() for s in os.environ.get("RADIOQUEST_BROADCAST_SCHEDULE", "").split(",") if s.strip()]
+BROADCAST_ROOT = os.environ.get("RADIOQUEST_BROADCAST_ROOT", "intro")
+# One MP3 profile for the whole stream, so the sample rate never changes mid-broadcast
+BROADCAST_PROFILE = audio_profiles.get_profile(os.environ.get("RADIOQUEST_BROADCAST_PROFILE", "hq"))
+if BROADCAST_PROFILE.encoding != "MP3":
+    logger.warning(f"Broadcast needs an MP3 profile, not {BROADCAST_PROFILE.name}; using hq")
+    BROADCAST_PROFILE = audio_profiles.PROFILES["hq"]
+
+def broadcast_next_segment(previous_id):
+    """Next segment on air; None once the episode is over (the station then starts again)"""
+    if BROADCAST_SCHEDULE:
+        if previous_id is None:
+            return BROADCAST_SCHEDULE[0]
+        position = BROADCAST_SCHEDULE.index(previous_id) + 1 if previous_id in BROADCAST_SCHEDULE else 0
+        return BROADCAST_SCHEDULE[position] if position < len(BROADCAST_SCHEDULE) else None
+    if previous_id is None:
+        return BROADCAST_ROOT
+    segment = load_segment(previous_id)
+    choices = [story_packs.choice_target(c) for c in (segment or {}).get('choices') or []]
+    choices = [c for c in choices if c]
+    if not choices:
+        return None
+    # Most votes wins; max() keeps the first listed choice on ties
+    return max(choices, key=lambda c: vote_storage.get(f"{previous_id}_{c}", 0))
+
+def broadcast_audio(segment_id):
+    """MP3 bytes for a segment in the broadcast profile, rendering them if needed"""
+    segment = load_segment(segment_id)
+    if not segment:
+        return None
+    audio_url = generate_audio_for_story(segment, BROADCAST_PROFILE)
+    if not audio_url:
+        return None
+    return audio_store.get(audio_url.rsplit('/', 1)[-1])
+
+broadcast_station = broadcast.BroadcastStation(
+    broadcast_next_segment,
+    broadcast_audio,
+    max_listeners=int(os.environ.get("RADIOQUEST_BROADCAST_MAX_LISTENERS", "4"))
+)
+
+# --- Episode Pre-warming ---
+# Segments stay pinned in the segment cache this long after release, past its usual short TTL
+EPISODE_PIN_S = float(os.environ.get("RADIOQUEST_EPISODE_PIN_S", "900"))
+# Story page profiles to render ahead of time (each also renders its fallbacks)
+EPISODE_PROFILES = [audio_profiles.get_profile(name) for name in
+                    os.environ.get("RADIOQUEST_EPISODE_PROFILES", audio_profiles.DEFAULT_PROFILE).split(",") if name]
+
+def warm_episode(episode):
+    """
+    Load every segment reachable from the episode root, pin it in the segment cache,
+    and render its narration and static page body the way /story would. `missing`
+    counts narrations that could not be rendered; the scheduler warms again until it is 0.
+    """
+    segments = story_packs.walk_story_graph(load_segment, episode.root, episode.depth)
+    if stories_collection is not None:
+        pin_s = max(segment_cache.ttl, episode.release_at + EPISODE_PIN_S - time.time())
+        for segment in segments:
+            segment_cache.set(segment['_id'], dict(segment), ttl=pin_s)
+    
+    # Every worker warms its own caches but they share the audio store: start each
+    # worker at a different segment so they mostly render different narrations
+    offset = os.getpid() % len(segments) if segments else 0
+    pages = audio_files = missing = 0
+    for segment in segments[offset:] + segments[:offset]:
+        for profile in EPISODE_PROFILES:
+            page = dict(segment)
+            if not page.get('audio_url'):
+                # Outside a request render_audio has no client: no rate limit, and it waits for
+                # a synthesis slot rather than being shed, so only real failures leave gaps
+                audio_sources = story_audio_sources(page, profile)
+                if tts_client is not None:
+                    missing += len(audio_profiles.fallback_chain(profile)) - len(audio_sources)
+                if audio_sources:
+                    page['audio_url'] = audio_sources[0]['url']
+                    page['audio_sources'] = audio_sources
+                    audio_files += len(audio_sources)
+            # The static body doesn't depend on the request; url_for just needs one to exist
+            with app.test_request_context(f"/story/{segment['_id']}"):
+                story_renderer.static_body(page)
+            pages += 1
+    return {"segments": len(segments), "pages": pages, "audio": audio_files, "missing": missing}
+
+episodes = episode_scheduler.EpisodeScheduler.from_env(warm_episode, story_packs.DEFAULT_MAX_DEPTH)
+episodes.start()
 
 if __name__ == "__main__":
-    app.run(host="0.0.0.0", port=int(os.environ.get("PORT", 8080)))
\ No newline at end of file
+    app.run(host="0.0.0.0", port=int(os.environ.get("PORT", 8080)))
@@ -0,0 +1,119 @@
+"""
+RadioQuest Assets - resolve and serve content-hashed static assets
+Reads the manifest written by cache_buster.py. Templates call asset_url('css/style.css')
+which returns the hashed /assets/ URL when the build step has run, and the plain
+/static/ URL otherwise (local development without a build).
+Responsive images built from static/images/ are emitted with responsive_background()
+(CSS image-set() with AVIF/WebP candidates).
+"""
+
+import json
+import logging
+import mimetypes
+import os
+from typing import Any, Dict, List, Optional
+
+from flask import abort, request, send_from_directory, url_for
+from markupsafe import Markup
+
+logger = logging.getLogger(__name__)
+
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+# Preferred order when the client accepts several precompressed encodings
+ENCODING_EXTENSIONS = (("br", ".br"), ("gzip", ".gz"))
+# Modern formats offered ahead of the original format, best first
+PREFERRED_IMAGE_FORMATS = ("avif", "webp")
+
+
+class AssetManifest:
+    """Logical asset path -> content-hashed file under static/dist"""
+
+    def __init__(self, dist_dir: str):
+        self.dist_dir = dist_dir
+        self.assets: Dict[str, str] = {}
+        self.details: Dict[str, Dict] = {}
+        self.images: Dict[str, Dict] = {}
+        self._logical_paths: Dict[str, str] = {}
+        self.load()
+
+    def load(self):
+        manifest_path = os.path.join(self.dist_dir, "manifest.json")
+        try:
+            with open(manifest_path) as f:
+                manifest = json.load(f)
+            self.assets = manifest.get("assets", {})
+            self.details = manifest.get("details", {})
+            self.images = manifest.get("images", {})
+            self._logical_paths = {hashed: logical for logical, hashed in self.assets.items()}
+            for logical, entry in self.images.items():
+                for variant in entry["variants"]:
+                    self._logical_paths.setdefault(variant["file"], logical)
+            logger.info(f"Loaded asset manifest with {len(self.assets)} assets")
+        except FileNotFoundError:
+            logger.info("No asset manifest found; serving unhashed /static/ URLs")
+        except Exception as e:
+            logger.error(f"Failed to load asset manifest: {e}")
+
+    def url(self, path: str) -> str:
+        hashed = self.assets.get(path)
+        if hashed:
+            return f"/assets/{hashed}"
+        return url_for('static', filename=path)
+
+    def _variants(self, entry: Dict[str, Any], format_name: str) -> List[Dict[str, Any]]:
+        return sorted((v for v in entry["variants"] if v["format"] == format_name), key=lambda v: v["width"])
+
+    def responsive_background(self, selector: str, path: str) -> Markup:
+        """
+        CSS rules giving `selector` a background-image sized to the viewport, using
+        image-set() so browsers pick AVIF/WebP. Browsers without image-set() keep the
+        plain url() declaration. Empty when the image has no built variants.
+        """
+        entry = self.images.get(path)
+        if entry is None:
+            return Markup("")
+        widths = sorted({v["width"] for v in entry["variants"]})
+        rules = []
+        previous_width: Optional[int] = None
+        for width in widths:
+            fallback = _covering(self._variants(entry, entry["fallback"]), width)
+            candidates = [_covering(self._variants(entry, f), width) for f in PREFERRED_IMAGE_FORMATS]
+            image_set = ", ".join(f'url("/assets/{v["file"]}") type("{v["type"]}")'
+                                  for v in candidates + [fallback] if v)
+            declaration = (f'{selector} {{ background-image: url("/assets/{fallback["file"]}"); '
+                           f'background-image: image-set({image_set}); }}')
+            if previous_width is None:
+                rules.append(declaration)
+            else:
+                rules.append(f"@media (min-width: {previous_width + 1}px) {{ {declaration} }}")
+            previous_width = width
+        return Markup("\n".join(rules))
+
+    def serve(self, filename: str):
+        """Serve a hashed asset, preferring a precompressed variant the client accepts"""
+        logical_path = self._logical_paths.get(filename)
+        if logical_path is None:
+            abort(404)
+        accepted = request.headers.get("Accept-Encoding", "").lower()
+        available = self.details.get(logical_path, {}).get("encodings", [])
+        response = None
+        for encoding, ext in ENCODING_EXTENSIONS:
+            if encoding in available and encoding in accepted:
+                response = send_from_directory(self.dist_dir, filename + ext)
+                # Describe the original asset; the encoding is a transport detail
+                response.mimetype = mimetypes.guess_type(filename)[0] or "application/octet-stream"
+                response.headers["Content-Encoding"] = encoding
+                break
+        if response is None:
+            response = send_from_directory(self.dist_dir, filename)
+        response.headers["Cache-Control"] = IMMUTABLE_CACHE_CONTROL
+        response.headers["Vary"] = "Accept-Encoding"
+        return response
+
+
+def _covering(variants: List[Dict[str, Any]], width: int) -> Optional[Dict[str, Any]]:
+    """Smallest variant at least `width` wide, else the largest available"""
+    for variant in variants:
+        if variant["width"] >= width:
+            return variant
+    return variants[-1] if variants else None
@@ -0,0 +1,111 @@
+"""
+RadioQuest Audio Profiles - bandwidth-aware narration encodings
+Each story segment can be rendered as several audio profiles. A profile is picked
+per request from an explicit ?profile= parameter or the Save-Data / ECT / Downlink
+client hints, and every rendered file is content-addressed (text + voice + profile)
+in the audio blob store, so identical narration is synthesized once and can be
+cached forever.
+
+Google TTS has no bitrate setting; the sample rate and the codec are the levers.
+"""
+
+import os
+from dataclasses import dataclass
+from typing import List, Optional
+
+from google.cloud import texttospeech
+
+from functions.blob_store import content_key
+
+CLIENT_HINTS = ("Save-Data", "ECT", "Downlink")
+
+
+@dataclass(frozen=True)
+class AudioProfile:
+    name: str
+    encoding: str
+    extension: str
+    mimetype: str
+    sample_rate_hertz: Optional[int] = None
+    # Profile to offer next in <audio> for browsers that cannot play this one
+    fallback: Optional[str] = None
+
+    def audio_config(self) -> texttospeech.AudioConfig:
+        kwargs = {"audio_encoding": getattr(texttospeech.AudioEncoding, self.encoding)}
+        if self.sample_rate_hertz:
+            kwargs["sample_rate_hertz"] = self.sample_rate_hertz
+        return texttospeech.AudioConfig(**kwargs)
+
+    @property
+    def source_type(self) -> str:
+        """type attribute for an <audio> <source> element"""
+        return 'audio/ogg; codecs="opus"' if self.encoding == "OGG_OPUS" else self.mimetype
+
+
+PROFILES = {
+    # The service's default-rate MP3 (what the app always produced before)
+    "hq": AudioProfile("hq", "MP3", ".mp3", "audio/mpeg"),
+    # Same settings as the Cloud Function: narrow-band MP3, about half the size
+    "low": AudioProfile("low", "MP3", ".mp3", "audio/mpeg", sample_rate_hertz=16000),
+    # Opus is far smaller at speech quality; older Safari needs the MP3 fallback
+    "opus": AudioProfile("opus", "OGG_OPUS", ".ogg", "audio/ogg", sample_rate_hertz=16000, fallback="low"),
+}
+DEFAULT_PROFILE = os.environ.get("RADIOQUEST_AUDIO_PROFILE", "hq")
+
+# Effective connection types (ECT client hint) and the profile each one gets
+_ECT_PROFILES = {"slow-2g": "opus", "2g": "opus", "3g": "low"}
+# Downlink client hint, in Mbps: (upper bound, profile)
+_DOWNLINK_PROFILES = ((0.5, "opus"), (2.0, "low"))
+
+_MIMETYPES = {".mp3": "audio/mpeg", ".ogg": "audio/ogg"}
+
+
+def get_profile(name: Optional[str]) -> AudioProfile:
+    return PROFILES.get(name or "", PROFILES.get(DEFAULT_PROFILE, PROFILES["hq"]))
+
+
+def fallback_chain(profile: Optional[AudioProfile]) -> List[AudioProfile]:
+    """The profile followed by its fallbacks, in <source> order"""
+    chain = []
+    while profile is not None:
+        chain.append(profile)
+        profile = PROFILES.get(profile.fallback) if profile.fallback else None
+    return chain
+
+
+def select_profile(req) -> AudioProfile:
+    """Pick a profile for a Flask request: ?profile=, then Save-Data, ECT, Downlink"""
+    explicit = req.args.get("profile")
+    if explicit in PROFILES:
+        return PROFILES[explicit]
+    if req.headers.get("Save-Data", "").strip().lower() == "on":
+        return PROFILES["opus"]
+    ect = req.headers.get("ECT", "").strip().lower()
+    if ect in _ECT_PROFILES:
+        return PROFILES[_ECT_PROFILES[ect]]
+    try:
+        downlink = float(req.headers.get("Downlink", ""))
+    except ValueError:
+        downlink = None
+    if downlink is not None:
+        for bound, name in _DOWNLINK_PROFILES:
+            if downlink < bound:
+                return PROFILES[name]
+    return get_profile(None)
+
+
+def audio_filename(text: str, voice: str, profile: AudioProfile) -> str:
+    """Blob key of a rendering: changes whenever the text, voice or encoding does"""
+    return content_key(text, voice, profile.encoding, profile.sample_rate_hertz or "", extension=profile.extension)
+
+
+def mimetype_for(filename: str) -> str:
+    return _MIMETYPES.get(os.path.splitext(filename)[1].lower(), "application/octet-stream")
+
+
+def add_client_hint_headers(response):
+    """Ask for the hints on later requests and tell caches the response depends on them"""
+    response.headers["Accept-CH"] = ", ".join(CLIENT_HINTS)
+    for hint in CLIENT_HINTS:
+        response.vary.add(hint)
+    return response
@@ -0,0 +1,6 @@
+"""
+RadioQuest benchmarks - reproducible performance runs against local stand-ins
+for MongoDB Atlas and Google Cloud TTS. Run from the repository root, e.g.
+
+    python -m benchmarks.routes --concurrency 1 8 32
+"""
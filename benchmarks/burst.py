@@ -0,0 +1,131 @@
+"""
+Classroom-burst scenario - a whole class (30-40 radios or tablets) opens the same
+new segment within a second. Walks the story graph from a root segment via
+`choices` and, for every segment, releases `--class-size` concurrent GET /story
+requests at once against a cold segment cache and no audio on disk. Reports
+latency and the peak number of backend calls (MongoDB reads, TTS syntheses) per
+burst.
+
+    python -m benchmarks.burst --class-size 40 --depth 3
+    python -m benchmarks.burst --no-coalescing   # baseline without single-flight
+"""
+
+import argparse
+import os
+import sys
+import threading
+import time
+from collections import deque
+
+from benchmarks import harness
+from benchmarks.standins import FakeTTSClient, InMemoryCollection, build_corpus, fixed_latency
+
+
+class _NoCoalescing:
+    """Drop-in for caching.SingleFlight that lets every caller through"""
+
+    def do(self, key, fn, timeout=None, rerun_if=None):
+        return fn(), False
+
+
+def story_graph_walk(documents, root, depth):
+    """Breadth-first segment ids reachable from root via choices, up to depth"""
+    by_id = {doc["_id"]: doc for doc in documents}
+    order, seen = [], {root}
+    queue = deque([(root, 0)])
+    while queue:
+        segment_id, level = queue.popleft()
+        if segment_id not in by_id:
+            continue
+        order.append(segment_id)
+        if level >= depth:
+            continue
+        for choice in by_id[segment_id].get("choices", []):
+            child = choice.get("id") or choice.get("next_segment_id")
+            if child and child not in seen:
+                seen.add(child)
+                queue.append((child, level + 1))
+    return order
+
+
+def run_burst(client, story_id, class_size):
+    """Release class_size requests for one segment at the same instant"""
+    barrier = threading.Barrier(class_size)
+    latencies, statuses = [], []
+    lock = threading.Lock()
+
+    def student():
+        barrier.wait()
+        start = time.perf_counter()
+        status = client.get(f"/story/{story_id}").status_code
+        with lock:
+            latencies.append(time.perf_counter() - start)
+            statuses.append(status)
+
+    wall_start = time.perf_counter()
+    threads = [threading.Thread(target=student) for _ in range(class_size)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    errors = sum(1 for s in statuses if s != 200)
+    return harness.summarize(latencies, errors, time.perf_counter() - wall_start)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--class-size", type=int, default=40)
+    parser.add_argument("--root", default="intro")
+    parser.add_argument("--depth", type=int, default=2, help="how many choice levels to walk from the root")
+    parser.add_argument("--mongo-latency-ms", type=float, default=40.0)
+    parser.add_argument("--tts-latency-ms", type=float, default=800.0)
+    parser.add_argument("--tts-payload-kb", type=int, default=64)
+    parser.add_argument("--no-coalescing", action="store_true", help="disable single-flight to get a baseline")
+    parser.add_argument("--output", help="results JSON path (default: benchmarks/results/)")
+    args = parser.parse_args(argv)
+
+    tts = FakeTTSClient(latency=fixed_latency(args.tts_latency_ms / 1000.0), payload_bytes=args.tts_payload_kb * 1024)
+    radioquest = harness.load_app(tts_client=tts)
+    corpus = build_corpus(radioquest.MOCK_STORIES)
+    collection = InMemoryCollection(documents=corpus, latency=args.mongo_latency_ms / 1000.0)
+    radioquest.stories_collection = collection
+    if args.no_coalescing:
+        radioquest.segment_flight = _NoCoalescing()
+        radioquest.audio_flight = _NoCoalescing()
+    client = radioquest.app.test_client()
+
+    results = []
+    for story_id in story_graph_walk(corpus, args.root, args.depth):
+        # A freshly released segment: nothing cached, no audio rendered yet
+        radioquest.segment_cache.invalidate(story_id)
+        segment = next(doc for doc in corpus if doc["_id"] == story_id)
+        audio_path = radioquest.audio_store.path(
+            radioquest.story_audio_filename(segment, radioquest.audio_profiles.get_profile(None)))
+        if os.path.exists(audio_path):
+            os.unlink(audio_path)
+        collection.stats.reset()
+        tts.stats.reset()
+
+        row = {"segment": story_id, "class_size": args.class_size}
+        row.update(run_burst(client, story_id, args.class_size))
+        row["mongo_reads"] = collection.stats.calls.get("find_one", 0)
+        row["mongo_peak_in_flight"] = collection.stats.peak_in_flight
+        row["tts_calls"] = tts.stats.total()
+        row["tts_peak_in_flight"] = tts.stats.peak_in_flight
+        results.append(row)
+        print(f"{story_id:18s} p95={row['p95_ms']:.0f}ms mongo_reads={row['mongo_reads']} "
+              f"tts_calls={row['tts_calls']}", file=sys.stderr)
+
+    config = {k: v for k, v in vars(args).items() if k != "output"}
+    path = harness.save_results("burst", config, results, args.output)
+    print()
+    harness.print_table(results, ["segment", "class_size", "errors", "p50_ms", "p95_ms", "p99_ms", "mongo_reads",
+                                  "mongo_peak_in_flight", "tts_calls", "tts_peak_in_flight"])
+    peak_backend = max((r["mongo_reads"] + r["tts_calls"] for r in results), default=0)
+    print(f"\nPeak backend calls per burst: {peak_backend}")
+    print(f"Results saved to {os.path.relpath(path)}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
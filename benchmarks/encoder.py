@@ -0,0 +1,101 @@
+"""
+Query encoder benchmark - SentenceTransformer (PyTorch) versus the int8 ONNX
+encoder, called one query at a time and through the MicroBatcher, at several
+concurrency levels. Also reports how close the ONNX vectors are to PyTorch's.
+
+    python -m query_encoder export          # once
+    python -m benchmarks.encoder --concurrency 1 8 32 --requests 400
+"""
+
+import argparse
+import os
+import random
+import sys
+import threading
+
+import numpy as np
+
+import query_encoder
+from benchmarks import harness
+
+QUERIES = [
+    "forest", "goma", "the lake at night", "eagle on the bridge", "baobab tree journal",
+    "river of life", "lost children in the village", "climb the hill", "a hidden spring",
+    "monkeys in the jungle canopy", "the rope bridge sways", "healer from the village",
+    "Koko makes a brave choice", "drums in the distance", "sunlit clearing or dark cave",
+    "what did the compass show",
+]
+
+
+def workload(seed):
+    rng = random.Random(seed)
+
+    def text(i):
+        # Mostly distinct strings, so nothing downstream can get away with caching
+        return f"{rng.choice(QUERIES)} {i}" if i % 4 else rng.choice(QUERIES)
+    return text
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--requests", type=int, default=400)
+    parser.add_argument("--model", default=query_encoder.MODEL_PATH)
+    parser.add_argument("--encoder", default=query_encoder.ENCODER_DIR)
+    parser.add_argument("--window-ms", type=float, default=query_encoder.BATCH_WINDOW_MS)
+    parser.add_argument("--skip-pytorch", action="store_true", help="only time the ONNX encoder")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--output", help="results JSON path (default: benchmarks/results/)")
+    args = parser.parse_args(argv)
+
+    onnx_encoder = query_encoder.QueryEncoder(args.encoder)
+    batcher = query_encoder.MicroBatcher(onnx_encoder.encode, window_ms=args.window_ms)
+    encoders = {
+        "onnx_int8": lambda text: onnx_encoder.encode([text])[0],
+        "onnx_int8_batched": batcher.encode,
+    }
+    torch_model = None
+    if not args.skip_pytorch:
+        from sentence_transformers import SentenceTransformer
+        torch_model = SentenceTransformer(args.model, device="cpu")
+        lock = threading.Lock()
+
+        def torch_encode(text):
+            # One forward pass at a time, as a request handler sharing the model would have to
+            with lock:
+                return torch_model.encode(text)
+        encoders = dict(pytorch=torch_encode, **encoders)
+
+    results = []
+    for name, encode in encoders.items():
+        encode(QUERIES[0])  # load kernels and allocate arenas before timing
+        for concurrency in args.concurrency:
+            text = workload(args.seed)
+            texts = [text(i) for i in range(args.requests)]
+            before = batcher.stats()["batches"]
+            row = {"encoder": name, "concurrency": concurrency}
+            row.update(harness.run_concurrent(lambda i: encode(texts[i]) is not None, args.requests, concurrency))
+            if name == "onnx_int8_batched":
+                batches = batcher.stats()["batches"] - before
+                row["mean_batch"] = round(args.requests / batches, 2) if batches else 0.0
+            results.append(row)
+
+    config = dict(vars(args))
+    if torch_model is not None:
+        reference = torch_model.encode(QUERIES, normalize_embeddings=True)
+        cosines = (reference * onnx_encoder.encode(QUERIES)).sum(axis=1)
+        config["cosine_vs_pytorch"] = {"min": round(float(np.min(cosines)), 5),
+                                       "mean": round(float(np.mean(cosines)), 5)}
+
+    path = harness.save_results("encoder", config, results, args.output)
+    harness.print_table(results, ["encoder", "concurrency", "requests", "p50_ms", "p95_ms", "p99_ms",
+                                  "throughput_rps", "mean_batch"])
+    if "cosine_vs_pytorch" in config:
+        print(f"\nONNX int8 vs PyTorch cosine: min {config['cosine_vs_pytorch']['min']}, "
+              f"mean {config['cosine_vs_pytorch']['mean']}")
+    print(f"Results saved to {os.path.relpath(path)}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
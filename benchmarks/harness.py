@@ -0,0 +1,160 @@
+"""
+Shared benchmark plumbing: wiring the Flask app to stand-ins, running a
+workload at a given concurrency, summarising latencies and saving results.
+"""
+
+import atexit
+import json
+import logging
+import os
+import platform
+import shutil
+import subprocess
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+
+
+def load_app(collection=None, tts_client=None):
+    """
+    Import the Flask app without touching live services and swap in stand-ins.
+    MONGO_URI / GOOGLE_APPLICATION_CREDENTIALS are cleared before import so a
+    developer's shell environment can never send benchmark traffic to Atlas or TTS.
+    TTS admission limits are off unless set in the environment: the benchmarks send
+    every request from one address and measure latency, not shedding. Audio goes to
+    a fresh local directory, so narrations from earlier runs are never served.
+    """
+    os.environ.pop("MONGO_URI", None)
+    os.environ.pop("GOOGLE_APPLICATION_CREDENTIALS", None)
+    audio_dir = tempfile.mkdtemp(prefix="radioquest-bench-audio-")
+    atexit.register(shutil.rmtree, audio_dir, ignore_errors=True)
+    os.environ["RADIOQUEST_BLOB_BACKEND"] = "local"
+    os.environ["RADIOQUEST_AUDIO_DIR"] = audio_dir
+    for name, value in (("RADIOQUEST_TTS_RATE", "0"), ("RADIOQUEST_TTS_CLIENT_RATE", "0"),
+                        ("RADIOQUEST_TTS_MAX_IN_FLIGHT", "1024")):
+        os.environ.setdefault(name, value)
+    logging.disable(logging.CRITICAL)  # the expected 'services not initialized' errors
+    import app as radioquest
+    logging.disable(logging.NOTSET)
+    logging.getLogger().setLevel(logging.WARNING)
+    radioquest.stories_collection = collection
+    radioquest.tts_client = tts_client
+    return radioquest
+
+
+def reset_caches(radioquest):
+    """Empty the app's in-process caches and the audio store, as on a fresh instance"""
+    radioquest.segment_cache.clear()
+    radioquest.search_cache.invalidate()
+    radioquest.story_renderer.invalidate()
+    root = radioquest.audio_store.root
+    for name in os.listdir(root):
+        os.unlink(os.path.join(root, name))
+
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    rank = max(0, min(len(sorted_values) - 1, int(round(pct / 100.0 * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[rank]
+
+
+def summarize(latencies: List[float], errors: int, wall_time: float) -> Dict[str, float]:
+    ordered = sorted(latencies)
+    count = len(ordered)
+    return {
+        "requests": count,
+        "errors": errors,
+        "p50_ms": round(percentile(ordered, 50) * 1000, 3),
+        "p95_ms": round(percentile(ordered, 95) * 1000, 3),
+        "p99_ms": round(percentile(ordered, 99) * 1000, 3),
+        "max_ms": round(ordered[-1] * 1000, 3) if ordered else 0.0,
+        "mean_ms": round(sum(ordered) / count * 1000, 3) if count else 0.0,
+        "throughput_rps": round(count / wall_time, 2) if wall_time > 0 else 0.0,
+    }
+
+
+def run_concurrent(call: Callable[[int], bool], total: int, concurrency: int) -> Dict[str, float]:
+    """
+    Issue `total` calls from `concurrency` worker threads. `call(i)` returns True on
+    success; exceptions and False both count as errors.
+    """
+    latencies: List[float] = []
+    errors = 0
+    lock = threading.Lock()
+
+    def worker(i: int):
+        nonlocal errors
+        start = time.perf_counter()
+        try:
+            ok = call(i)
+        except Exception:
+            ok = False
+        elapsed = time.perf_counter() - start
+        with lock:
+            latencies.append(elapsed)
+            if not ok:
+                errors += 1
+
+    wall_start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(worker, range(total)))
+    return summarize(latencies, errors, time.perf_counter() - wall_start)
+
+
+def git_revision() -> Optional[str]:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], stderr=subprocess.DEVNULL,
+                                       text=True).strip()
+    except Exception:
+        return None
+
+
+def save_results(name: str, config: Dict[str, Any], results: List[Dict[str, Any]],
+                 output: Optional[str] = None) -> str:
+    revision = git_revision()
+    payload = {
+        "benchmark": name,
+        "revision": revision,
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "config": config,
+        "results": results,
+    }
+    if output is None:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        output = os.path.join(RESULTS_DIR, f"{name}-{time.strftime('%Y%m%dT%H%M%S')}-{revision or 'norev'}.json")
+    with open(output, "w") as f:
+        json.dump(payload, f, indent=2)
+    return output
+
+
+def print_table(results: List[Dict[str, Any]], columns: List[str]):
+    widths = {c: max(len(c), *(len(str(r.get(c, ""))) for r in results)) for c in columns}
+    print("  ".join(c.ljust(widths[c]) for c in columns))
+    for row in results:
+        print("  ".join(str(row.get(c, "")).ljust(widths[c]) for c in columns))
+
+
+def compare(baseline_path: str, results: List[Dict[str, Any]], key_fields: List[str],
+            metric: str = "p95_ms", threshold: float = 0.10) -> List[str]:
+    """Return human-readable regressions of `metric` beyond `threshold` vs a saved run"""
+    with open(baseline_path) as f:
+        baseline = json.load(f)["results"]
+    index = {tuple(r.get(k) for k in key_fields): r for r in baseline}
+    regressions = []
+    for row in results:
+        old = index.get(tuple(row.get(k) for k in key_fields))
+        if not old or not old.get(metric):
+            continue
+        change = (row[metric] - old[metric]) / old[metric]
+        if change > threshold:
+            label = " ".join(f"{k}={row.get(k)}" for k in key_fields)
+            regressions.append(f"{label}: {metric} {old[metric]} -> {row[metric]} (+{change:.0%})")
+    return regressions
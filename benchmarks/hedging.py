@@ -0,0 +1,74 @@
+"""
+TTS hedging benchmark - synthesis latency against a heavy-tailed fake TTS
+(lognormal, median --median-ms) with hedging off and on. Every call asks for
+new narration, so nothing is served from the audio store; "extra_calls_pct" is
+the additional TTS spend hedging cost for the tail it removed.
+
+    python -m benchmarks.hedging --calls 2000 --concurrency 16
+"""
+
+import argparse
+import os
+import sys
+from types import SimpleNamespace
+
+import hedging
+from benchmarks import harness
+from benchmarks.standins import FakeTTSClient, lognormal_latency
+
+
+def run_mode(name, hedger, args):
+    tts = FakeTTSClient(latency=lognormal_latency(args.median_ms / 1000.0, args.sigma, args.seed), payload_bytes=1024)
+
+    def call(i):
+        request = SimpleNamespace(text=f"narration {i}")
+        response = hedger.call(lambda timeout: tts.synthesize_speech(input=request, timeout=timeout),
+                               args.timeout_s, should_hedge=lambda: True)
+        return bool(response.audio_content)
+
+    # Fill the latency window so the hedge delay is known before measuring
+    harness.run_concurrent(call, args.warmup, args.concurrency)
+    tts.stats.reset()
+    row = {"mode": name}
+    row.update(harness.run_concurrent(call, args.calls, args.concurrency))
+    row["tts_calls"] = tts.stats.total()
+    row["extra_calls_pct"] = round((row["tts_calls"] - args.calls) / args.calls * 100, 1)
+    delay = hedger.hedge_delay() if hedger.enabled else None
+    row["hedge_delay_ms"] = round(delay * 1000, 1) if delay is not None else None
+    return row
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--calls", type=int, default=2000)
+    parser.add_argument("--warmup", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--median-ms", type=float, default=50.0)
+    parser.add_argument("--sigma", type=float, default=1.0, help="lognormal shape; larger means a longer tail")
+    parser.add_argument("--percentile", type=float, default=90.0, help="hedge after this observed percentile")
+    parser.add_argument("--budget", type=float, default=0.1, help="hedges earned per call")
+    parser.add_argument("--timeout-s", type=float, default=6.0)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--output", help="results JSON path (default: benchmarks/results/)")
+    args = parser.parse_args(argv)
+
+    modes = [
+        ("no_hedging", hedging.Hedger(enabled=False)),
+        ("hedged", hedging.Hedger(percentile=args.percentile, ratio=args.budget,
+                                  max_workers=args.concurrency * 2)),
+    ]
+    results = [run_mode(name, hedger, args) for name, hedger in modes]
+
+    path = harness.save_results("hedging", vars(args), results, args.output)
+    harness.print_table(results, ["mode", "requests", "errors", "p50_ms", "p95_ms", "p99_ms", "max_ms",
+                                  "tts_calls", "extra_calls_pct", "hedge_delay_ms"])
+    baseline, hedged = results
+    if hedged["p99_ms"]:
+        print(f"\np99 {baseline['p99_ms']:.0f} ms -> {hedged['p99_ms']:.0f} ms "
+              f"for {hedged['extra_calls_pct']}% extra TTS calls")
+    print(f"Results saved to {os.path.relpath(path)}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
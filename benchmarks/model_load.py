@@ -0,0 +1,152 @@
+"""
+Model loading benchmark - per-worker load time and memory for N forked workers:
+
+  private_copy   each worker reads the weights into its own memory (what
+                 unpickling a pytorch_model.bin per process amounts to)
+  fork_copy      the master reads them once, workers inherit copy-on-write pages
+  mmap           each worker maps the safetensors file (model_artifacts.load_safetensors)
+  preload_mmap   the master maps and warms it before forking, workers inherit the map
+
+Each worker touches every weight, then reports RSS, PSS (its fair share of
+shared pages) and private memory from /proc/self/smaps_rollup. Without a saved
+model a synthetic safetensors file of --size-mb is used.
+
+    python -m benchmarks.model_load --workers 4
+"""
+
+import argparse
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+import model_artifacts
+from benchmarks import harness
+
+MODES = ("private_copy", "fork_copy", "mmap", "preload_mmap")
+DEFAULT_WEIGHTS = "./models/all-MiniLM-L6-v2/model.safetensors"
+
+
+def memory_kb():
+    """Rss / Pss / Private (kB) of this process; Linux only, RSS from getrusage elsewhere"""
+    try:
+        fields = {}
+        with open("/proc/self/smaps_rollup") as f:
+            for line in f:
+                parts = line.split()
+                if len(parts) == 3 and parts[2] == "kB":
+                    fields[parts[0].rstrip(":")] = int(parts[1])
+        return {"rss_kb": fields["Rss"], "pss_kb": fields["Pss"],
+                "private_kb": fields.get("Private_Clean", 0) + fields.get("Private_Dirty", 0)}
+    except (OSError, KeyError):
+        import resource
+        return {"rss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss, "pss_kb": None, "private_kb": None}
+
+
+def load_copy(path):
+    return {name: np.array(tensor) for name, tensor in model_artifacts.load_safetensors(path).items()}
+
+
+def touch(tensors):
+    return float(sum(tensor.sum() for tensor in tensors.values() if tensor.size))
+
+
+def worker(mode, path, inherited, results):
+    start = time.perf_counter()
+    if mode == "private_copy":
+        tensors = load_copy(path)
+    elif mode == "mmap":
+        tensors = model_artifacts.load_safetensors(path)
+    else:
+        tensors = inherited
+    load_s = time.perf_counter() - start
+    touch(tensors)
+    results.put(dict(memory_kb(), load_ms=round(load_s * 1000, 3)))
+
+
+def run_mode(mode, path, workers, baseline):
+    context = multiprocessing.get_context("fork")
+    inherited = None
+    master_ms = 0.0
+    if mode in ("fork_copy", "preload_mmap"):
+        start = time.perf_counter()
+        inherited = load_copy(path) if mode == "fork_copy" else model_artifacts.load_safetensors(path)
+        touch(inherited)
+        master_ms = (time.perf_counter() - start) * 1000
+    results = context.Queue()
+    processes = [context.Process(target=worker, args=(mode, path, inherited, results)) for _ in range(workers)]
+    for process in processes:
+        process.start()
+    rows = [results.get() for _ in processes]
+    for process in processes:
+        process.join()
+
+    def mean(key):
+        values = [row[key] for row in rows if row[key] is not None]
+        return round(sum(values) / len(values), 1) if values else None
+
+    pss = [row["pss_kb"] for row in rows if row["pss_kb"] is not None]
+    return {
+        "mode": mode,
+        "workers": workers,
+        "master_load_ms": round(master_ms, 3),
+        "worker_load_ms": mean("load_ms"),
+        "worker_rss_mb": round(mean("rss_kb") / 1024, 1),
+        "worker_pss_mb": round(mean("pss_kb") / 1024, 1) if pss else None,
+        "worker_private_mb": round(mean("private_kb") / 1024, 1) if pss else None,
+        # What the workers really cost beyond an idle interpreter
+        "total_pss_over_idle_mb": round((sum(pss) - baseline * len(pss)) / 1024, 1) if pss else None,
+    }
+
+
+def idle_pss_kb():
+    context = multiprocessing.get_context("fork")
+    results = context.Queue()
+    process = context.Process(target=lambda: results.put(memory_kb()["pss_kb"] or 0))
+    process.start()
+    value = results.get()
+    process.join()
+    return value
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--weights", default=DEFAULT_WEIGHTS, help="safetensors file to load")
+    parser.add_argument("--size-mb", type=int, default=90, help="synthetic weights size when --weights is missing")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--output", help="results JSON path (default: benchmarks/results/)")
+    args = parser.parse_args(argv)
+
+    path, synthetic = args.weights, None
+    if not os.path.isfile(path):
+        synthetic = tempfile.NamedTemporaryFile(suffix=".safetensors", delete=False)
+        synthetic.close()
+        rng = np.random.default_rng(7)
+        tensors = {f"layer.{i}.weight": rng.standard_normal((384, 1536), dtype=np.float32)
+                   for i in range(max(1, args.size_mb * 1024 * 1024 // (384 * 1536 * 4)))}
+        model_artifacts.save_safetensors(tensors, synthetic.name)
+        path = synthetic.name
+        del tensors
+    config = dict(vars(args), weights=path if synthetic is None else "synthetic",
+                  weights_mb=round(os.path.getsize(path) / 1024 / 1024, 1))
+
+    try:
+        load_copy(path)  # read the file once, so no mode pays for a cold page cache
+        baseline = idle_pss_kb()
+        results = [run_mode(mode, path, args.workers, baseline) for mode in MODES]
+    finally:
+        if synthetic is not None:
+            os.unlink(synthetic.name)
+
+    output = harness.save_results("model_load", config, results, args.output)
+    harness.print_table(results, ["mode", "workers", "master_load_ms", "worker_load_ms", "worker_rss_mb",
+                                  "worker_pss_mb", "worker_private_mb", "total_pss_over_idle_mb"])
+    print(f"\n{config['weights_mb']} MB of weights; results saved to {os.path.relpath(output)}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,69 @@
+"""
+Story page rendering benchmark - full render_template('story.html') versus the
+fragment-cached renderer used by /story (static body cached per segment version,
+recap and vote fragments rendered per request).
+
+    python -m benchmarks.render --iterations 2000
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+
+from benchmarks import harness
+
+
+def time_renders(render, segments, iterations, seed):
+    rng = random.Random(seed)
+    latencies = []
+    for _ in range(iterations):
+        segment = rng.choice(segments)
+        votes = {c["id"]: rng.randint(0, 40) for c in segment.get("choices", [])}
+        previous = None if segment["_id"] == "intro" else "In our last adventure, you helped Koko decide."
+        start = time.perf_counter()
+        render(segment, votes, previous)
+        latencies.append(time.perf_counter() - start)
+    return latencies
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=2000)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--output", help="results JSON path (default: benchmarks/results/)")
+    args = parser.parse_args(argv)
+
+    radioquest = harness.load_app()
+    from flask import render_template
+    segments = [dict(s, audio_url=f"/audio/{s['_id']}.mp3") for s in radioquest.MOCK_STORIES.values()]
+
+    def full(segment, votes, previous):
+        return render_template("story.html", segment=segment, vote_results=votes, previous_story=previous,
+                               last_choice=None)
+
+    def fragment(segment, votes, previous):
+        return radioquest.story_renderer.render(segment, votes, previous, None)
+
+    results = []
+    with radioquest.app.test_request_context("/story/intro"):
+        for name, render in (("full_render", full), ("fragment_cached", fragment)):
+            time_renders(render, segments, 50, args.seed)  # warm Jinja's template cache and the fragment cache
+            start = time.perf_counter()
+            latencies = time_renders(render, segments, args.iterations, args.seed)
+            row = {"renderer": name}
+            row.update(harness.summarize(latencies, 0, time.perf_counter() - start))
+            row["mean_us"] = round(row["mean_ms"] * 1000, 1)
+            results.append(row)
+
+    speedup = results[0]["mean_ms"] / results[1]["mean_ms"] if results[1]["mean_ms"] else float("inf")
+    path = harness.save_results("render", vars(args), results, args.output)
+    harness.print_table(results, ["renderer", "requests", "mean_us", "p50_ms", "p95_ms", "p99_ms", "throughput_rps"])
+    print(f"\nFragment-cached rendering is {speedup:.1f}x faster per request")
+    print(f"Results saved to {os.path.relpath(path)}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,155 @@
+"""
+Route benchmark - drives the real Flask routes (/story, /search, /tts, /audio,
+/submit_choice and /adk/*) against an in-memory MongoDB stand-in (or a local
+mongod via --mongo-uri) and a fake TTS client, at several concurrency levels.
+
+Each level is measured twice. The "cold" row starts from empty segment, search
+and page caches and an empty audio store, so its Mongo and TTS calls show the
+backend path. The "warm" row follows --warmup untimed requests and measures
+what repeat visitors get.
+
+    python -m benchmarks.routes --concurrency 1 8 32 --requests 400
+    python -m benchmarks.routes --routes story search --compare benchmarks/results/<old>.json
+"""
+
+import argparse
+import os
+import sys
+
+import versioning
+from benchmarks import harness
+from benchmarks.standins import FakeTTSClient, InMemoryCollection, build_corpus, fixed_latency, lognormal_latency
+
+SEARCH_TERMS = ["forest", "river", "bridge", "eagle", "village", "journal", "goma", "lake", "baobab", "smoke"]
+
+
+def build_collection(args, corpus):
+    if args.mongo_uri:
+        from pymongo import MongoClient
+        client = MongoClient(args.mongo_uri, serverSelectionTimeoutMS=5000)
+        collection = client["RadioQuestBench"]["story_segments"]
+        collection.delete_many({})
+        collection.insert_many(corpus)
+        versioning.bump_corpus_version(collection)
+        return collection
+    return InMemoryCollection(documents=corpus, latency=args.mongo_latency_ms / 1000.0)
+
+
+def route_calls(client, story_ids):
+    """Map of route name -> call(i) returning True on an expected response"""
+    def story(i):
+        return client.get(f"/story/{story_ids[i % len(story_ids)]}").status_code == 200
+
+    def search(i):
+        return client.get(f"/search?q={SEARCH_TERMS[i % len(SEARCH_TERMS)]}").status_code == 200
+
+    def tts(i):
+        return client.get(f"/tts/{story_ids[i % len(story_ids)]}").status_code == 200
+
+    def audio(i):
+        return client.get(f"/audio/{story_ids[i % len(story_ids)]}").status_code == 200
+
+    def submit_choice(i):
+        story_id = story_ids[i % len(story_ids)]
+        choice_id = story_ids[(i + 1) % len(story_ids)]
+        response = client.post("/submit_choice", data={"story_id": story_id, "choice_id": choice_id})
+        return response.status_code == 302
+
+    def adk_story(i):
+        return client.get(f"/adk/story/{story_ids[i % len(story_ids)]}").status_code == 200
+
+    def adk_search(i):
+        return client.get(f"/adk/search?q={SEARCH_TERMS[i % len(SEARCH_TERMS)]}").status_code == 200
+
+    def adk_tts(i):
+        return client.get(f"/adk/tts/{story_ids[i % len(story_ids)]}").status_code == 200
+
+    return {
+        "story": story,
+        "search": search,
+        "tts": tts,
+        "audio": audio,
+        "submit_choice": submit_choice,
+        "adk_story": adk_story,
+        "adk_search": adk_search,
+        "adk_tts": adk_tts,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--routes", nargs="+", help="subset of routes to run (default: all)")
+    parser.add_argument("--concurrency", nargs="+", type=int, default=[1, 8, 32])
+    parser.add_argument("--requests", type=int, default=200, help="requests per route per concurrency level")
+    parser.add_argument("--warmup", type=int, default=20, help="untimed requests per route before measuring")
+    parser.add_argument("--mongo-uri", help="use a local mongod instead of the in-memory stand-in")
+    parser.add_argument("--mongo-latency-ms", type=float, default=2.0, help="simulated Atlas round trip")
+    parser.add_argument("--tts-latency-ms", type=float, default=250.0, help="median fake TTS latency")
+    parser.add_argument("--tts-sigma", type=float, default=0.0,
+                        help="lognormal sigma for TTS latency (0 = fixed latency)")
+    parser.add_argument("--tts-payload-kb", type=int, default=64, help="fake audio size per synthesis")
+    parser.add_argument("--extra-segments", type=int, default=0, help="pad the corpus with generated segments")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--output", help="results JSON path (default: benchmarks/results/)")
+    parser.add_argument("--compare", help="previous results JSON to flag p95 regressions against")
+    args = parser.parse_args(argv)
+
+    tts_latency = args.tts_latency_ms / 1000.0
+    tts = FakeTTSClient(
+        latency=lognormal_latency(tts_latency, args.tts_sigma, args.seed) if args.tts_sigma else fixed_latency(tts_latency),
+        payload_bytes=args.tts_payload_kb * 1024,
+        seed=args.seed,
+    )
+    radioquest = harness.load_app(tts_client=tts)
+    corpus = build_corpus(radioquest.MOCK_STORIES, args.extra_segments, args.seed)
+    collection = build_collection(args, corpus)
+    radioquest.stories_collection = collection
+    client = radioquest.app.test_client()
+    story_ids = [doc["_id"] for doc in corpus]
+
+    calls = route_calls(client, story_ids)
+    selected = args.routes or list(calls)
+    unknown = set(selected) - set(calls)
+    if unknown:
+        parser.error(f"unknown routes: {', '.join(sorted(unknown))}")
+
+    results = []
+    for route in selected:
+        for concurrency in args.concurrency:
+            harness.reset_caches(radioquest)
+            for phase in ("cold", "warm"):
+                if phase == "warm":
+                    harness.run_concurrent(calls[route], args.warmup, concurrency)
+                tts.stats.reset()
+                if hasattr(collection, "stats"):
+                    collection.stats.reset()
+                row = {"route": route, "phase": phase, "concurrency": concurrency}
+                row.update(harness.run_concurrent(calls[route], args.requests, concurrency))
+                row["tts_calls"] = tts.stats.total()
+                if hasattr(collection, "stats"):
+                    row["mongo_calls"] = collection.stats.total()
+                results.append(row)
+                print(f"{route:14s} {phase} c={concurrency:<3d} p50={row['p50_ms']:.1f}ms "
+                      f"p95={row['p95_ms']:.1f}ms p99={row['p99_ms']:.1f}ms {row['throughput_rps']:.0f} req/s "
+                      f"errors={row['errors']}", file=sys.stderr)
+
+    config = {k: v for k, v in vars(args).items() if k not in ("output", "compare")}
+    path = harness.save_results("routes", config, results, args.output)
+    print()
+    harness.print_table(results, ["route", "phase", "concurrency", "requests", "errors", "p50_ms", "p95_ms", "p99_ms",
+                                  "throughput_rps", "mongo_calls", "tts_calls"])
+    print(f"\nResults saved to {os.path.relpath(path)}")
+
+    if args.compare:
+        regressions = harness.compare(args.compare, results, ["route", "phase", "concurrency"])
+        if regressions:
+            print("\nRegressions vs " + args.compare + ":")
+            for line in regressions:
+                print("  " + line)
+            return 1
+        print("\nNo p95 regressions vs " + args.compare)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
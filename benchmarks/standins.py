@@ -0,0 +1,394 @@
+"""
+Local stand-ins for the services RadioQuest depends on in production:
+- InMemoryCollection: the subset of the pymongo Collection API the app uses
+- FakeTTSClient: a texttospeech.TextToSpeechClient with configurable latency
+  and payload size
+- FakeGCSClient: an in-memory Cloud Storage bucket for the GCS audio blob store
+
+All count calls and track peak concurrency so benchmarks can report how many
+backend calls a scenario actually caused.
+"""
+
+import copy
+import io
+import math
+import random
+import re
+import threading
+import time
+from types import SimpleNamespace
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+
+class CallStats:
+    """Thread-safe call counter with in-flight and peak concurrency tracking"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.calls: Dict[str, int] = {}
+        self.in_flight = 0
+        self.peak_in_flight = 0
+
+    def enter(self, operation: str):
+        with self._lock:
+            self.calls[operation] = self.calls.get(operation, 0) + 1
+            self.in_flight += 1
+            self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+
+    def exit(self):
+        with self._lock:
+            self.in_flight -= 1
+
+    def reset(self):
+        with self._lock:
+            self.calls = {}
+            self.peak_in_flight = self.in_flight
+
+    def total(self) -> int:
+        return sum(self.calls.values())
+
+
+def _resolve(document: Dict[str, Any], path: str):
+    value = document
+    for part in path.split("."):
+        if not isinstance(value, dict):
+            return None
+        value = value.get(part)
+    return value
+
+
+def _matches_condition(value, condition) -> bool:
+    if not isinstance(condition, dict) or not any(str(k).startswith("$") for k in condition):
+        return value == condition
+    for op, arg in condition.items():
+        if op == "$regex":
+            flags = re.IGNORECASE if "i" in condition.get("$options", "") else 0
+            if not isinstance(value, str) or not re.search(arg, value, flags):
+                return False
+        elif op == "$options":
+            continue
+        elif op == "$eq":
+            if value != arg:
+                return False
+        elif op == "$ne":
+            if value == arg:
+                return False
+        elif op == "$in":
+            if value not in arg:
+                return False
+        elif op == "$nin":
+            if value in arg:
+                return False
+        elif op == "$exists":
+            if (value is not None) != bool(arg):
+                return False
+        elif op in ("$gt", "$gte", "$lt", "$lte"):
+            if value is None:
+                return False
+            if op == "$gt" and not value > arg:
+                return False
+            if op == "$gte" and not value >= arg:
+                return False
+            if op == "$lt" and not value < arg:
+                return False
+            if op == "$lte" and not value <= arg:
+                return False
+        elif op == "$not":
+            if _matches_condition(value, arg):
+                return False
+        else:
+            raise NotImplementedError(f"InMemoryCollection does not support {op}")
+    return True
+
+
+def matches(document: Dict[str, Any], query: Optional[Dict[str, Any]]) -> bool:
+    """Evaluate a MongoDB filter document against a document"""
+    for key, condition in (query or {}).items():
+        if key == "$or":
+            if not any(matches(document, sub) for sub in condition):
+                return False
+        elif key == "$and":
+            if not all(matches(document, sub) for sub in condition):
+                return False
+        elif key == "$nor":
+            if any(matches(document, sub) for sub in condition):
+                return False
+        elif not _matches_condition(_resolve(document, key), condition):
+            return False
+    return True
+
+
+def _project(document: Dict[str, Any], projection: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    if not projection:
+        return copy.deepcopy(document)
+    included = {k for k, v in projection.items() if v}
+    excluded = {k for k, v in projection.items() if not v}
+    if included:
+        result = {k: copy.deepcopy(v) for k, v in document.items() if k in included}
+        if "_id" not in excluded and "_id" in document:
+            result["_id"] = document["_id"]
+        return result
+    return {k: copy.deepcopy(v) for k, v in document.items() if k not in excluded}
+
+
+class InMemoryCursor:
+    """Lazy cursor supporting sort/skip/limit and iteration"""
+
+    def __init__(self, collection: "InMemoryCollection", query, projection):
+        self._collection = collection
+        self._query = query
+        self._projection = projection
+        self._sort: List = []
+        self._skip = 0
+        self._limit = 0
+
+    def sort(self, key_or_list, direction: int = 1):
+        if isinstance(key_or_list, str):
+            self._sort = [(key_or_list, direction)]
+        else:
+            self._sort = list(key_or_list)
+        return self
+
+    def skip(self, count: int):
+        self._skip = count
+        return self
+
+    def limit(self, count: int):
+        self._limit = count
+        return self
+
+    def __iter__(self):
+        documents = self._collection._scan(self._query)
+        for key, direction in reversed(self._sort):
+            documents.sort(key=lambda d: (_resolve(d, key) is None, _resolve(d, key)), reverse=direction < 0)
+        documents = documents[self._skip:]
+        if self._limit:
+            documents = documents[:self._limit]
+        for document in documents:
+            yield _project(document, self._projection)
+
+
+class InMemoryCollection:
+    """
+    Thread-safe in-memory stand-in for a pymongo Collection.
+    `latency` (seconds, or a zero-arg callable returning seconds) is slept on every
+    round trip to approximate Atlas network time.
+    """
+
+    def __init__(self, name: str = "story_segments", documents: Iterable[Dict[str, Any]] = (),
+                 latency: Any = 0.0):
+        self.name = name
+        self._documents: Dict[Any, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+        self.latency = latency
+        self.stats = CallStats()
+        self.insert_many(documents)
+
+    def _round_trip(self, operation: str):
+        self.stats.enter(operation)
+        delay = self.latency() if callable(self.latency) else self.latency
+        if delay:
+            time.sleep(delay)
+
+    def _scan(self, query) -> List[Dict[str, Any]]:
+        with self._lock:
+            return [d for d in self._documents.values() if matches(d, query)]
+
+    def find_one(self, query=None, projection=None, **kwargs):
+        self._round_trip("find_one")
+        try:
+            for document in self._scan(query):
+                return _project(document, projection)
+            return None
+        finally:
+            self.stats.exit()
+
+    def find(self, query=None, projection=None, **kwargs):
+        self._round_trip("find")
+        try:
+            return InMemoryCursor(self, query, projection)
+        finally:
+            self.stats.exit()
+
+    def count_documents(self, query, **kwargs) -> int:
+        self._round_trip("count_documents")
+        try:
+            return len(self._scan(query))
+        finally:
+            self.stats.exit()
+
+    def estimated_document_count(self, **kwargs) -> int:
+        with self._lock:
+            return len(self._documents)
+
+    def insert_one(self, document: Dict[str, Any]):
+        document = copy.deepcopy(document)
+        document.setdefault("_id", f"doc_{len(self._documents)}")
+        with self._lock:
+            self._documents[document["_id"]] = document
+        return SimpleNamespace(inserted_id=document["_id"])
+
+    def insert_many(self, documents: Iterable[Dict[str, Any]]):
+        ids = [self.insert_one(d).inserted_id for d in documents]
+        return SimpleNamespace(inserted_ids=ids)
+
+    def update_one(self, query, update, upsert: bool = False):
+        self._round_trip("update_one")
+        try:
+            with self._lock:
+                for document in self._documents.values():
+                    if matches(document, query):
+                        for key, value in update.get("$set", {}).items():
+                            document[key] = copy.deepcopy(value)
+                        return SimpleNamespace(matched_count=1, modified_count=1)
+            return SimpleNamespace(matched_count=0, modified_count=0)
+        finally:
+            self.stats.exit()
+
+    def delete_many(self, query):
+        with self._lock:
+            doomed = [k for k, d in self._documents.items() if matches(d, query)]
+            for key in doomed:
+                del self._documents[key]
+        return SimpleNamespace(deleted_count=len(doomed))
+
+
+def fixed_latency(seconds: float) -> Callable[[], float]:
+    return lambda: seconds
+
+
+def lognormal_latency(median: float, sigma: float = 1.0, seed: Optional[int] = None) -> Callable[[], float]:
+    """Heavy-tailed latency: most calls near the median, a long tail of slow ones"""
+    rng = random.Random(seed)
+    lock = threading.Lock()
+    mu = math.log(median)
+
+    def sample() -> float:
+        with lock:
+            return rng.lognormvariate(mu, sigma)
+    return sample
+
+
+class FakeTTSClient:
+    """
+    Stand-in for texttospeech.TextToSpeechClient.synthesize_speech.
+    Returns `payload_bytes` of MP3-looking audio (or bytes_per_char * len(text)
+    when payload_bytes is None) after sleeping for the configured latency.
+    """
+
+    def __init__(self, latency: Any = 0.2, payload_bytes: Optional[int] = 64 * 1024,
+                 bytes_per_char: int = 60, failure_rate: float = 0.0, seed: Optional[int] = None):
+        self.latency = latency
+        self.payload_bytes = payload_bytes
+        self.bytes_per_char = bytes_per_char
+        self.failure_rate = failure_rate
+        self.stats = CallStats()
+        self._rng = random.Random(seed)
+
+    def synthesize_speech(self, input=None, voice=None, audio_config=None, timeout=None, **kwargs):
+        self.stats.enter("synthesize_speech")
+        try:
+            delay = self.latency() if callable(self.latency) else self.latency
+            if timeout is not None and delay > timeout:
+                time.sleep(max(0.0, timeout))
+                raise TimeoutError(f"Fake TTS deadline exceeded after {timeout:.3f}s")
+            if delay:
+                time.sleep(delay)
+            if self.failure_rate and self._rng.random() < self.failure_rate:
+                raise RuntimeError("Fake TTS transient failure")
+            text = getattr(input, "text", None) or getattr(input, "ssml", "") or ""
+            size = self.payload_bytes if self.payload_bytes is not None else len(text) * self.bytes_per_char
+            # MPEG-1 Layer III frame sync header followed by filler
+            audio = b"\xff\xfb\x90\x64" + b"\x00" * max(0, size - 4)
+            return SimpleNamespace(audio_content=audio)
+        finally:
+            self.stats.exit()
+
+
+class _PreconditionFailed(Exception):
+    code = 412
+
+
+class FakeGCSBlob:
+    def __init__(self, bucket: "FakeGCSBucket", name: str):
+        self.bucket = bucket
+        self.name = name
+        self.cache_control = None
+
+    @property
+    def size(self) -> int:
+        return len(self.bucket.objects[self.name])
+
+    @property
+    def public_url(self) -> str:
+        return f"https://storage.googleapis.com/{self.bucket.name}/{self.name}"
+
+    def exists(self) -> bool:
+        self.bucket.stats.enter("exists")
+        try:
+            return self.name in self.bucket.objects
+        finally:
+            self.bucket.stats.exit()
+
+    def upload_from_string(self, data: bytes, content_type: str = None, if_generation_match: Optional[int] = None):
+        self.bucket.stats.enter("upload")
+        try:
+            with self.bucket.lock:
+                if if_generation_match == 0 and self.name in self.bucket.objects:
+                    raise _PreconditionFailed(f"{self.name} already exists")
+                self.bucket.objects[self.name] = bytes(data)
+        finally:
+            self.bucket.stats.exit()
+
+    def download_as_bytes(self) -> bytes:
+        return self.bucket.objects[self.name]
+
+    def open(self, mode: str = "rb"):
+        return io.BytesIO(self.bucket.objects[self.name])
+
+    def generate_signed_url(self, version: str = "v4", expiration=None, method: str = "GET") -> str:
+        return f"{self.public_url}?X-Goog-Signature=fake"
+
+
+class FakeGCSBucket:
+    def __init__(self, name: str):
+        self.name = name
+        self.objects: Dict[str, bytes] = {}
+        self.lock = threading.Lock()
+        self.stats = CallStats()
+
+    def blob(self, name: str) -> FakeGCSBlob:
+        return FakeGCSBlob(self, name)
+
+    def get_blob(self, name: str) -> Optional[FakeGCSBlob]:
+        return FakeGCSBlob(self, name) if name in self.objects else None
+
+
+class FakeGCSClient:
+    """In-memory stand-in for storage.Client, enough for functions.blob_store.GCSBlobStore"""
+
+    def __init__(self):
+        self.buckets: Dict[str, FakeGCSBucket] = {}
+
+    def bucket(self, name: str) -> FakeGCSBucket:
+        return self.buckets.setdefault(name, FakeGCSBucket(name))
+
+
+def build_corpus(base: Dict[str, Dict[str, Any]], extra_segments: int = 0, seed: int = 7) -> List[Dict[str, Any]]:
+    """
+    Copy the base story graph and optionally pad it with generated segments so
+    search scans and graph walks can be measured on larger corpora.
+    """
+    rng = random.Random(seed)
+    documents = [copy.deepcopy(doc) for doc in base.values()]
+    words = [w for doc in documents for w in re.findall(r"[a-zA-Z]{4,}", doc.get("content", ""))]
+    for i in range(extra_segments):
+        segment_id = f"generated_{i}"
+        next_ids = [f"generated_{j}" for j in (2 * i + 1, 2 * i + 2) if j < extra_segments]
+        documents.append({
+            "_id": segment_id,
+            "title": " ".join(rng.sample(words, 3)).title(),
+            "content": " ".join(rng.choice(words) for _ in range(120)),
+            "choices": [{"id": n, "text": f"Go to {n}"} for n in next_ids],
+        })
+    return documents
@@ -0,0 +1,229 @@
+"""
+RadioQuest Broadcast - one continuous MP3 stream shared by every listener
+A single producer thread plays a schedule of story segments (a fixed episode path
+or the vote-winning branch), cutting each cached MP3 into frame-aligned chunks
+and publishing them into a ring buffer in real time. Listeners only keep a read
+position into that buffer, so each extra listener costs one wake-up per chunk
+and no extra memory, Icecast-style. A local transmitter relay can pull this one
+stream instead of every radio fetching files.
+"""
+
+import logging
+import threading
+import time
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# --- MP3 frame parsing ---
+_BITRATES_KBPS = {
+    1: [0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320],   # MPEG-1 Layer III
+    2: [0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160],       # MPEG-2/2.5 Layer III
+}
+_SAMPLE_RATES = {3: (44100, 48000, 32000), 2: (22050, 24000, 16000), 0: (11025, 12000, 8000)}
+
+
+def _skip_id3(data: bytes) -> int:
+    if data[:3] == b"ID3" and len(data) >= 10:
+        size = (data[6] << 21) | (data[7] << 14) | (data[8] << 7) | data[9]
+        return 10 + size
+    return 0
+
+
+def mp3_frames(data: bytes) -> Iterator[Tuple[bytes, float]]:
+    """Yield (frame, duration_seconds) for each Layer III frame, skipping tags and junk"""
+    position = _skip_id3(data)
+    end = len(data)
+    while position + 4 <= end:
+        b1, b2 = data[position + 1], data[position + 2]
+        version_bits = (b1 >> 3) & 0x3
+        if data[position] != 0xFF or (b1 & 0xE0) != 0xE0 or version_bits == 1 or ((b1 >> 1) & 0x3) != 1:
+            position += 1
+            continue
+        bitrate_index, rate_index = b2 >> 4, (b2 >> 2) & 0x3
+        if bitrate_index in (0, 15) or rate_index == 3:
+            position += 1
+            continue
+        mpeg1 = version_bits == 3
+        bitrate = _BITRATES_KBPS[1 if mpeg1 else 2][bitrate_index] * 1000
+        sample_rate = _SAMPLE_RATES[version_bits][rate_index]
+        padding = (b2 >> 1) & 0x1
+        length = (144 if mpeg1 else 72) * bitrate // sample_rate + padding
+        if position + length > end:
+            break
+        yield data[position:position + length], (1152 if mpeg1 else 576) / sample_rate
+        position += length
+
+
+def chunk_frames(data: bytes, chunk_seconds: float) -> List[Tuple[bytes, float]]:
+    """Group frames into (chunk, duration) pieces of about chunk_seconds each"""
+    chunks = []
+    frames: List[bytes] = []
+    duration = 0.0
+    for frame, frame_duration in mp3_frames(data):
+        frames.append(frame)
+        duration += frame_duration
+        if duration >= chunk_seconds:
+            chunks.append((b"".join(frames), duration))
+            frames, duration = [], 0.0
+    if frames:
+        chunks.append((b"".join(frames), duration))
+    return chunks
+
+
+# --- Shared buffer ---
+class RingBuffer:
+    """Fixed number of chunk slots; readers address chunks by an ever-increasing sequence number"""
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self._slots: List[Optional[bytes]] = [None] * capacity
+        self.head = 0  # sequence number of the next chunk to be written
+        self.condition = threading.Condition()
+
+    def append(self, chunk: bytes):
+        with self.condition:
+            self._slots[self.head % self.capacity] = chunk
+            self.head += 1
+            self.condition.notify_all()
+
+    def read(self, sequence: int, timeout: float) -> Tuple[List[bytes], int]:
+        """Chunks from `sequence` on, waiting up to timeout for new ones; returns (chunks, next sequence)"""
+        with self.condition:
+            if sequence >= self.head:
+                self.condition.wait(timeout)
+            # A listener that fell a whole buffer behind skips ahead instead of replaying stale audio
+            sequence = max(sequence, self.head - self.capacity)
+            chunks = [self._slots[s % self.capacity] for s in range(sequence, self.head)]
+            return chunks, self.head
+
+
+# --- Station ---
+class BroadcastStation:
+    """
+    Plays segments one after another into a RingBuffer.
+    `next_segment(previous_id)` returns the id to play next (None to start over),
+    `audio_for(segment_id)` the MP3 bytes for a segment (None to skip it).
+    The producer starts with the first listener and stops after idle_seconds alone.
+    """
+
+    def __init__(self, next_segment: Callable[[Optional[str]], Optional[str]],
+                 audio_for: Callable[[str], Optional[bytes]], chunk_seconds: float = 0.5,
+                 buffer_seconds: float = 30.0, preroll_seconds: float = 2.0, max_listeners: int = 4,
+                 idle_seconds: float = 30.0):
+        self.next_segment = next_segment
+        self.audio_for = audio_for
+        self.chunk_seconds = chunk_seconds
+        self.buffer = RingBuffer(max(4, int(buffer_seconds / chunk_seconds)))
+        self.preroll_chunks = int(preroll_seconds / chunk_seconds)
+        self.max_listeners = max_listeners
+        self.idle_seconds = idle_seconds
+        self.listeners = 0
+        self.now_playing: Optional[str] = None
+        self.started_at: Optional[float] = None
+        self._lock = threading.Lock()
+        self._producer: Optional[threading.Thread] = None
+
+    def _ensure_producer(self):
+        if self._producer is None or not self._producer.is_alive():
+            self._producer = threading.Thread(target=self._run, name="broadcast-producer", daemon=True)
+            self._producer.start()
+
+    def _run(self):
+        logger.info("Broadcast producer started")
+        self.started_at = time.monotonic()
+        deadline = time.monotonic()
+        idle_since: Optional[float] = None
+        segment_id: Optional[str] = None
+        played_any = False
+        while True:
+            with self._lock:
+                if self.listeners == 0:
+                    idle_since = idle_since or time.monotonic()
+                    if time.monotonic() - idle_since > self.idle_seconds:
+                        self._producer = None
+                        self.now_playing = None
+                        logger.info("Broadcast producer stopped (no listeners)")
+                        return
+                else:
+                    idle_since = None
+
+            segment_id = self.next_segment(segment_id)
+            if segment_id is None:
+                if not played_any:
+                    # Nothing in the schedule has audio yet; don't spin
+                    time.sleep(5)
+                played_any = False
+                continue
+            try:
+                audio = self.audio_for(segment_id)
+            except Exception as e:
+                logger.error(f"Broadcast audio for {segment_id} failed: {e}")
+                audio = None
+            chunks = chunk_frames(audio, self.chunk_seconds) if audio else []
+            if not chunks:
+                continue
+            played_any = True
+            self.now_playing = segment_id
+            # Real-time pacing: publish each chunk when the previous one has finished playing
+            deadline = max(deadline, time.monotonic() - self.chunk_seconds * self.preroll_chunks)
+            for chunk, duration in chunks:
+                delay = deadline - time.monotonic()
+                if delay > 0:
+                    time.sleep(delay)
+                self.buffer.append(chunk)
+                deadline += duration
+
+    def connect(self) -> Optional["Listener"]:
+        """Admit a listener, or None when the station is full (each listener holds a request thread)"""
+        with self._lock:
+            if self.listeners >= self.max_listeners:
+                return None
+            self.listeners += 1
+            self._ensure_producer()
+        return Listener(self, max(0, self.buffer.head - self.preroll_chunks))
+
+    def _disconnect(self):
+        with self._lock:
+            self.listeners -= 1
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "now_playing": self.now_playing,
+            "listeners": self.listeners,
+            "max_listeners": self.max_listeners,
+            "on_air": self._producer is not None and self._producer.is_alive(),
+            "buffered_chunks": min(self.buffer.head, self.buffer.capacity),
+        }
+
+
+class Listener:
+    """
+    One listener's read position. An iterator rather than a generator so that
+    close() releases the slot even if the response is dropped before streaming.
+    """
+
+    def __init__(self, station: BroadcastStation, sequence: int):
+        self.station = station
+        self.sequence = sequence
+        self._pending: List[bytes] = []
+        self._closed = False
+
+    def __iter__(self):
+        return self
+
+    def __next__(self) -> bytes:
+        if self._closed:
+            raise StopIteration
+        while not self._pending:
+            # Starting with a short preroll lets playback begin at once
+            self._pending, self.sequence = self.station.buffer.read(self.sequence,
+                                                                    timeout=self.station.chunk_seconds * 4)
+            self._pending.reverse()
+        return self._pending.pop()
+
+    def close(self):
+        if not self._closed:
+            self._closed = True
+            self.station._disconnect()
+
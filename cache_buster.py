@@ -1,23 +1,304 @@
+"""
+RadioQuest static asset build - content-hashed filenames and precompression.
+
+Copies every file under static/ into static/dist/ with a content hash in its name
+(css/style.css -> css/style.3f9a1c2b7d.css), rewrites url(...) references inside
+CSS to the hashed URLs, writes .gz/.br siblings for compressible assets and
+records everything in static/dist/manifest.json. Templates resolve assets through
+the manifest (asset_url), and /assets/ serves the hashed files with immutable
+caching, so unchanged assets keep their URL - and their client cache - across deploys.
+
+Raster images under static/images/ that a template or stylesheet references
+additionally get resized AVIF/WebP/JPEG variants (see IMAGE_WIDTHS) for CSS
+image-set() via responsive_background(); the bytes each page
+load saves are written to static/dist/image-report.json. Needs Pillow; without it
+the image stage is skipped and pages keep using the original files.
+
+Run at image build time (see Dockerfile):  python cache_buster.py
+"""
+
+import gzip
+import hashlib
+import json
 import os
 import re
-import time
-
-# Get current timestamp
-version = int(time.time())
-css_dir = os.path.join('static', 'css')
-
-for filename in os.listdir(css_dir):
-    if filename.endswith('.css'):
-        filepath = os.path.join(css_dir, filename)
-        with open(filepath, 'r', encoding='utf-8') as f:
-            content = f.read()
-        # Only add ?v= if not already present
-        def cache_bust(match):
-            url = match.group(1)
-            if '?' in url:
-                return f"url({url})"
-            return f"url({url}?v={version})"
-        new_content = re.sub(r"url\(([^)]+)\)", cache_bust, content)
-        with open(filepath, 'w', encoding='utf-8') as f:
-            f.write(new_content)
-        print(f"Updated {filename} with cache-busting params") 
\ No newline at end of file
+import shutil
+from io import BytesIO
+
+try:
+    import brotli
+except ImportError:  # .br variants are skipped; gzip is always produced
+    brotli = None
+
+try:
+    from PIL import Image, features
+except ImportError:  # image variants are skipped
+    Image = None
+
+STATIC_DIR = "static"
+DIST_DIR = os.path.join(STATIC_DIR, "dist")
+MANIFEST_PATH = os.path.join(DIST_DIR, "manifest.json")
+IMAGE_REPORT_PATH = os.path.join(DIST_DIR, "image-report.json")
+TEMPLATES_DIR = "templates"
+ASSET_URL_PREFIX = "/assets/"
+HASH_LENGTH = 10
+COMPRESSIBLE_EXTENSIONS = {".css", ".js", ".svg", ".json", ".txt", ".html", ".map", ".webmanifest"}
+# --- Image variants ---
+IMAGE_DIR = "images/"
+IMAGE_EXTENSIONS = {".jpg", ".jpeg", ".png"}
+# Target widths; the original width is always added so large screens never upscale
+IMAGE_WIDTHS = (480, 960, 1600)
+# Best first: what a browser picks when it supports several types
+IMAGE_FORMATS = (
+    ("avif", "image/avif", ".avif", {"quality": 55}),
+    ("webp", "image/webp", ".webp", {"quality": 75, "method": 6}),
+    ("jpeg", "image/jpeg", ".jpg", {"quality": 80, "optimize": True, "progressive": True}),
+)
+# Formats every browser decodes; other sources (e.g. an AVIF saved as .jpg) get a JPEG fallback
+UNIVERSAL_FORMATS = ("jpeg", "png")
+# Viewports used for the bytes-saved report: (label, CSS px width, device pixel ratio)
+REPORT_VIEWPORTS = (("phone", 360, 1), ("phone_hidpi", 360, 2), ("desktop", 1440, 1))
+IMAGE_REF_RE = re.compile(r"(?:/static/)?(images/[A-Za-z0-9_./-]+\.(?:jpe?g|png))")
+# Rewrite local url(...) references: url('/static/images/x.jpg?v=1') or url(../images/x.jpg)
+CSS_URL_RE = re.compile(r"url\(\s*(['\"]?)([^)'\"]+)\1\s*\)")
+
+
+def file_hash(data):
+    return hashlib.sha256(data).hexdigest()[:HASH_LENGTH]
+
+
+def hashed_name(rel_path, digest):
+    root, ext = os.path.splitext(rel_path)
+    return f"{root}.{digest}{ext}"
+
+
+def source_files():
+    """Relative paths of all source assets (everything under static/ except dist/)"""
+    for dirpath, dirnames, filenames in os.walk(STATIC_DIR):
+        dirnames[:] = [d for d in dirnames if os.path.join(dirpath, d) != DIST_DIR]
+        for filename in sorted(filenames):
+            if filename.startswith("."):
+                continue
+            yield os.path.relpath(os.path.join(dirpath, filename), STATIC_DIR).replace(os.sep, "/")
+
+
+def rewrite_css_urls(css, css_rel_path, manifest):
+    """Point url(...) references at hashed asset URLs"""
+    css_dir = os.path.dirname(css_rel_path)
+
+    def replace(match):
+        quote, url = match.group(1), match.group(2).strip()
+        if url.startswith(("data:", "http:", "https:", "//", "#")):
+            return match.group(0)
+        path = url.split("?", 1)[0].split("#", 1)[0]
+        if path.startswith("/static/"):
+            rel = path[len("/static/"):]
+        elif path.startswith("/"):
+            return match.group(0)
+        else:
+            rel = os.path.normpath(os.path.join(css_dir, path)).replace(os.sep, "/")
+        if rel not in manifest:
+            return match.group(0)
+        return f"url({quote}{ASSET_URL_PREFIX}{manifest[rel]}{quote})"
+
+    return CSS_URL_RE.sub(replace, css)
+
+
+def write_compressed_variants(path, data):
+    """Write .gz (and .br) siblings when they are actually smaller; returns encodings written"""
+    encodings = []
+    gz = gzip.compress(data, compresslevel=9, mtime=0)
+    if len(gz) < len(data):
+        with open(path + ".gz", "wb") as f:
+            f.write(gz)
+        encodings.append("gzip")
+    if brotli is not None:
+        br = brotli.compress(data, quality=11)
+        if len(br) < len(data):
+            with open(path + ".br", "wb") as f:
+                f.write(br)
+            encodings.append("br")
+    return encodings
+
+
+def supported_image_formats():
+    if Image is None:
+        return []
+    available = []
+    for name, mime, ext, options in IMAGE_FORMATS:
+        if name == "jpeg" or features.check(name):
+            available.append((name, mime, ext, options))
+    return available
+
+
+def image_widths(original_width):
+    return sorted({w for w in IMAGE_WIDTHS if w < original_width} | {original_width})
+
+
+def build_image_variants(rel, hashed_original, formats):
+    """
+    Resize and re-encode one image; returns its manifest entry. The hashed original
+    is always a variant, and re-encodes that are not smaller than it are dropped
+    (the sources are often already well-compressed JPEGs) - except the JPEG
+    fallback for sources in a format older browsers cannot decode.
+    """
+    with Image.open(os.path.join(STATIC_DIR, rel)) as source:
+        source.load()
+        source_format = source.format.lower()
+        image = source.convert("RGB")
+    original_width, original_height = image.size
+    original_bytes = os.path.getsize(os.path.join(STATIC_DIR, rel))
+    variants = [{"file": hashed_original, "width": original_width, "format": source_format,
+                 "type": Image.MIME.get(source.format, "image/jpeg"), "bytes": original_bytes}]
+    fallback = source_format if source_format in UNIVERSAL_FORMATS else "jpeg"
+    root = os.path.splitext(rel)[0]
+    for width in image_widths(original_width):
+        height = round(original_height * width / original_width)
+        resized = image if width == original_width else image.resize((width, height), Image.LANCZOS)
+        for name, mime, ext, options in formats:
+            if name == source_format and width == original_width:
+                continue
+            buffer = BytesIO()
+            resized.save(buffer, format=name.upper(), **options)
+            data = buffer.getvalue()
+            needed_fallback = name == fallback != source_format
+            if len(data) >= original_bytes and not needed_fallback:
+                continue
+            target_rel = f"{root}.{width}w.{file_hash(data)}{ext}"
+            with open(os.path.join(DIST_DIR, target_rel), "wb") as f:
+                f.write(data)
+            variants.append({"file": target_rel, "width": width, "format": name, "type": mime,
+                             "bytes": len(data)})
+    variants.sort(key=lambda v: (v["format"], v["width"]))
+    return {"width": original_width, "height": original_height, "fallback": fallback, "variants": variants}
+
+
+def pick_variant(entry, pixel_width, format_name):
+    """The variant a browser would load: smallest that covers the width, else the largest"""
+    candidates = sorted((v for v in entry["variants"] if v["format"] == format_name), key=lambda v: v["width"])
+    if not candidates:
+        return None
+    for variant in candidates:
+        if variant["width"] >= pixel_width:
+            return variant
+    return candidates[-1]
+
+
+def referenced_images():
+    """Images named anywhere in templates/ or the stylesheets; unreferenced ones get no variants"""
+    refs = set()
+    sources = [os.path.join(TEMPLATES_DIR, name) for name in sorted(os.listdir(TEMPLATES_DIR))
+               if name.endswith(".html")] if os.path.isdir(TEMPLATES_DIR) else []
+    sources += [os.path.join(STATIC_DIR, rel) for rel in source_files() if rel.endswith(".css")]
+    for path in sources:
+        with open(path, encoding="utf-8") as f:
+            refs.update(IMAGE_REF_RE.findall(f.read()))
+    return refs
+
+
+def page_images(images):
+    """Map each template to the images it references (via responsive_background())"""
+    pages = {}
+    if not os.path.isdir(TEMPLATES_DIR):
+        return pages
+    for filename in sorted(os.listdir(TEMPLATES_DIR)):
+        if not filename.endswith(".html"):
+            continue
+        with open(os.path.join(TEMPLATES_DIR, filename), encoding="utf-8") as f:
+            html = f.read()
+        refs = set(IMAGE_REF_RE.findall(html)) & set(images)
+        if refs:
+            pages[filename] = sorted(refs)
+    return pages
+
+
+def image_report(images, original_sizes):
+    """Bytes a page load transfers for its images, original files vs best variants"""
+    report = {"images": {}, "pages": {}}
+    for rel, entry in images.items():
+        rows = {}
+        for label, css_width, dpr in REPORT_VIEWPORTS:
+            row = {"original_bytes": original_sizes[rel]}
+            for name, _, _, _ in IMAGE_FORMATS:
+                variant = pick_variant(entry, css_width * dpr, name)
+                if variant:
+                    row[f"{name}_bytes"] = variant["bytes"]
+            rows[label] = row
+        report["images"][rel] = rows
+    for page, refs in page_images(images).items():
+        totals = {}
+        for label, _, _ in REPORT_VIEWPORTS:
+            original = sum(report["images"][rel][label]["original_bytes"] for rel in refs)
+            row = {"original_bytes": original}
+            for name, _, _, _ in IMAGE_FORMATS:
+                key = f"{name}_bytes"
+                if all(key in report["images"][rel][label] for rel in refs):
+                    row[key] = sum(report["images"][rel][label][key] for rel in refs)
+                    row[f"{name}_saved_bytes"] = original - row[key]
+            totals[label] = row
+        report["pages"][page] = {"images": refs, "viewports": totals}
+    return report
+
+
+def print_image_report(report):
+    for page, info in report["pages"].items():
+        print(f"{page}: {', '.join(info['images'])}")
+        for label, row in info["viewports"].items():
+            savings = ", ".join(f"{name} {row[f'{name}_bytes']} B (saves {row[f'{name}_saved_bytes']})"
+                                for name, _, _, _ in IMAGE_FORMATS if f"{name}_bytes" in row)
+            print(f"  {label:<12} original {row['original_bytes']} B -> {savings}")
+
+
+def build():
+    if os.path.isdir(DIST_DIR):
+        shutil.rmtree(DIST_DIR)
+    os.makedirs(DIST_DIR)
+
+    files = list(source_files())
+    # Non-CSS assets first so CSS can reference their hashed names
+    files.sort(key=lambda rel: rel.endswith(".css"))
+
+    manifest = {}
+    details = {}
+    images = {}
+    original_sizes = {}
+    formats = supported_image_formats()
+    if not formats:
+        print("Pillow not installed; skipping image variants")
+    referenced = referenced_images() if formats else set()
+    for rel in files:
+        with open(os.path.join(STATIC_DIR, rel), "rb") as f:
+            data = f.read()
+        if rel.endswith(".css"):
+            data = rewrite_css_urls(data.decode("utf-8"), rel, manifest).encode("utf-8")
+        target_rel = hashed_name(rel, file_hash(data))
+        target = os.path.join(DIST_DIR, target_rel)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        with open(target, "wb") as f:
+            f.write(data)
+        encodings = []
+        if os.path.splitext(rel)[1].lower() in COMPRESSIBLE_EXTENSIONS:
+            encodings = write_compressed_variants(target, data)
+        manifest[rel] = target_rel
+        details[rel] = {"file": target_rel, "bytes": len(data), "encodings": encodings}
+        print(f"{rel} -> {target_rel} {' '.join(encodings)}".rstrip())
+        if rel in referenced and rel.startswith(IMAGE_DIR) and os.path.splitext(rel)[1].lower() in IMAGE_EXTENSIONS:
+            images[rel] = build_image_variants(rel, target_rel, formats)
+            original_sizes[rel] = len(data)
+            print("  " + " ".join(f"{v['width']}w.{v['format']}" for v in images[rel]["variants"]))
+
+    with open(MANIFEST_PATH, "w") as f:
+        json.dump({"assets": manifest, "details": details, "images": images}, f, indent=2, sort_keys=True)
+    print(f"Wrote {MANIFEST_PATH} ({len(manifest)} assets, {len(images)} responsive images)")
+
+    if images:
+        report = image_report(images, original_sizes)
+        with open(IMAGE_REPORT_PATH, "w") as f:
+            json.dump(report, f, indent=2, sort_keys=True)
+        print_image_report(report)
+        print(f"Wrote {IMAGE_REPORT_PATH}")
+    return manifest
+
+
+if __name__ == "__main__":
+    build()
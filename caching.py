@@ -0,0 +1,137 @@
+"""
+RadioQuest Caching - small in-process caching primitives
+- TTLCache: bounded LRU cache whose entries also expire after a TTL
+- SingleFlight: coalesces concurrent calls for the same key into one backend call
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+_MISSING = object()
+
+
+class TTLCache:
+    """Thread-safe LRU cache with per-entry expiry"""
+
+    def __init__(self, maxsize: int = 512, ttl: float = 30.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key, _MISSING)
+            if entry is _MISSING or entry[0] <= now:
+                if entry is not _MISSING:
+                    del self._entries[key]
+                self.misses += 1
+                return default
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None):
+        expires = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._entries[key] = (expires, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, key: Hashable):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def keys(self):
+        with self._lock:
+            return list(self._entries)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "maxsize": self.maxsize,
+            "ttl_seconds": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / total, 4) if total else 0.0,
+        }
+
+
+class _Flight:
+    __slots__ = ("done", "result", "error", "waiters")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error: Optional[BaseException] = None
+        self.waiters = 0
+
+
+class SingleFlight:
+    """
+    Duplicate call suppression: while a call for `key` is in flight, later
+    callers for the same key wait for it and share its result (or exception)
+    instead of hitting the backend themselves.
+    """
+
+    def __init__(self):
+        self._flights: Dict[Hashable, _Flight] = {}
+        self._lock = threading.Lock()
+
+    def do(self, key: Hashable, fn: Callable[[], Any], timeout: Optional[float] = None,
+           rerun_if: Optional[Callable[[BaseException], bool]] = None) -> Tuple[Any, bool]:
+        """
+        Run fn() once per concurrent burst; returns (result, shared). A follower waits
+        at most `timeout` seconds for the leader (TimeoutError after that), and runs
+        its own fn() when the leader's error satisfies `rerun_if` (e.g. the leader ran
+        out of its own time budget, which says nothing about the follower's).
+        """
+        wait_until = None if timeout is None else time.monotonic() + timeout
+        while True:
+            with self._lock:
+                flight = self._flights.get(key)
+                if flight is not None:
+                    flight.waiters += 1
+                    leader = False
+                else:
+                    flight = _Flight()
+                    self._flights[key] = flight
+                    leader = True
+
+            if leader:
+                break
+            remaining = None if wait_until is None else max(0.0, wait_until - time.monotonic())
+            if not flight.done.wait(remaining):
+                raise TimeoutError(f"gave up after {timeout:.2f}s waiting for the in-flight call for {key!r}")
+            if flight.error is None:
+                return flight.result, True
+            if rerun_if is None or not rerun_if(flight.error):
+                raise flight.error
+
+        try:
+            flight.result = fn()
+        except BaseException as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._flights[key]
+            flight.done.set()
+        return flight.result, False
+
+    def in_flight(self) -> int:
+        return len(self._flights)
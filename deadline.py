@@ -0,0 +1,106 @@
+"""
+RadioQuest Deadlines - one time budget per request, shared by every call it makes
+gunicorn runs with --timeout 0, so nothing above the app stops a request whose
+TTS or MongoDB call hangs. Each request gets a Deadline (RADIOQUEST_REQUEST_BUDGET_MS)
+in flask.g; every downstream call takes the remaining budget as its timeout,
+and a call that can't fit in what's left is skipped instead of started, so the
+page goes out without audio rather than not at all.
+"""
+
+import contextlib
+import logging
+import os
+import time
+from typing import Callable, Optional
+
+import pymongo
+from flask import g, has_request_context
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BUDGET_MS = float(os.environ.get("RADIOQUEST_REQUEST_BUDGET_MS", "8000"))
+# Longest single synthesis call, even when the request has more budget than this
+TTS_TIMEOUT_S = float(os.environ.get("RADIOQUEST_TTS_TIMEOUT_S", "6"))
+# Not worth starting a synthesis with less than this left; the page renders without audio
+MIN_TTS_BUDGET_S = float(os.environ.get("RADIOQUEST_MIN_TTS_BUDGET_S", "1.5"))
+
+
+class DeadlineExceeded(TimeoutError):
+    pass
+
+
+class Deadline:
+    def __init__(self, budget_s: Optional[float], clock: Callable[[], float] = time.monotonic):
+        """budget_s=None never expires (background work, CLI tools)"""
+        self.budget_s = budget_s
+        self._clock = clock
+        self.started = clock()
+
+    @classmethod
+    def from_ms(cls, budget_ms: Optional[float] = None) -> "Deadline":
+        budget_ms = DEFAULT_BUDGET_MS if budget_ms is None else budget_ms
+        return cls(budget_ms / 1000.0 if budget_ms > 0 else None)
+
+    def elapsed(self) -> float:
+        return self._clock() - self.started
+
+    def remaining(self) -> Optional[float]:
+        """Seconds left (never negative), None when unlimited"""
+        if self.budget_s is None:
+            return None
+        return max(0.0, self.budget_s - self.elapsed())
+
+    @property
+    def expired(self) -> bool:
+        remaining = self.remaining()
+        return remaining is not None and remaining <= 0
+
+    def check(self, what: str = "request"):
+        if self.expired:
+            raise DeadlineExceeded(f"{what}: {self.budget_s * 1000:.0f} ms budget spent")
+
+    def timeout(self, cap: Optional[float] = None, minimum: float = 0.0, what: str = "call") -> Optional[float]:
+        """
+        Timeout for one downstream call: the remaining budget, at most `cap`.
+        Raises DeadlineExceeded when less than `minimum` is left to spend on it.
+        """
+        remaining = self.remaining()
+        if remaining is not None and (remaining <= 0 or remaining < minimum):
+            raise DeadlineExceeded(f"{what}: {remaining * 1000:.0f} ms left, needs {minimum * 1000:.0f} ms")
+        if remaining is None:
+            return cap
+        return remaining if cap is None else min(remaining, cap)
+
+    @contextlib.contextmanager
+    def mongo(self, what: str = "mongodb"):
+        """pymongo client-side timeout for every operation in the block"""
+        timeout = self.timeout(what=what)
+        if timeout is None:
+            yield
+            return
+        with pymongo.timeout(timeout):
+            yield
+
+    def trace(self) -> dict:
+        """Budget fields for a workflow step"""
+        info = {"elapsed_ms": round(self.elapsed() * 1000, 1)}
+        remaining = self.remaining()
+        if remaining is not None:
+            info["budget_remaining_ms"] = round(remaining * 1000, 1)
+        return info
+
+
+UNLIMITED = Deadline(None)
+
+
+def current() -> Deadline:
+    """The active request's deadline, or an unlimited one outside a request"""
+    if has_request_context():
+        return g.get("deadline") or UNLIMITED
+    return UNLIMITED
+
+
+def is_timeout(error: BaseException) -> bool:
+    """Our own DeadlineExceeded, a pymongo timeout or a gRPC/HTTP 504 from a Google client"""
+    return (isinstance(error, TimeoutError) or getattr(error, "timeout", False) is True
+            or getattr(error, "code", None) == 504)
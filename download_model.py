@@ -1,28 +1,62 @@
 from sentence_transformers import SentenceTransformer
+import argparse
 import os
+import shutil
 
-def download_model():
+import model_artifacts
+
+MODEL_NAME = 'all-MiniLM-L6-v2'
+SAVE_PATH = f'./models/{MODEL_NAME}'
+
+def download_model(model_name=MODEL_NAME, save_path=SAVE_PATH):
     """
-    Downloads the sentence-transformer model and saves it to the models directory.
+    Downloads the sentence-transformer model and saves it to the models directory
+    as safetensors, with an artifacts.json manifest (size + SHA-256 per file).
     """
-    model_name = 'all-MiniLM-L6-v2'
-    save_path = f'./models/{model_name}'
-
     print(f"Checking if model '{model_name}' exists at '{save_path}'...")
 
     if os.path.exists(save_path) and os.listdir(save_path):
-        print("Model already exists and is not empty. Skipping download.")
-        return
+        try:
+            model_artifacts.verify_artifacts(save_path)
+            print("Model already exists and matches its manifest. Skipping download.")
+            return True
+        except model_artifacts.ArtifactError as e:
+            print(f"Existing model failed verification ({e}). Downloading again...")
+    else:
+        print("Model not found or directory is empty. Downloading model...")
 
-    print("Model not found or directory is empty. Downloading model...")
-    
+    # Build the new copy next to the old one and swap it in only once it is complete
+    staging_path = f"{save_path}.partial"
+    shutil.rmtree(staging_path, ignore_errors=True)
     try:
         model = SentenceTransformer(model_name)
         print(f"Saving model to '{save_path}'...")
-        model.save(save_path)
-        print("Model downloaded and saved successfully!")
+        model.save(staging_path, safe_serialization=True)
+        weights = [name for _, _, names in os.walk(staging_path) for name in names if name.endswith(".safetensors")]
+        if not weights:
+            raise model_artifacts.ArtifactError("model was not saved as safetensors")
+        manifest = model_artifacts.write_manifest(staging_path, {"model": model_name})
+        shutil.rmtree(save_path, ignore_errors=True)
+        os.replace(staging_path, save_path)
+        print(f"Model downloaded and saved successfully! ({len(manifest['files'])} files in manifest)")
+        return True
     except Exception as e:
+        shutil.rmtree(staging_path, ignore_errors=True)
         print(f"An error occurred during model download: {e}")
+        return False
+
+def verify_model(save_path=SAVE_PATH):
+    try:
+        manifest = model_artifacts.verify_artifacts(save_path)
+        print(f"'{save_path}' matches its manifest ({len(manifest['files'])} files).")
+        return True
+    except model_artifacts.ArtifactError as e:
+        print(f"Verification failed: {e}")
+        return False
 
 if __name__ == "__main__":
-    download_model() 
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Download the embedding model as integrity-checked safetensors")
+    parser.add_argument("--verify", action="store_true", help="only check the saved model against its manifest")
+    args = parser.parse_args()
+    ok = verify_model() if args.verify else download_model()
+    raise SystemExit(0 if ok else 1)
@@ -0,0 +1,159 @@
+"""
+RadioQuest Episode Scheduler - warm caches ahead of each weekly episode drop
+The first minutes after an episode goes live are the slowest of the week: every
+segment, narration and page body is cold at the moment the whole audience
+arrives. The schedule (RADIOQUEST_EPISODES, a JSON list of
+{"name", "release", "root", "depth"}) says when each episode drops and where it
+starts; RADIOQUEST_EPISODE_LEAD_S before a release a background thread walks
+every branch reachable from the root and warms it through the app's `warm`
+callback.
+
+While an episode inside its window (from the lead time until
+RADIOQUEST_EPISODE_LIVE_S after release) hasn't finished warming, `ready` is
+False and /health answers 503, so a readiness or startup probe keeps traffic on
+instances that are already warm. An episode whose warming left something
+`missing` (e.g. narration that failed to render) is "partial": still not
+ready, and warmed again on the scheduler's next pass.
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+LEAD_S = float(os.environ.get("RADIOQUEST_EPISODE_LEAD_S", "900"))
+LIVE_S = float(os.environ.get("RADIOQUEST_EPISODE_LIVE_S", "3600"))
+# The thread re-reads the clock at least this often, so a suspended instance catches up
+MAX_SLEEP_S = 60.0
+
+
+@dataclass
+class Episode:
+    name: str
+    root: str
+    release_at: float  # epoch seconds
+    depth: int
+
+    @property
+    def release_iso(self) -> str:
+        return datetime.fromtimestamp(self.release_at, timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+def parse_release(value: str) -> float:
+    """ISO 8601 timestamp to epoch seconds; one without an offset is taken as UTC"""
+    moment = datetime.fromisoformat(value.strip().replace("Z", "+00:00"))
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+    return moment.timestamp()
+
+
+def load_schedule(path: Optional[str], default_depth: int) -> List[Episode]:
+    """Episodes from a JSON schedule file, oldest release first; [] when there is none"""
+    if not path:
+        return []
+    try:
+        with open(path) as f:
+            entries = json.load(f)
+        episodes = [Episode(name=entry.get("name") or entry["root"], root=entry["root"],
+                            release_at=parse_release(entry["release"]),
+                            depth=int(entry.get("depth", default_depth)))
+                    for entry in entries]
+    except (OSError, ValueError, KeyError, TypeError) as e:
+        logger.error(f"Could not load episode schedule {path}: {e}")
+        return []
+    return sorted(episodes, key=lambda episode: episode.release_at)
+
+
+class EpisodeScheduler:
+    """
+    Runs warm(episode) LEAD_S before each episode's release. `warm` returns a dict
+    of counts that is reported in status(); a non-zero "missing" count marks it
+    partial and it is warmed again until the count is 0 or the window closes. An
+    exception marks the episode failed (it is not retried, and does not hold
+    readiness back).
+    """
+
+    def __init__(self, episodes: List[Episode], warm: Callable[[Episode], Dict[str, Any]],
+                 lead_s: float = LEAD_S, live_s: float = LIVE_S, clock: Callable[[], float] = time.time):
+        self.episodes = episodes
+        self.warm = warm
+        self.lead_s = lead_s
+        self.live_s = live_s
+        self._clock = clock
+        self._status: Dict[str, Dict[str, Any]] = {episode.name: {"state": "scheduled"} for episode in episodes}
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+
+    @classmethod
+    def from_env(cls, warm: Callable[[Episode], Dict[str, Any]], default_depth: int) -> "EpisodeScheduler":
+        return cls(load_schedule(os.environ.get("RADIOQUEST_EPISODES"), default_depth), warm)
+
+    def in_window(self, episode: Episode, now: float) -> bool:
+        return episode.release_at - self.lead_s <= now < episode.release_at + self.live_s
+
+    def _state(self, episode: Episode) -> str:
+        with self._lock:
+            return self._status[episode.name]["state"]
+
+    def due(self, now: Optional[float] = None) -> List[Episode]:
+        """Episodes inside their window that haven't been warmed yet"""
+        now = self._clock() if now is None else now
+        return [episode for episode in self.episodes
+                if self.in_window(episode, now) and self._state(episode) in ("scheduled", "warming", "partial")]
+
+    @property
+    def ready(self) -> bool:
+        return not self.due()
+
+    def warm_episode(self, episode: Episode):
+        with self._lock:
+            attempts = self._status[episode.name].get("attempts", 0) + 1
+            self._status[episode.name] = {"state": "warming", "attempts": attempts}
+        logger.info(f"Warming episode {episode.name} ({episode.root}, depth {episode.depth}), "
+                    f"release {episode.release_iso}")
+        start = time.perf_counter()
+        try:
+            counts = self.warm(episode)
+            status = dict(counts or {})
+            status["state"] = "partial" if status.get("missing") else "warm"
+        except Exception as e:
+            logger.error(f"Warming episode {episode.name} failed: {e}")
+            status = {"state": "failed", "error": str(e)}
+        status["attempts"] = attempts
+        status["warm_seconds"] = round(time.perf_counter() - start, 2)
+        with self._lock:
+            self._status[episode.name] = status
+        logger.info(f"Episode {episode.name}: {status}")
+
+    def start(self):
+        """Start the warming thread (once per process; gunicorn workers each warm their own caches)"""
+        if not self.episodes or (self._thread is not None and self._thread.is_alive()):
+            return
+        self._thread = threading.Thread(target=self._run, name="episode-scheduler", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while True:
+            for episode in self.due():
+                self.warm_episode(episode)
+            now = self._clock()
+            if all(episode.release_at + self.live_s <= now for episode in self.episodes):
+                logger.info("Every scheduled episode has been released; scheduler stopping")
+                return
+            upcoming = [episode.release_at - self.lead_s - now for episode in self.episodes
+                        if episode.release_at - self.lead_s > now]
+            time.sleep(min([MAX_SLEEP_S] + upcoming))
+
+    def status(self) -> List[Dict[str, Any]]:
+        now = self._clock()
+        with self._lock:
+            return [dict(self._status[episode.name], name=episode.name, root=episode.root,
+                         release=episode.release_iso, depth=episode.depth,
+                         live=episode.release_at <= now < episode.release_at + self.live_s)
+                    for episode in self.episodes]
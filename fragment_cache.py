@@ -0,0 +1,134 @@
+"""
+RadioQuest Fragment Cache - cached server-side rendering of story pages
+story.html is rendered once per segment version with placeholder markers where
+the per-request fragments go (the "Previously on" recap and the choice vote
+counts). Each request then only fills those slots and stitches the page together.
+"""
+
+import logging
+import re
+from typing import Any, Callable, Dict, List, Optional
+
+from markupsafe import Markup
+
+import metrics
+from caching import TTLCache
+from versioning import VERSIONED_FIELDS
+
+logger = logging.getLogger(__name__)
+
+RECAP_TEMPLATE = "partials/recap.html"
+_MARKER_RE = re.compile(r"<!--fragment:([a-z_]+)(?::(.*?))?-->")
+
+
+class FragmentSlots:
+    """Passed to the template as `fragment_slots`; every dynamic value becomes a marker"""
+
+    recap = Markup("<!--fragment:recap-->")
+
+    @staticmethod
+    def votes(choice_id) -> Markup:
+        return Markup(f"<!--fragment:votes:{choice_id}-->")
+
+    @staticmethod
+    def vote_share(choice_id) -> Markup:
+        return Markup(f"<!--fragment:vote_share:{choice_id}-->")
+
+
+def _freeze(value: Any) -> Any:
+    if isinstance(value, dict):
+        return tuple(sorted((k, _freeze(v)) for k, v in value.items()))
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(v) for v in value)
+    return value
+
+
+def body_key(segment: Dict[str, Any]) -> tuple:
+    """
+    In-memory cache key covering every rendered field of a segment.
+    Cheaper per request than versioning.segment_version(): str hashes are cached
+    on the string objects, which are shared with the segment cache.
+    """
+    return tuple(_freeze(segment.get(field)) for field in VERSIONED_FIELDS)
+
+
+class FragmentCache:
+    """
+    Renders story pages from a cached static body plus per-request fragments.
+    `render_full(template_name, **context)` renders a whole template (normally
+    flask.render_template); `jinja_env` is used to render the recap partial.
+    """
+
+    def __init__(self, jinja_env, render_full: Callable[..., str], template: str = "story.html",
+                 maxsize: int = 256, ttl: float = 3600.0):
+        self.jinja_env = jinja_env
+        self.render_full = render_full
+        self.template = template
+        self._bodies = TTLCache(maxsize=maxsize, ttl=ttl)
+        # The recap only depends on (previous_story, last_choice), which take few distinct values
+        self._recaps = TTLCache(maxsize=128, ttl=ttl)
+
+    @staticmethod
+    def _split(html: str) -> List[Any]:
+        """Split a rendered body into static strings and (slot, argument) tuples"""
+        parts: List[Any] = []
+        position = 0
+        for match in _MARKER_RE.finditer(html):
+            parts.append(html[position:match.start()])
+            parts.append((match.group(1), match.group(2)))
+            position = match.end()
+        parts.append(html[position:])
+        return parts
+
+    def static_body(self, segment: Dict[str, Any]) -> List[Any]:
+        """The pre-split static body for this segment version, rendering it on a miss"""
+        key = body_key(segment)
+        body = self._bodies.get(key)
+        metrics.record_cache("story_fragment", body is not None)
+        if body is None:
+            html = self.render_full(self.template, segment=segment, vote_results={}, previous_story=None,
+                                    last_choice=None, fragment_slots=FragmentSlots())
+            body = self._split(html)
+            self._bodies.set(key, body)
+        return body
+
+    def _fill(self, slot: str, argument: Optional[str], context: Dict[str, Any]) -> str:
+        vote_results = context["vote_results"]
+        if slot == "votes":
+            return str(vote_results.get(argument, 0))
+        if slot == "vote_share":
+            # Same arithmetic and formatting as the Jinja expression in story.html
+            total_votes = sum(vote_results.values())
+            return str((vote_results.get(argument, 0) / total_votes * 100) if total_votes > 0 else 0)
+        if slot == "recap":
+            key = (context["previous_story"], context["last_choice"])
+            recap = self._recaps.get(key)
+            if recap is None:
+                recap = self.jinja_env.get_template(RECAP_TEMPLATE).render(**context)
+                self._recaps.set(key, recap)
+            return recap
+        raise KeyError(f"Unknown fragment slot: {slot}")
+
+    def render(self, segment: Dict[str, Any], vote_results: Dict[str, int],
+               previous_story: Optional[str] = None, last_choice: Optional[str] = None) -> str:
+        context = {
+            "segment": segment,
+            "vote_results": vote_results,
+            "previous_story": previous_story,
+            "last_choice": last_choice,
+        }
+        return "".join(part if isinstance(part, str) else self._fill(part[0], part[1], context)
+                       for part in self.static_body(segment))
+
+    def invalidate(self, story_id: Optional[str] = None):
+        """Drop cached bodies (all, or every version of one segment)"""
+        if story_id is None:
+            self._bodies.clear()
+            self._recaps.clear()
+            return
+        id_index = VERSIONED_FIELDS.index("_id")
+        for key in [k for k in self._bodies.keys() if k[id_index] == story_id]:
+            self._bodies.invalidate(key)
+
+    def stats(self) -> Dict[str, Any]:
+        return self._bodies.stats()
@@ -0,0 +1,205 @@
+"""
+RadioQuest Blob Store - content-addressed storage for rendered audio
+Shared by the web app (imported as functions.blob_store) and the Cloud Functions
+(deployed from this directory, imported as blob_store).
+
+Keys are content hashes of whatever produced the blob (text, voice, encoding...),
+so an edit to a segment's text yields a new key instead of overwriting or leaving
+stale audio under the segment id, and identical renders are stored once. Blobs
+are immutable: put() on an existing key is a no-op.
+
+Backends:
+- LocalBlobStore: a directory; served with send_file, i.e. sendfile(2) via the
+  WSGI file wrapper under gunicorn
+- GCSBlobStore: a Cloud Storage bucket; served by redirecting to the public or a
+  signed URL (benchmarks/standins.py has an in-memory bucket for local runs)
+"""
+
+import hashlib
+import logging
+import os
+import threading
+from datetime import timedelta
+from typing import IO, Optional
+
+logger = logging.getLogger(__name__)
+
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+KEY_LENGTH = 20
+
+
+def content_key(*parts: str, extension: str = "") -> str:
+    """Key for a blob derived from its inputs: same inputs, same key"""
+    material = "\x00".join(str(part) for part in parts)
+    return hashlib.sha256(material.encode("utf-8")).hexdigest()[:KEY_LENGTH] + extension
+
+
+def is_content_key(key: str) -> bool:
+    stem = os.path.splitext(key)[0]
+    return len(stem) == KEY_LENGTH and all(c in "0123456789abcdef" for c in stem)
+
+
+class BlobStore:
+    """Interface shared by the backends"""
+
+    def exists(self, key: str) -> bool:
+        raise NotImplementedError
+
+    def put(self, key: str, data: bytes, content_type: str) -> bool:
+        """Store data under key; returns False when the blob already existed (dedup)"""
+        raise NotImplementedError
+
+    def get(self, key: str) -> bytes:
+        raise NotImplementedError
+
+    def open(self, key: str) -> IO[bytes]:
+        """Binary file object for streaming reads"""
+        raise NotImplementedError
+
+    def size(self, key: str) -> int:
+        raise NotImplementedError
+
+    def url(self, key: str) -> str:
+        raise NotImplementedError
+
+    def serve(self, key: str, mimetype: str):
+        """Flask response delivering the blob"""
+        raise NotImplementedError
+
+
+class LocalBlobStore(BlobStore):
+    def __init__(self, root: str):
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+
+    def path(self, key: str) -> str:
+        if os.sep in key or key.startswith("."):
+            raise ValueError(f"Invalid blob key: {key}")
+        return os.path.join(self.root, key)
+
+    def exists(self, key: str) -> bool:
+        try:
+            return os.path.isfile(self.path(key))
+        except ValueError:
+            return False
+
+    def put(self, key: str, data: bytes, content_type: str) -> bool:
+        path = self.path(key)
+        if os.path.exists(path):
+            return False
+        # Write then rename so concurrent readers never see a partial file
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.part"
+        with open(tmp_path, "wb") as out:
+            out.write(data)
+        os.replace(tmp_path, path)
+        return True
+
+    def get(self, key: str) -> bytes:
+        with open(self.path(key), "rb") as f:
+            return f.read()
+
+    def open(self, key: str) -> IO[bytes]:
+        return open(self.path(key), "rb")
+
+    def size(self, key: str) -> int:
+        return os.path.getsize(self.path(key))
+
+    def url(self, key: str) -> str:
+        return f"/audio/{key}"
+
+    def serve(self, key: str, mimetype: str):
+        from flask import send_file
+        response = send_file(self.path(key), mimetype=mimetype, conditional=True)
+        if is_content_key(key):
+            response.headers["Cache-Control"] = IMMUTABLE_CACHE_CONTROL
+        return response
+
+
+class GCSBlobStore(BlobStore):
+    """
+    Blobs in a Cloud Storage bucket. With signed_urls the bucket can stay private
+    (needs credentials that can sign); otherwise objects are assumed publicly readable.
+    """
+
+    def __init__(self, bucket_name: str, client=None, signed_urls: bool = False,
+                 url_ttl: timedelta = timedelta(hours=12)):
+        if client is None:
+            from google.cloud import storage
+            client = storage.Client()
+        self.bucket = client.bucket(bucket_name)
+        self.signed_urls = signed_urls
+        self.url_ttl = url_ttl
+        # Blobs are immutable, so a key seen once never needs another existence check
+        self._known = set()
+        self._lock = threading.Lock()
+
+    def exists(self, key: str) -> bool:
+        if key in self._known:
+            return True
+        found = self.bucket.blob(key).exists()
+        if found:
+            with self._lock:
+                self._known.add(key)
+        return found
+
+    def put(self, key: str, data: bytes, content_type: str) -> bool:
+        if self.exists(key):
+            return False
+        blob = self.bucket.blob(key)
+        blob.cache_control = IMMUTABLE_CACHE_CONTROL
+        try:
+            # Only create: a concurrent writer of the same key already stored identical bytes
+            blob.upload_from_string(data, content_type=content_type, if_generation_match=0)
+            created = True
+        except Exception as e:
+            if getattr(e, "code", None) != 412:
+                raise
+            created = False
+        with self._lock:
+            self._known.add(key)
+        return created
+
+    def get(self, key: str) -> bytes:
+        return self.bucket.blob(key).download_as_bytes()
+
+    def open(self, key: str) -> IO[bytes]:
+        return self.bucket.blob(key).open("rb")
+
+    def size(self, key: str) -> int:
+        blob = self.bucket.get_blob(key)
+        if blob is None:
+            raise FileNotFoundError(key)
+        return blob.size
+
+    def url(self, key: str) -> str:
+        blob = self.bucket.blob(key)
+        if self.signed_urls:
+            return blob.generate_signed_url(version="v4", expiration=self.url_ttl, method="GET")
+        return blob.public_url
+
+    def serve(self, key: str, mimetype: str):
+        from flask import redirect
+        response = redirect(self.url(key), code=302)
+        # The target is immutable but a signed URL expires, so only cache the redirect briefly
+        response.headers["Cache-Control"] = "private, max-age=300" if self.signed_urls else "public, max-age=86400"
+        return response
+
+
+def from_env(default_root: str = "/tmp", client=None) -> BlobStore:
+    """
+    RADIOQUEST_BLOB_BACKEND=local (RADIOQUEST_AUDIO_DIR) or gcs
+    (RADIOQUEST_AUDIO_BUCKET, RADIOQUEST_AUDIO_SIGNED_URLS=1 for signed URLs)
+    """
+    backend = os.environ.get("RADIOQUEST_BLOB_BACKEND", "local").lower()
+    if backend == "gcs":
+        bucket = os.environ.get("RADIOQUEST_AUDIO_BUCKET", "radioquest-e1f5a-audio")
+        try:
+            store = GCSBlobStore(bucket, client=client,
+                                 signed_urls=os.environ.get("RADIOQUEST_AUDIO_SIGNED_URLS") == "1")
+            logger.info(f"Audio blob store: gs://{bucket}")
+            return store
+        except Exception as e:
+            logger.error(f"GCS blob store unavailable, falling back to local disk: {e}")
+    root = os.environ.get("RADIOQUEST_AUDIO_DIR", default_root)
+    logger.info(f"Audio blob store: {root}")
+    return LocalBlobStore(root)
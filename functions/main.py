@@ -2,27 +2,101 @@ import functions_framework
 from google.cloud import firestore, texttospeech, storage
 from datetime import datetime
 
+from blob_store import GCSBlobStore, content_key
+
+AUDIO_BUCKET = 'radioquest-e1f5a-audio'
+
+
+# Clients are created on first use and reused for every invocation this instance serves
+_clients = {}
+
+def _tts_client():
+    if 'tts' not in _clients:
+        _clients['tts'] = texttospeech.TextToSpeechClient()
+    return _clients['tts']
+
+def _audio_store():
+    if 'store' not in _clients:
+        _clients['store'] = GCSBlobStore(AUDIO_BUCKET, client=storage.Client())
+    return _clients['store']
+
+def _firestore_client():
+    if 'firestore' not in _clients:
+        _clients['firestore'] = firestore.Client()
+    return _clients['firestore']
+
+# Each draft is two writes (create post, delete draft); a batch holds at most 500
+PUBLISH_PAGE_SIZE = 200
+
+def publish_drafts(db, drafts):
+    """
+    Move drafts to posts in one atomic batch. The post keeps the draft's id, so
+    a retried publish rewrites the same post instead of adding a duplicate.
+    """
+    batch = db.batch()
+    published = []
+    for draft in drafts:
+        post = draft.to_dict()
+        post['published_at'] = datetime.utcnow()
+        batch.set(db.collection('posts').document(draft.id), post)
+        batch.delete(draft.reference)
+        published.append(draft.id)
+    if published:
+        batch.commit()
+    return published
 
 @functions_framework.http
 def auto_publish_blog(request):
-    db = firestore.Client()
-    # Get the latest draft
-    drafts = db.collection('drafts').order_by('created_at', direction=firestore.Query.DESCENDING).limit(1).stream()
-    for draft in drafts:
-        draft_data = draft.to_dict()
-        # Add published_at timestamp
-        draft_data['published_at'] = datetime.utcnow()
-        # Move to posts collection (instead of published)
-        db.collection('posts').add(draft_data)
-        # Delete the draft
-        db.collection('drafts').document(draft.id).delete()
+    """
+    Publishes the latest draft, or with ?mode=drain every draft oldest first
+    (up to ?limit=), paging through them with a cursor. firestore.Client()
+    talks to the emulator when FIRESTORE_EMULATOR_HOST is set.
+    """
+    db = _firestore_client()
+    drafts = db.collection('drafts')
+    if request.args.get('mode') != 'drain':
+        # Get the latest draft
+        latest = list(drafts.order_by('created_at', direction=firestore.Query.DESCENDING).limit(1).stream())
+        if not latest:
+            return ('No drafts found.', 200)
+        publish_drafts(db, latest)
         return ('Published latest draft!', 200)
-    return ('No drafts found.', 200)
 
-def generate_tts_audio(text, output_file, voice_name, language_code):
-    tts_client = texttospeech.TextToSpeechClient()
-    storage_client = storage.Client()
-    bucket = storage_client.bucket('radioquest-e1f5a-audio')
+    limit = request.args.get('limit', type=int)
+    published = []
+    cursor = None
+    while limit is None or len(published) < limit:
+        page_size = PUBLISH_PAGE_SIZE if limit is None else min(PUBLISH_PAGE_SIZE, limit - len(published))
+        query = drafts.order_by('created_at').order_by('__name__').limit(page_size)
+        if cursor is not None:
+            query = query.start_after(cursor)
+        page = list(query.stream())
+        if not page:
+            break
+        published.extend(publish_drafts(db, page))
+        cursor = page[-1]
+        if len(page) < page_size:
+            break
+    return ({'published': published, 'count': len(published)}, 200)
+
+# Languages rendered for every segment: lang -> (voice, language code)
+TTS_LANGUAGES = {
+    'sw': ('sw-KE-Standard-A', 'sw-KE'),
+    'fr': ('fr-FR-Neural2-B', 'fr-FR')
+}
+# Fields this function writes; an update touching only these is our own echo
+TTS_OUTPUT_FIELDS = ('tts_audio', 'tts_hashes')
+
+def tts_key(text, voice_name):
+    """Blob key of a rendering, also stored in tts_hashes to recognise unchanged text"""
+    return content_key(text[:5000], voice_name, "MP3", 16000, extension=".mp3")
+
+def generate_tts_audio(text, voice_name, language_code):
+    """Render text once per (text, voice) and return the blob's public URL"""
+    store = _audio_store()
+    key = tts_key(text, voice_name)
+    if store.exists(key):
+        return store.url(key)
     synthesis_input = texttospeech.SynthesisInput(text=text[:5000])
     voice = texttospeech.VoiceSelectionParams(language_code=language_code, name=voice_name)
     audio_config = texttospeech.AudioConfig(
@@ -30,48 +104,59 @@ def generate_tts_audio(text, output_file, voice_name, language_code):
         speaking_rate=1.0,
         sample_rate_hertz=16000
     )
-    response = tts_client.synthesize_speech(
+    response = _tts_client().synthesize_speech(
         input=synthesis_input, voice=voice, audio_config=audio_config
     )
-    blob = bucket.blob(output_file)
-    blob.upload_from_string(response.audio_content, content_type='audio/mpeg')
-    public_url = f"https://storage.googleapis.com/{bucket.name}/{output_file}"
-    return public_url
+    store.put(key, response.audio_content, 'audio/mpeg')
+    return store.url(key)
 
-# Firestore-triggered function for TTS automation
-@functions_framework.cloud_event
-def generate_tts_on_new_segment(cloud_event):
-    import base64
-    data = cloud_event.data
-    value = data.get('value', {})
-    fields = value.get('fields', {})
-    # Determine if this is a story segment or quiz
-    segment_id = fields.get('segment_id', {}).get('stringValue', 'unknown')
+def compose_tts_text(fields):
+    """Narration for a segment or quiz document (Firestore event field values)"""
     story_block = fields.get('story_block', {}).get('stringValue', '')
     question = fields.get('question', {}).get('stringValue', '')
     options = fields.get('options', {}).get('mapValue', {}).get('fields', {})
-    # Compose TTS text
     tts_text = story_block
     if question:
         tts_text += '\n' + question
     if options:
         for k, v in options.items():
             tts_text += f"\nOption {k}: {v.get('stringValue', '')}"
-    # Generate TTS for Swahili and French
-    tts_urls = {}
-    for lang, (voice, code) in {
-        'sw': ('sw-KE-Standard-A', 'sw-KE'),
-        'fr': ('fr-FR-Neural2-B', 'fr-FR')
-    }.items():
-        output_file = f"auto_{segment_id}_{lang}.mp3"
+    return tts_text
+
+def only_tts_fields_changed(data):
+    """True for updates that touched nothing but this function's own output fields"""
+    field_paths = data.get('updateMask', {}).get('fieldPaths', [])
+    return bool(field_paths) and all(path.split('.')[0] in TTS_OUTPUT_FIELDS for path in field_paths)
+
+# Firestore-triggered function for TTS automation
+@functions_framework.cloud_event
+def generate_tts_on_new_segment(cloud_event):
+    data = cloud_event.data
+    if only_tts_fields_changed(data):
+        return 'Ignored TTS-only update', 200
+    value = data.get('value', {})
+    fields = value.get('fields', {})
+    segment_id = fields.get('segment_id', {}).get('stringValue', 'unknown')
+    tts_text = compose_tts_text(fields)
+    stored_hashes = {
+        lang: v.get('stringValue')
+        for lang, v in fields.get('tts_hashes', {}).get('mapValue', {}).get('fields', {}).items()
+    }
+    # Generate TTS for Swahili and French, skipping languages whose text is unchanged
+    updates = {}
+    for lang, (voice, code) in TTS_LANGUAGES.items():
+        key = tts_key(tts_text, voice)
+        if stored_hashes.get(lang) == key:
+            continue
         try:
-            url = generate_tts_audio(tts_text, output_file, voice, code)
-            tts_urls[lang] = url
+            updates[f'tts_audio.{lang}'] = generate_tts_audio(tts_text, voice, code)
+            updates[f'tts_hashes.{lang}'] = key
         except Exception as e:
             print(f"TTS failed for {segment_id} ({lang}): {e}")
-    # Update Firestore with TTS URLs
-    db = firestore.Client()
+    if not updates:
+        return 'TTS up to date', 200
+    # Only the changed languages are written, so the others keep their URLs
     doc_path = value.get('name', '').split('/documents/')[-1]
     if doc_path:
-        db.document(doc_path).update({'tts_audio': tts_urls})
-    return 'TTS generated and Firestore updated', 200 
\ No newline at end of file
+        _firestore_client().document(doc_path).update(updates)
+    return 'TTS generated and Firestore updated', 200
@@ -0,0 +1,184 @@
+"""
+Local tests for the Cloud Functions in main.py. Run from functions/:
+
+    python -m pytest test_main.py
+
+The TTS trigger runs against in-memory stand-ins for the blob store, TTS and
+Firestore clients. The blog publishing tests need the Firestore emulator and
+are skipped without it:
+
+    gcloud emulators firestore start --host-port=localhost:8681
+    FIRESTORE_EMULATOR_HOST=localhost:8681 python -m pytest test_main.py
+"""
+
+import os
+import unittest
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+from werkzeug.test import EnvironBuilder
+
+import main
+
+
+class FakeBlobStore:
+    def __init__(self):
+        self.blobs = {}
+
+    def exists(self, key):
+        return key in self.blobs
+
+    def put(self, key, data, content_type):
+        self.blobs[key] = data
+        return True
+
+    def url(self, key):
+        return f"https://storage.googleapis.com/test-bucket/{key}"
+
+
+class FakeTTSClient:
+    def __init__(self):
+        self.calls = []
+
+    def synthesize_speech(self, input=None, voice=None, audio_config=None, **kwargs):
+        self.calls.append(voice.name)
+        return SimpleNamespace(audio_content=b"\xff\xfb\x90\x64" + b"\x00" * 64)
+
+
+class FakeDocument:
+    def __init__(self, updates):
+        self._updates = updates
+
+    def update(self, fields):
+        self._updates.append(fields)
+
+
+class FakeFirestore:
+    def __init__(self):
+        self.updates = []
+
+    def document(self, path):
+        return FakeDocument(self.updates)
+
+
+def segment_event(fields, update_mask=None):
+    data = {"value": {"name": "projects/p/databases/(default)/documents/segments/seg-1", "fields": fields}}
+    if update_mask is not None:
+        data["updateMask"] = {"fieldPaths": update_mask}
+    return SimpleNamespace(data=data)
+
+
+SEGMENT_FIELDS = {
+    "segment_id": {"stringValue": "seg-1"},
+    "story_block": {"stringValue": "Koko walks to the edge of the forest."},
+    "question": {"stringValue": "Where should Koko go?"},
+    "options": {"mapValue": {"fields": {"A": {"stringValue": "Left"}, "B": {"stringValue": "Right"}}}},
+}
+
+
+class GenerateTTSOnNewSegmentTest(unittest.TestCase):
+    def setUp(self):
+        self.store = FakeBlobStore()
+        self.tts = FakeTTSClient()
+        self.firestore = FakeFirestore()
+        main._clients.clear()
+        main._clients.update(store=self.store, tts=self.tts, firestore=self.firestore)
+
+    def tearDown(self):
+        main._clients.clear()
+
+    def synthesized_voices(self):
+        return sorted(self.tts.calls)
+
+    def test_repeated_event_synthesizes_each_language_once(self):
+        event = segment_event(SEGMENT_FIELDS)
+        main.generate_tts_on_new_segment(event)
+        main.generate_tts_on_new_segment(event)
+        self.assertEqual(self.synthesized_voices(), sorted(voice for voice, _ in main.TTS_LANGUAGES.values()))
+
+    def test_echo_of_own_update_is_ignored(self):
+        main.generate_tts_on_new_segment(segment_event(SEGMENT_FIELDS))
+        written = self.firestore.updates[-1]
+        self.tts.calls.clear()
+        echo = segment_event(SEGMENT_FIELDS, update_mask=sorted(written))
+        result = main.generate_tts_on_new_segment(echo)
+        self.assertEqual(result[0], "Ignored TTS-only update")
+        self.assertEqual(self.tts.calls, [])
+        self.assertEqual(len(self.firestore.updates), 1)
+
+    def test_matching_stored_hashes_skip_synthesis_and_writes(self):
+        text = main.compose_tts_text(SEGMENT_FIELDS)
+        hashes = {lang: {"stringValue": main.tts_key(text, voice)} for lang, (voice, _) in main.TTS_LANGUAGES.items()}
+        fields = dict(SEGMENT_FIELDS, tts_hashes={"mapValue": {"fields": hashes}})
+        result = main.generate_tts_on_new_segment(segment_event(fields))
+        self.assertEqual(result[0], "TTS up to date")
+        self.assertEqual(self.tts.calls, [])
+        self.assertEqual(self.firestore.updates, [])
+
+    def test_changed_text_renders_again(self):
+        main.generate_tts_on_new_segment(segment_event(SEGMENT_FIELDS))
+        edited = dict(SEGMENT_FIELDS, story_block={"stringValue": "Koko runs back to the village."})
+        main.generate_tts_on_new_segment(segment_event(edited))
+        self.assertEqual(len(self.tts.calls), 2 * len(main.TTS_LANGUAGES))
+
+
+@unittest.skipUnless(os.environ.get("FIRESTORE_EMULATOR_HOST"), "needs the Firestore emulator")
+class AutoPublishBlogTest(unittest.TestCase):
+    def setUp(self):
+        from google.cloud import firestore
+        main._clients.clear()
+        self.db = firestore.Client(project=os.environ.get("GOOGLE_CLOUD_PROJECT", "radioquest-test"))
+        main._clients["firestore"] = self.db
+        self.clear()
+        start = datetime(2025, 6, 1)
+        for i in range(5):
+            self.db.collection("drafts").document(f"draft-{i}").set(
+                {"title": f"Post {i}", "created_at": start + timedelta(hours=i)})
+
+    def tearDown(self):
+        self.clear()
+        main._clients.clear()
+
+    def clear(self):
+        for name in ("drafts", "posts"):
+            for doc in self.db.collection(name).stream():
+                doc.reference.delete()
+
+    def ids(self, name):
+        return sorted(doc.id for doc in self.db.collection(name).stream())
+
+    def publish(self, query_string=""):
+        return main.auto_publish_blog(EnvironBuilder(query_string=query_string).get_request())
+
+    def test_latest_mode_publishes_newest_draft(self):
+        self.publish()
+        self.assertEqual(self.ids("posts"), ["draft-4"])
+        self.assertEqual(len(self.ids("drafts")), 4)
+
+    def test_drain_pages_oldest_first_up_to_limit(self):
+        original_page_size = main.PUBLISH_PAGE_SIZE
+        main.PUBLISH_PAGE_SIZE = 2  # force several pages and cursors
+        try:
+            body, status = self.publish("mode=drain&limit=3")
+        finally:
+            main.PUBLISH_PAGE_SIZE = original_page_size
+        self.assertEqual(status, 200)
+        self.assertEqual(body["published"], ["draft-0", "draft-1", "draft-2"])
+        self.assertEqual(self.ids("drafts"), ["draft-3", "draft-4"])
+
+        body, _ = self.publish("mode=drain")
+        self.assertEqual(body["published"], ["draft-3", "draft-4"])
+        self.assertEqual(self.ids("drafts"), [])
+        self.assertEqual(self.ids("posts"), [f"draft-{i}" for i in range(5)])
+
+    def test_retried_publish_does_not_duplicate_posts(self):
+        drafts = list(self.db.collection("drafts").order_by("created_at").limit(2).stream())
+        main.publish_drafts(self.db, drafts)
+        # A retry that still holds the already published snapshots
+        main.publish_drafts(self.db, drafts)
+        self.assertEqual(self.ids("posts"), ["draft-0", "draft-1"])
+        self.assertEqual(len(self.ids("drafts")), 3)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,159 @@
+"""
+RadioQuest Fuzzy Search - typo-tolerant search for young readers
+"foorest", "eagel" and "baobob" match nothing as substrings. This is a
+SymSpell-style index: every corpus word is stored under each string obtained by
+deleting up to MAX_EDIT_DISTANCE characters from its first PREFIX_LENGTH
+characters. A query word generates its own deletes the same way, so finding its
+corrections is a handful of dictionary lookups: the work depends on the length
+of the word, not the size of the corpus. Candidates are then verified with a
+bounded edit distance and ranked by distance and corpus frequency. Postings are
+capped per word, so scoring is bounded too.
+"""
+
+import logging
+import re
+import threading
+from collections import Counter
+from itertools import combinations
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+from search_cache import normalize_query
+from suggest import STOPWORDS
+
+logger = logging.getLogger(__name__)
+
+MAX_EDIT_DISTANCE = 2
+PREFIX_LENGTH = 7
+# Words this short only get one edit: two edits turn "cat" into nearly any short word
+SHORT_WORD = 4
+MIN_WORD_LENGTH = 3
+MAX_QUERY_WORDS = 6
+CORRECTIONS_PER_WORD = 3
+# Segments kept per word, title matches first; results are a top 10 anyway
+MAX_POSTINGS = 100
+TITLE_WEIGHT = 2.0
+
+_WORD_RE = re.compile(r"[^\W\d_]+")
+
+
+def words(text: str) -> List[str]:
+    """Indexable words: stopwords ("like", "have") would only attract corrections"""
+    return [w for w in _WORD_RE.findall(normalize_query(text or ""))
+            if len(w) >= MIN_WORD_LENGTH and w not in STOPWORDS]
+
+
+def deletes(word: str, max_distance: int) -> Set[str]:
+    """Every string made by removing up to max_distance characters from word"""
+    variants = {word}
+    for distance in range(1, min(max_distance, len(word)) + 1):
+        for positions in combinations(range(len(word)), distance):
+            variants.add("".join(c for i, c in enumerate(word) if i not in positions))
+    return variants
+
+
+def edit_distance(a: str, b: str, max_distance: int) -> int:
+    """Optimal string alignment distance (adjacent swaps count once); max_distance + 1 when over the bound"""
+    if abs(len(a) - len(b)) > max_distance:
+        return max_distance + 1
+    previous2: List[int] = []
+    previous = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        current = [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            cost = 0 if a[i - 1] == b[j - 1] else 1
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                current[j] = min(current[j], previous2[j - 2] + 1)
+        if min(current) > max_distance:
+            return max_distance + 1
+        previous2, previous = previous, current
+    return previous[-1] if previous[-1] <= max_distance else max_distance + 1
+
+
+def allowed_distance(word: str) -> int:
+    return 1 if len(word) <= SHORT_WORD else MAX_EDIT_DISTANCE
+
+
+class FuzzyIndex:
+    """Deletion dictionary over the corpus vocabulary plus word -> segment postings"""
+
+    def __init__(self):
+        self.version: Optional[str] = None
+        self._frequency: Counter = Counter()
+        self._deletes: Dict[str, Set[str]] = {}
+        self._postings: Dict[str, Dict[str, float]] = {}
+        self._documents: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._documents)
+
+    def sync(self, segments: Iterable[Dict[str, Any]], version: Optional[str] = None):
+        """Rebuild from a full snapshot (a few ms for the story corpus) and swap it in"""
+        frequency: Counter = Counter()
+        postings: Dict[str, Dict[str, float]] = {}
+        documents = {}
+        for segment in segments:
+            segment_id = str(segment["_id"])
+            content = segment.get("content") or segment.get("text") or ""
+            documents[segment_id] = {"_id": segment_id, "title": segment.get("title", ""), "content": content}
+            for field, weight in ((segment.get("title", ""), TITLE_WEIGHT), (content, 1.0)):
+                for word in words(field):
+                    frequency[word] += 1
+                    entry = postings.setdefault(word, {})
+                    entry[segment_id] = max(entry.get(segment_id, 0.0), weight)
+        for word, entry in postings.items():
+            if len(entry) > MAX_POSTINGS:
+                postings[word] = dict(sorted(entry.items(), key=lambda item: (-item[1], item[0]))[:MAX_POSTINGS])
+        index: Dict[str, Set[str]] = {}
+        for word in frequency:
+            for variant in deletes(word[:PREFIX_LENGTH], MAX_EDIT_DISTANCE):
+                index.setdefault(variant, set()).add(word)
+        with self._lock:
+            self._frequency, self._deletes, self._postings, self._documents = frequency, index, postings, documents
+            self.version = version
+        logger.info(f"Fuzzy index: {len(frequency)} words, {len(index)} delete keys, {len(documents)} segments")
+
+    def corrections(self, word: str) -> List[Tuple[str, int]]:
+        """Closest vocabulary words as (word, distance), best first"""
+        max_distance = allowed_distance(word)
+        if word in self._frequency:
+            return [(word, 0)]
+        candidates: Set[str] = set()
+        for variant in deletes(word[:PREFIX_LENGTH], max_distance):
+            candidates |= self._deletes.get(variant, set())
+        scored = []
+        for candidate in candidates:
+            distance = edit_distance(word, candidate, max_distance)
+            if distance <= max_distance:
+                scored.append((distance, -self._frequency[candidate], candidate))
+        scored.sort()
+        # Only the closest distance found: a one-edit fix beats any two-edit one
+        return [(candidate, distance) for distance, _, candidate in scored[:CORRECTIONS_PER_WORD]
+                if distance == scored[0][0]]
+
+    def search(self, query: str, limit: int = 10, after: Optional[Tuple[float, str]] = None) -> Dict[str, Any]:
+        """
+        Ranked segments plus the correction picked for each misspelled word.
+        `after` is the (-score, _id) position of the last result of the previous page.
+        """
+        with self._lock:
+            scores: Dict[str, float] = {}
+            corrections: Dict[str, str] = {}
+            for word in words(query)[:MAX_QUERY_WORDS]:
+                matches = self.corrections(word)
+                if matches and matches[0][1] > 0:
+                    corrections[word] = matches[0][0]
+                # Each query word counts once per segment, through its best-matching correction
+                best: Dict[str, float] = {}
+                for candidate, distance in matches:
+                    for segment_id, weight in self._postings.get(candidate, {}).items():
+                        best[segment_id] = max(best.get(segment_id, 0.0), weight / (1 + distance))
+                for segment_id, score in best.items():
+                    scores[segment_id] = scores.get(segment_id, 0.0) + score
+            ranked = sorted((-round(score, 3), segment_id) for segment_id, score in scores.items())
+            if after is not None:
+                ranked = [position for position in ranked if position > tuple(after)]
+            ranked = [(segment_id, -negated) for negated, segment_id in ranked[:limit]]
+            results = [dict(self._documents[segment_id], score=round(score, 3)) for segment_id, score in ranked]
+        return {"results": results, "corrections": corrections}
@@ -0,0 +1,154 @@
+"""
+RadioQuest Hedging - duplicate slow TTS calls to cut tail latency
+Most synthesis calls return near the median, but a few take many times longer,
+and those decide how long a kid watches the "Generating audio..." placeholder.
+When a call hasn't returned by the observed p90, the Hedger issues the same
+call again and takes whichever answers first. Only the slowest ~10% of calls
+can trigger a hedge, and a token budget caps hedges at a fixed share of calls,
+so the extra TTS spend stays bounded even when the service slows down as a
+whole.
+
+Hedging is off unless RADIOQUEST_TTS_HEDGING=1, and callers only reach it after
+a cache miss; `should_hedge` lets them re-check the cache before paying twice.
+A duplicate is a synthesis of its own, so with `slots` (the TTS admission
+controller) it only runs in a free concurrency slot and is skipped otherwise.
+"""
+
+import logging
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Any, Callable, Optional, TypeVar
+
+import metrics
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+class LatencyTracker:
+    """Sliding window of recent call latencies"""
+
+    def __init__(self, window: int = 200, min_samples: int = 20):
+        self.min_samples = min_samples
+        self._samples: deque = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def observe(self, seconds: float):
+        with self._lock:
+            self._samples.append(seconds)
+
+    def percentile(self, pct: float) -> Optional[float]:
+        """Nearest-rank percentile, None until min_samples calls have been seen"""
+        with self._lock:
+            if len(self._samples) < self.min_samples:
+                return None
+            ordered = sorted(self._samples)
+        rank = min(len(ordered) - 1, max(0, int(round(pct / 100.0 * len(ordered) + 0.5)) - 1))
+        return ordered[rank]
+
+
+class HedgeBudget:
+    """Each call earns `ratio` of a hedge, up to `burst` saved; a hedge spends one"""
+
+    def __init__(self, ratio: float = 0.1, burst: float = 3.0):
+        self.ratio = ratio
+        self.burst = burst
+        self._tokens = burst
+        self._lock = threading.Lock()
+
+    def earn(self):
+        with self._lock:
+            self._tokens = min(self.burst, self._tokens + self.ratio)
+
+    def try_spend(self) -> bool:
+        with self._lock:
+            if self._tokens >= 1.0:
+                self._tokens -= 1.0
+                return True
+            return False
+
+
+class Hedger:
+    def __init__(self, enabled: bool = True, percentile: float = 90.0, ratio: float = 0.1, burst: float = 3.0,
+                 window: int = 200, min_samples: int = 20, max_workers: int = 32, name: str = "tts"):
+        self.enabled = enabled
+        self.pct = percentile
+        self.name = name
+        self.tracker = LatencyTracker(window, min_samples)
+        self.budget = HedgeBudget(ratio, burst)
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=f"hedge-{name}") if enabled else None
+
+    @classmethod
+    def from_env(cls, name: str = "tts") -> "Hedger":
+        return cls(
+            enabled=os.environ.get("RADIOQUEST_TTS_HEDGING", "0") == "1",
+            percentile=float(os.environ.get("RADIOQUEST_TTS_HEDGE_PERCENTILE", "90")),
+            ratio=float(os.environ.get("RADIOQUEST_TTS_HEDGE_BUDGET", "0.1")),
+            max_workers=int(os.environ.get("RADIOQUEST_TTS_HEDGE_WORKERS", "32")),
+            name=name,
+        )
+
+    def hedge_delay(self) -> Optional[float]:
+        return self.tracker.percentile(self.pct)
+
+    def _submit(self, fn: Callable[[Optional[float]], T], timeout: Optional[float],
+                release: Optional[Callable[[], None]] = None) -> Future:
+        def attempt():
+            start = time.monotonic()
+            result = fn(timeout)
+            # Losers are observed too, so the window sees the real distribution
+            self.tracker.observe(time.monotonic() - start)
+            return result
+        future = self._pool.submit(attempt)
+        if release is not None:
+            # Runs once the attempt finishes, or straight away if it is cancelled before starting
+            future.add_done_callback(lambda _: release())
+        return future
+
+    def call(self, fn: Callable[[Optional[float]], T], timeout: Optional[float] = None,
+             should_hedge: Optional[Callable[[], bool]] = None, slots: Optional[Any] = None) -> T:
+        """
+        fn(timeout) once, plus a duplicate if it is still running at the hedge delay;
+        the first successful result wins. Each attempt gets what's left of `timeout`.
+        `slots` (anything with try_acquire_slot()/release_slot()) must have one free
+        for the duplicate, held until it finishes; the primary's slot is the caller's.
+        """
+        if not self.enabled:
+            return fn(timeout)
+        start = time.monotonic()
+        self.budget.earn()
+        primary = self._submit(fn, timeout)
+        pending = {primary}
+        delay = self.hedge_delay()
+        if delay is not None and (timeout is None or delay < timeout):
+            done, _ = wait(pending, timeout=delay)
+            if not done:
+                if should_hedge is not None and not should_hedge():
+                    metrics.HEDGED_CALLS.labels(self.name, "skipped_rendered").inc()
+                elif slots is not None and not slots.try_acquire_slot():
+                    metrics.HEDGED_CALLS.labels(self.name, "skipped_busy").inc()
+                elif not self.budget.try_spend():
+                    if slots is not None:
+                        slots.release_slot()
+                    metrics.HEDGED_CALLS.labels(self.name, "skipped_budget").inc()
+                else:
+                    remaining = None if timeout is None else max(0.0, timeout - (time.monotonic() - start))
+                    pending.add(self._submit(fn, remaining, slots.release_slot if slots is not None else None))
+                    metrics.HEDGED_CALLS.labels(self.name, "issued").inc()
+        error: Optional[BaseException] = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    if future is not primary:
+                        metrics.HEDGED_CALLS.labels(self.name, "won").inc()
+                    for loser in pending:
+                        # Not started yet: drop it; already running: its result is discarded
+                        loser.cancel()
+                    return future.result()
+                error = future.exception()
+        raise error
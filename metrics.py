@@ -0,0 +1,290 @@
+"""
+RadioQuest Metrics - Prometheus-style instrumentation
+Counters and histograms for routes, agents and backing services (MongoDB, TTS),
+rendered in the Prometheus text exposition format by the /metrics endpoint.
+
+Collection is kept cheap enough to leave on in production: each labelled series
+owns its own lock, the bucket lookup happens outside of it, and the critical
+section is a couple of integer/float additions.
+"""
+
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterable, List, Optional, Tuple
+
+# Latency buckets in seconds, tuned for Atlas round trips (ms) up to slow TTS calls (s)
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def _format_labels(names: Tuple[str, ...], values: Tuple[str, ...], extra: str = "") -> str:
+    """Render a label set as {a="x",b="y"}"""
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_float(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value))
+
+
+class _Metric:
+    """Base class for a metric family with a fixed set of label names"""
+
+    metric_type = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._series = {}
+        self._series_lock = threading.Lock()
+
+    def labels(self, *values):
+        """Return the child series for the given label values, creating it on first use"""
+        key = tuple(str(v) for v in values)
+        series = self._series.get(key)
+        if series is None:
+            if len(key) != len(self.labelnames):
+                raise ValueError(f"{self.name} expects labels {self.labelnames}, got {key}")
+            with self._series_lock:
+                series = self._series.get(key)
+                if series is None:
+                    series = self._new_series()
+                    self._series[key] = series
+        return series
+
+    def _new_series(self):
+        raise NotImplementedError
+
+    def collect(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.metric_type}"]
+        for key, series in sorted(self._series.items()):
+            lines.extend(self._render_series(key, series))
+        return lines
+
+    def _render_series(self, key, series) -> List[str]:
+        raise NotImplementedError
+
+
+class _CounterSeries:
+    __slots__ = ("_value", "_lock")
+
+    def __init__(self):
+        self._value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0):
+        with self._lock:
+            self._value += amount
+
+    @property
+    def value(self) -> float:
+        return self._value
+
+
+class Counter(_Metric):
+    """Monotonically increasing counter"""
+
+    metric_type = "counter"
+
+    def _new_series(self):
+        return _CounterSeries()
+
+    def inc(self, amount: float = 1.0):
+        self.labels().inc(amount)
+
+    def _render_series(self, key, series):
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {_format_float(series.value)}"]
+
+
+class _HistogramSeries:
+    __slots__ = ("_upper_bounds", "_counts", "_sum", "_lock")
+
+    def __init__(self, upper_bounds: Tuple[float, ...]):
+        self._upper_bounds = upper_bounds
+        self._counts = [0] * (len(upper_bounds) + 1)  # last slot is +Inf
+        self._sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float):
+        index = bisect.bisect_left(self._upper_bounds, value)
+        with self._lock:
+            self._counts[index] += 1
+            self._sum += value
+
+    def snapshot(self) -> Tuple[List[int], float]:
+        with self._lock:
+            return list(self._counts), self._sum
+
+
+class Histogram(_Metric):
+    """Fixed-bucket histogram (cumulative buckets are computed at scrape time)"""
+
+    metric_type = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = (),
+                 buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def _new_series(self):
+        return _HistogramSeries(self.buckets)
+
+    def observe(self, value: float):
+        self.labels().observe(value)
+
+    def _render_series(self, key, series):
+        counts, total = series.snapshot()
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets + (float("inf"),), counts):
+            cumulative += count
+            le = 'le="' + _format_float(bound) + '"'
+            lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {cumulative}")
+        labels = _format_labels(self.labelnames, key)
+        lines.append(f"{self.name}_sum{labels} {_format_float(total)}")
+        lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+class Registry:
+    """Holds metric families and renders them for scraping"""
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric: _Metric) -> _Metric:
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"Metric {metric.name} already registered")
+            self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Iterable[str] = ()) -> Counter:
+        return self.register(Counter(name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: Iterable[str] = (),
+                  buckets: Tuple[float, ...] = DEFAULT_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def render(self) -> str:
+        lines = []
+        for metric in list(self._metrics.values()):
+            lines.extend(metric.collect())
+        return "\n".join(lines) + "\n"
+
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# --- Default registry and RadioQuest metric families ---
+REGISTRY = Registry()
+
+REQUEST_LATENCY = REGISTRY.histogram(
+    "radioquest_request_duration_seconds",
+    "HTTP request latency by route",
+    ("route", "method", "status"),
+)
+DEPENDENCY_LATENCY = REGISTRY.histogram(
+    "radioquest_dependency_duration_seconds",
+    "Latency of calls to backing services (MongoDB, TTS)",
+    ("dependency", "operation"),
+)
+DEPENDENCY_ERRORS = REGISTRY.counter(
+    "radioquest_dependency_errors_total",
+    "Failed calls to backing services",
+    ("dependency", "operation"),
+)
+CACHE_REQUESTS = REGISTRY.counter(
+    "radioquest_cache_requests_total",
+    "Cache lookups by cache and result (hit/miss)",
+    ("cache", "result"),
+)
+COALESCED_CALLS = REGISTRY.counter(
+    "radioquest_coalesced_calls_total",
+    "Calls that shared an in-flight backend call instead of issuing their own",
+    ("flight",),
+)
+HEDGED_CALLS = REGISTRY.counter(
+    "radioquest_hedged_calls_total",
+    "Hedging decisions for slow calls (issued, won, skipped_budget, skipped_busy, skipped_rendered)",
+    ("call", "outcome"),
+)
+ADMISSION = REGISTRY.counter(
+    "radioquest_admission_total",
+    "Admission decisions for paid calls (admitted, shed_client, shed_global, shed_busy, queued)",
+    ("call", "outcome"),
+)
+AGENT_STEP_LATENCY = REGISTRY.histogram(
+    "radioquest_agent_step_duration_seconds",
+    "Duration of orchestrator agent steps",
+    ("agent", "action", "status"),
+)
+TTS_BYTES = REGISTRY.counter(
+    "radioquest_tts_audio_bytes_total",
+    "Bytes of audio synthesized by TTS",
+    ("voice",),
+)
+TTS_CHARACTERS = REGISTRY.counter(
+    "radioquest_tts_characters_total",
+    "Characters of text sent to TTS",
+    ("voice",),
+)
+
+
+@contextmanager
+def track_dependency(dependency: str, operation: str):
+    """Time a call to a backing service, counting it as an error if it raises"""
+    start = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        DEPENDENCY_ERRORS.labels(dependency, operation).inc()
+        raise
+    finally:
+        DEPENDENCY_LATENCY.labels(dependency, operation).observe(time.perf_counter() - start)
+
+
+def record_cache(cache: str, hit: bool):
+    """Count a cache lookup; hit ratio = hit / (hit + miss)"""
+    CACHE_REQUESTS.labels(cache, "hit" if hit else "miss").inc()
+
+
+def record_tts(voice: str, characters: int, audio_bytes: int):
+    """Count characters sent to and audio bytes returned from TTS"""
+    TTS_CHARACTERS.labels(voice).inc(characters)
+    TTS_BYTES.labels(voice).inc(audio_bytes)
+
+
+class StepTimer:
+    """
+    Turns "started" -> terminal workflow steps into agent step durations.
+    Orchestrators call mark() for every step they record; the first non-"started"
+    status after a "started" step closes the interval and is observed. Marks are
+    keyed by (agent, action) only, so use one timer per workflow run.
+    """
+
+    def __init__(self):
+        self._open: Dict[Tuple[str, str], float] = {}
+
+    def mark(self, agent: str, action: str, status: str) -> Optional[float]:
+        now = time.perf_counter()
+        key = (agent, action)
+        if status == "started":
+            self._open[key] = now
+            return None
+        start = self._open.pop(key, None)
+        if start is None:
+            return None
+        elapsed = now - start
+        AGENT_STEP_LATENCY.labels(agent, action, status).observe(elapsed)
+        return elapsed
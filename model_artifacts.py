@@ -0,0 +1,144 @@
+"""
+RadioQuest Model Artifacts - integrity-checked model directories and mmap'd weights
+download_model.py and `query_encoder export` write an artifacts.json manifest
+(size and SHA-256 of every file) next to the model, and loaders refuse a
+directory that doesn't match it, so a truncated download or a half-copied
+image layer fails at startup instead of producing wrong embeddings.
+
+Weights are stored as safetensors: an 8-byte header length, a JSON header and
+one flat buffer. load_safetensors() maps that buffer read-only and returns NumPy
+views into it, so loading costs a header parse rather than a copy, and every
+process that maps the file shares the same physical pages.
+"""
+
+import hashlib
+import json
+import logging
+import mmap
+import os
+import struct
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_FILE = "artifacts.json"
+MANIFEST_FORMAT = "radioquest-model/1"
+
+_DTYPES = {
+    "F64": np.float64, "F32": np.float32, "F16": np.float16,
+    "I64": np.int64, "I32": np.int32, "I16": np.int16, "I8": np.int8,
+    "U8": np.uint8, "BOOL": np.bool_,
+}
+_DTYPE_NAMES = {np.dtype(dtype): name for name, dtype in _DTYPES.items()}
+
+
+class ArtifactError(Exception):
+    pass
+
+
+# --- Manifest ---
+def file_digest(path: str, chunk_size: int = 1 << 20) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _artifact_files(model_dir: str) -> List[str]:
+    files = []
+    for root, _, names in os.walk(model_dir):
+        for name in names:
+            relative = os.path.relpath(os.path.join(root, name), model_dir)
+            if relative != MANIFEST_FILE:
+                files.append(relative.replace(os.sep, "/"))
+    return sorted(files)
+
+
+def write_manifest(model_dir: str, metadata: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """Record size and SHA-256 of every file under model_dir"""
+    manifest = {
+        "format": MANIFEST_FORMAT,
+        "metadata": metadata or {},
+        "files": {
+            relative: {"size": os.path.getsize(os.path.join(model_dir, relative)),
+                       "sha256": file_digest(os.path.join(model_dir, relative))}
+            for relative in _artifact_files(model_dir)
+        },
+    }
+    with open(os.path.join(model_dir, MANIFEST_FILE), "w") as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    return manifest
+
+
+def verify_artifacts(model_dir: str, check_hashes: bool = True) -> Dict[str, Any]:
+    """The manifest of model_dir; raises ArtifactError on a missing, resized or altered file"""
+    try:
+        with open(os.path.join(model_dir, MANIFEST_FILE)) as f:
+            manifest = json.load(f)
+    except (OSError, ValueError) as e:
+        raise ArtifactError(f"No readable {MANIFEST_FILE} in {model_dir}: {e}")
+    if manifest.get("format") != MANIFEST_FORMAT:
+        raise ArtifactError(f"{model_dir}: unsupported manifest format {manifest.get('format')!r}")
+    for relative, expected in manifest.get("files", {}).items():
+        path = os.path.join(model_dir, relative)
+        if not os.path.isfile(path):
+            raise ArtifactError(f"{model_dir}: missing {relative}")
+        if os.path.getsize(path) != expected["size"]:
+            raise ArtifactError(f"{model_dir}: {relative} is {os.path.getsize(path)} bytes, expected {expected['size']}")
+        if check_hashes and file_digest(path) != expected["sha256"]:
+            raise ArtifactError(f"{model_dir}: {relative} does not match its SHA-256")
+    return manifest
+
+
+# --- safetensors ---
+def save_safetensors(tensors: Dict[str, np.ndarray], path: str, metadata: Optional[Dict[str, str]] = None):
+    """Write NumPy arrays in the safetensors layout"""
+    header: Dict[str, Any] = {"__metadata__": metadata} if metadata else {}
+    offset = 0
+    arrays = []
+    for name in sorted(tensors):
+        array = np.ascontiguousarray(tensors[name])
+        if array.dtype not in _DTYPE_NAMES:
+            raise ArtifactError(f"{name}: dtype {array.dtype} has no safetensors equivalent")
+        header[name] = {"dtype": _DTYPE_NAMES[array.dtype], "shape": list(array.shape),
+                        "data_offsets": [offset, offset + array.nbytes]}
+        offset += array.nbytes
+        arrays.append(array)
+    encoded = json.dumps(header, separators=(",", ":")).encode("utf-8")
+    encoded += b" " * (-len(encoded) % 8)  # keep the buffer 8-byte aligned
+    with open(path, "wb") as f:
+        f.write(struct.pack("<Q", len(encoded)))
+        f.write(encoded)
+        for array in arrays:
+            f.write(array.tobytes())
+
+
+def load_safetensors(path: str) -> Dict[str, np.ndarray]:
+    """Read-only NumPy views into a memory map of the file; nothing is copied"""
+    try:
+        with open(path, "rb") as f:
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    except ValueError as e:
+        raise ArtifactError(f"{path}: cannot map ({e})")
+    try:
+        (header_size,) = struct.unpack("<Q", mapped[:8])
+        header = json.loads(mapped[8:8 + header_size])
+    except (struct.error, ValueError) as e:
+        mapped.close()
+        raise ArtifactError(f"{path}: not a safetensors file ({e})")
+    start = 8 + header_size
+    tensors = {}
+    for name, info in header.items():
+        if name == "__metadata__":
+            continue
+        if info["dtype"] not in _DTYPES:
+            raise ArtifactError(f"{path}: {name} has unsupported dtype {info['dtype']}")
+        begin, end = info["data_offsets"]
+        dtype = np.dtype(_DTYPES[info["dtype"]])
+        # The views keep the map alive; it is unmapped when the last one goes away
+        tensors[name] = np.frombuffer(mapped, dtype=dtype, count=(end - begin) // dtype.itemsize,
+                                      offset=start + begin).reshape(info["shape"])
+    return tensors
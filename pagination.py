@@ -0,0 +1,157 @@
+"""
+RadioQuest Pagination - keyset cursors and streaming for search results
+Regex search ranks hits in tiers (title matches, then content-only matches) and
+by _id within a tier; fuzzy search ranks by score, then _id. A page ends at a
+(rank, _id) position, and the next page asks for everything after it, so a
+deep page costs the same as the first (no skip) and inserts between requests
+never shift results. Positions travel as opaque base64 cursor tokens bound to
+the query and mode they were issued for.
+
+iter_regex_hits() walks the Mongo cursors lazily, so callers can stream hits as
+NDJSON while the database is still producing them.
+"""
+
+import base64
+import json
+import re
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from bson import ObjectId
+
+from search_cache import normalize_query
+from versioning import content_hash
+
+DEFAULT_PAGE_SIZE = 10
+MAX_PAGE_SIZE = 50
+MAX_STREAM_SIZE = 1000
+
+Position = Tuple[Any, Any]
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def _query_tag(query: str, mode: str) -> str:
+    return content_hash([normalize_query(query), mode], length=8)
+
+
+def encode_cursor(query: str, mode: str, position: Position) -> str:
+    rank, doc_id = position
+    payload = {"q": _query_tag(query, mode), "r": rank, "id": str(doc_id)}
+    if isinstance(doc_id, ObjectId):
+        payload["oid"] = 1
+    raw = json.dumps(payload, separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(token: Optional[str], query: str, mode: str) -> Optional[Position]:
+    """(rank, _id) to continue after, None for the first page"""
+    if not token:
+        return None
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(token + "=" * (-len(token) % 4)))
+        rank, doc_id = payload["r"], payload["id"]
+    except (ValueError, KeyError, TypeError) as e:
+        raise InvalidCursor(f"Malformed cursor: {e}")
+    if payload.get("q") != _query_tag(query, mode):
+        raise InvalidCursor("Cursor was issued for a different query")
+    return rank, ObjectId(doc_id) if payload.get("oid") else doc_id
+
+
+# --- Regex search ---
+def _pattern(query: str) -> Dict[str, str]:
+    # The query is literal text, as in regex_tier(): "a.b" or "(" must not act as a pattern
+    return {"$regex": re.escape(query), "$options": "i"}
+
+
+def regex_tiers(query: str) -> List[Tuple[int, Dict[str, Any]]]:
+    """Disjoint filters in rank order: title matches, then matches in the content only"""
+    return [
+        (0, {"title": _pattern(query)}),
+        (1, {"content": _pattern(query), "title": {"$not": _pattern(query)}}),
+    ]
+
+
+def iter_regex_hits(collection, query: str, after: Optional[Position] = None,
+                    limit: Optional[int] = None) -> Iterator[Tuple[Position, Dict[str, Any]]]:
+    """Lazily yield ((tier, _id), document) in rank order, starting after `after`"""
+    produced = 0
+    for tier, tier_filter in regex_tiers(query):
+        if after is not None and tier < after[0]:
+            continue
+        if after is not None and tier == after[0]:
+            tier_filter = dict(tier_filter, _id={"$gt": after[1]})
+        cursor = collection.find(tier_filter).sort("_id", 1)
+        if limit is not None:
+            cursor = cursor.limit(limit - produced)
+        for document in cursor:
+            yield (tier, document["_id"]), document
+            produced += 1
+            if limit is not None and produced >= limit:
+                return
+
+
+def regex_tier(document: Dict[str, Any], query: str) -> Optional[int]:
+    """Tier of an in-memory document (mock fallback), None when it doesn't match"""
+    pattern = re.compile(re.escape(query), re.IGNORECASE)
+    if pattern.search(document.get("title", "")):
+        return 0
+    if pattern.search(document.get("content", "")):
+        return 1
+    return None
+
+
+def iter_list_hits(documents: Iterable[Dict[str, Any]], query: str,
+                   after: Optional[Position] = None) -> Iterator[Tuple[Position, Dict[str, Any]]]:
+    """iter_regex_hits() over an in-memory list, with the same ordering and cursors"""
+    ranked = []
+    for document in documents:
+        tier = regex_tier(document, query)
+        if tier is not None:
+            ranked.append(((tier, str(document["_id"])), document))
+    ranked.sort(key=lambda hit: hit[0])
+    for position, document in ranked:
+        if after is None or position > (after[0], str(after[1])):
+            yield position, dict(document)
+
+
+# --- Fuzzy search ---
+def fuzzy_position(result: Dict[str, Any]) -> Position:
+    # Higher scores first: the rank component is the negated score
+    return -result["score"], result["_id"]
+
+
+# --- Pages ---
+def take_page(hits: Iterator[Tuple[Position, Dict[str, Any]]], limit: int,
+              query: str, mode: str) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+    """Up to `limit` documents plus the cursor of the next page (None on the last page)"""
+    page: List[Dict[str, Any]] = []
+    last: Optional[Position] = None
+    for position, document in hits:
+        if len(page) == limit:
+            return page, encode_cursor(query, mode, last)
+        page.append(document)
+        last = position
+    return page, None
+
+
+def page_size(requested: Optional[int], maximum: int = MAX_PAGE_SIZE) -> int:
+    return max(1, min(requested or DEFAULT_PAGE_SIZE, maximum))
+
+
+def ndjson_lines(hits: Iterator[Tuple[Position, Dict[str, Any]]], limit: int, query: str,
+                 mode: str) -> Iterator[str]:
+    """One JSON line per hit as it arrives, then {"next_cursor": ...}"""
+    last: Optional[Position] = None
+    sent = 0
+    next_cursor = None
+    for position, document in hits:
+        if sent == limit:
+            next_cursor = encode_cursor(query, mode, last)
+            break
+        document["_id"] = str(document["_id"])
+        yield json.dumps(document, default=str) + "\n"
+        last = position
+        sent += 1
+    yield json.dumps({"next_cursor": next_cursor, "count": sent}) + "\n"
@@ -0,0 +1,252 @@
+"""
+RadioQuest Profiling - On-demand profiling of live requests
+Opt-in per request, either for a random fraction of traffic or when a request
+carries a signed X-RadioQuest-Profile header. Each profiled request is dumped
+to RADIOQUEST_PROFILE_DIR as cProfile stats (.pstats) or, in sampling mode,
+as collapsed stacks (.collapsed, ready for flamegraph.pl / speedscope), plus a
+.steps.json timeline of the orchestrator workflow steps hit during the request.
+
+Configuration (environment):
+    RADIOQUEST_PROFILE_RATE      fraction of requests to profile (default 0)
+    RADIOQUEST_PROFILE_SECRET    HMAC key for the signed header and admin endpoints
+    RADIOQUEST_PROFILE_SIGNATURE_TTL  lifetime of a header from sign_path() in seconds (default 300)
+    RADIOQUEST_PROFILE_MODE      "cprofile" (default) or "sample"
+    RADIOQUEST_PROFILE_INTERVAL  sampling interval in milliseconds (default 5)
+    RADIOQUEST_PROFILE_DIR       output directory (default /tmp/radioquest-profiles)
+    RADIOQUEST_PROFILE_KEEP      number of profiles kept on disk (default 200)
+"""
+
+import cProfile
+import hashlib
+import hmac
+import json
+import logging
+import os
+import random
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+PROFILE_HEADER = "X-RadioQuest-Profile"
+ADMIN_TOKEN_HEADER = "X-RadioQuest-Admin-Token"
+PROFILE_EXTENSIONS = (".pstats", ".collapsed", ".steps.json")
+SIGNATURE_TTL_S = int(os.environ.get("RADIOQUEST_PROFILE_SIGNATURE_TTL", "300"))
+
+# Per-thread view of the profile currently running (if any), used by mark()
+_local = threading.local()
+
+
+def _path_digest(secret: str, path: str, expires_at: int) -> str:
+    return hmac.new(secret.encode(), f"{path}|{expires_at}".encode(), hashlib.sha256).hexdigest()
+
+
+def sign_path(secret: str, path: str, ttl_s: int = SIGNATURE_TTL_S, now: Optional[float] = None) -> str:
+    """
+    Value of the X-RadioQuest-Profile header that enables profiling for a path
+    until ttl_s from now: "<expires_at>.<HMAC of path|expires_at>"
+    """
+    expires_at = int((time.time() if now is None else now) + ttl_s)
+    return f"{expires_at}.{_path_digest(secret, path, expires_at)}"
+
+
+def verify_path_signature(secret: str, path: str, signature: str, now: Optional[float] = None) -> bool:
+    """True for an unexpired header made by sign_path() for this path"""
+    expires, _, digest = signature.partition(".")
+    if not expires.isdigit() or int(expires) < (time.time() if now is None else now):
+        return False
+    return hmac.compare_digest(digest, _path_digest(secret, path, int(expires)))
+
+
+def mark(agent: str, action: str, status: str):
+    """
+    Record an agent workflow boundary in the active profile of this thread.
+    Cheap no-op when the current request is not being profiled.
+    """
+    active = getattr(_local, "active", None)
+    if active is not None:
+        active.mark(agent, action, status)
+
+
+class _StackSampler(threading.Thread):
+    """Samples one thread's stack at a fixed interval into collapsed-stack counts"""
+
+    def __init__(self, target_thread_id: int, interval: float, profile: "_ActiveProfile"):
+        super().__init__(daemon=True, name="radioquest-profile-sampler")
+        self.target_thread_id = target_thread_id
+        self.interval = interval
+        self.profile = profile
+        self.stacks = Counter()
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.wait(self.interval):
+            frame = sys._current_frames().get(self.target_thread_id)
+            if frame is None:
+                continue
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+                frame = frame.f_back
+            stack.reverse()
+            # Prefix the agent step in progress so agent boundaries show up in the flame graph
+            agent_step = self.profile.current_step
+            if agent_step:
+                stack.insert(0, agent_step)
+            self.stacks[";".join(stack)] += 1
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+
+
+class _ActiveProfile:
+    """State for one profiled request"""
+
+    def __init__(self, mode: str, interval: float):
+        self.mode = mode
+        self.started = time.perf_counter()
+        self.steps: List[Dict] = []
+        self.current_step: Optional[str] = None
+        self._profiler = None
+        self._sampler = None
+        if mode == "sample":
+            self._sampler = _StackSampler(threading.get_ident(), interval, self)
+            self._sampler.start()
+        else:
+            self._profiler = cProfile.Profile()
+            self._profiler.enable()
+
+    def mark(self, agent: str, action: str, status: str):
+        self.steps.append({
+            "agent": agent,
+            "action": action,
+            "status": status,
+            "offset_ms": round((time.perf_counter() - self.started) * 1000, 3),
+        })
+        self.current_step = f"agent:{agent}.{action}" if status == "started" else None
+
+    def stop(self):
+        if self._profiler is not None:
+            self._profiler.disable()
+        if self._sampler is not None:
+            self._sampler.stop()
+
+    def dump(self, base_path: str):
+        if self._profiler is not None:
+            self._profiler.dump_stats(base_path + ".pstats")
+        if self._sampler is not None:
+            with open(base_path + ".collapsed", "w") as out:
+                for stack, count in self._sampler.stacks.most_common():
+                    out.write(f"{stack} {count}\n")
+        with open(base_path + ".steps.json", "w") as out:
+            json.dump({
+                "mode": self.mode,
+                "duration_ms": round((time.perf_counter() - self.started) * 1000, 3),
+                "workflow": self.steps,
+            }, out, indent=2)
+
+
+class RequestProfiler:
+    """Decides which requests to profile and manages the dumped results"""
+
+    def __init__(self, rate: float = 0.0, secret: Optional[str] = None, mode: str = "cprofile",
+                 interval_ms: float = 5.0, output_dir: str = "/tmp/radioquest-profiles", keep: int = 200):
+        self.rate = max(0.0, min(1.0, rate))
+        self.secret = secret or None
+        self.mode = mode if mode in ("cprofile", "sample") else "cprofile"
+        self.interval = interval_ms / 1000.0
+        self.output_dir = output_dir
+        self.keep = keep
+        # cProfile installs a per-thread hook but only one profiler can be active per thread
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls) -> "RequestProfiler":
+        return cls(
+            rate=float(os.environ.get("RADIOQUEST_PROFILE_RATE", "0") or 0),
+            secret=os.environ.get("RADIOQUEST_PROFILE_SECRET"),
+            mode=os.environ.get("RADIOQUEST_PROFILE_MODE", "cprofile"),
+            interval_ms=float(os.environ.get("RADIOQUEST_PROFILE_INTERVAL", "5") or 5),
+            output_dir=os.environ.get("RADIOQUEST_PROFILE_DIR", "/tmp/radioquest-profiles"),
+            keep=int(os.environ.get("RADIOQUEST_PROFILE_KEEP", "200") or 200),
+        )
+
+    @property
+    def enabled(self) -> bool:
+        return self.rate > 0 or self.secret is not None
+
+    def should_profile(self, path: str, signature: Optional[str]) -> bool:
+        if signature and self.secret:
+            return verify_path_signature(self.secret, path, signature)
+        return self.rate > 0 and random.random() < self.rate
+
+    def start(self, path: str, signature: Optional[str] = None) -> Optional[_ActiveProfile]:
+        """Begin profiling the current request if it was selected"""
+        if not self.enabled or getattr(_local, "active", None) is not None:
+            return None
+        if not self.should_profile(path, signature):
+            return None
+        try:
+            active = _ActiveProfile(self.mode, self.interval)
+        except ValueError as e:
+            # Another profiler (e.g. a developer's cProfile run) already owns this thread
+            logger.warning(f"Profiler unavailable for {path}: {e}")
+            return None
+        _local.active = active
+        return active
+
+    def finish(self, active: Optional[_ActiveProfile], route: str) -> Optional[str]:
+        """Stop profiling and write the results; returns the profile name"""
+        if active is None:
+            return None
+        _local.active = None
+        active.stop()
+        try:
+            os.makedirs(self.output_dir, exist_ok=True)
+            slug = re.sub(r"[^A-Za-z0-9]+", "_", route).strip("_") or "root"
+            name = f"{int(time.time() * 1000)}-{slug}-{os.getpid()}-{threading.get_ident() % 10000}"
+            active.dump(os.path.join(self.output_dir, name))
+            self._prune()
+            logger.info(f"Profile written: {name} ({active.mode})")
+            return name
+        except Exception as e:
+            logger.error(f"Failed to write profile for {route}: {e}")
+            return None
+
+    def _prune(self):
+        with self._lock:
+            profiles = self.list_profiles()
+            for entry in profiles[self.keep:]:
+                for filename in entry["files"]:
+                    try:
+                        os.unlink(os.path.join(self.output_dir, filename))
+                    except OSError:
+                        pass
+
+    def list_profiles(self) -> List[Dict]:
+        """Profiles on disk, newest first"""
+        if not os.path.isdir(self.output_dir):
+            return []
+        grouped: Dict[str, Dict] = {}
+        for filename in os.listdir(self.output_dir):
+            for ext in PROFILE_EXTENSIONS:
+                if filename.endswith(ext):
+                    name = filename[:-len(ext)]
+                    entry = grouped.setdefault(name, {"name": name, "files": [], "bytes": 0})
+                    entry["files"].append(filename)
+                    entry["bytes"] += os.path.getsize(os.path.join(self.output_dir, filename))
+                    break
+        for entry in grouped.values():
+            parts = entry["name"].split("-")
+            entry["created_ms"] = int(parts[0]) if parts[0].isdigit() else 0
+            entry["route"] = parts[1] if len(parts) > 1 else ""
+        return sorted(grouped.values(), key=lambda e: e["created_ms"], reverse=True)
+
+    def is_admin(self, token: Optional[str]) -> bool:
+        return bool(self.secret and token and hmac.compare_digest(token, self.secret))
@@ -0,0 +1,265 @@
+"""
+RadioQuest Query Encoder - all-MiniLM-L6-v2 on CPU without PyTorch
+SentenceTransformer pulls PyTorch into whatever process loads it, which is fine
+for seed_db.py and far too heavy for a request path. `export` converts the saved
+model to ONNX once and quantizes its weights to int8; at query time only
+onnxruntime and the Rust `tokenizers` package are needed. Pooling (attention-
+masked mean, then L2 normalization) matches the sentence-transformers pipeline,
+and `verify` checks the result against the story_embedding vectors seed_db.py
+stored, which must agree to within a cosine tolerance.
+
+Concurrent requests rarely arrive in batches, but a batch of 16 costs little
+more than one. MicroBatcher holds the first query for a few milliseconds, runs
+everything that arrived in that window as one batch and hands each caller its
+own vector.
+
+    python -m query_encoder export      # ./models/all-MiniLM-L6-v2 -> ./models/all-MiniLM-L6-v2-onnx
+    python -m query_encoder verify      # compare with the seeded story_embedding vectors
+"""
+
+import argparse
+import json
+import logging
+import os
+import queue
+import shutil
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence
+
+import numpy as np
+
+import model_artifacts
+
+logger = logging.getLogger(__name__)
+
+MODEL_PATH = './models/all-MiniLM-L6-v2'
+ENCODER_DIR = os.environ.get("RADIOQUEST_ENCODER_DIR", './models/all-MiniLM-L6-v2-onnx')
+MODEL_FILE = "model.int8.onnx"
+CONFIG_FILE = "encoder.json"
+# all-MiniLM-L6-v2 was trained on 128-token inputs; its max_seq_length is 256
+MAX_LENGTH = 256
+BATCH_WINDOW_MS = float(os.environ.get("RADIOQUEST_ENCODER_BATCH_WINDOW_MS", "3"))
+MAX_BATCH = int(os.environ.get("RADIOQUEST_ENCODER_MAX_BATCH", "32"))
+# int8 weights move each vector slightly; seed-time and query-time vectors must stay this close
+MIN_COSINE = 0.99
+
+
+# --- Export (needs sentence-transformers, torch and onnxruntime) ---
+def export(model_path: str = MODEL_PATH, output_dir: str = ENCODER_DIR, opset: int = 14) -> str:
+    """Write the int8 ONNX model, its tokenizer and pooling settings to output_dir"""
+    import torch
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+    from sentence_transformers import SentenceTransformer
+
+    model = SentenceTransformer(model_path, device="cpu")
+    transformer = model[0].auto_model.eval()
+    os.makedirs(output_dir, exist_ok=True)
+    fp32_path = os.path.join(output_dir, "model.fp32.onnx")
+
+    sample = model.tokenizer(["RadioQuest export sample"], return_tensors="pt")
+    names = [name for name in ("input_ids", "attention_mask", "token_type_ids") if name in sample]
+    dynamic_axes = {name: {0: "batch", 1: "sequence"} for name in names}
+    dynamic_axes["last_hidden_state"] = {0: "batch", 1: "sequence"}
+    with torch.no_grad():
+        torch.onnx.export(transformer, tuple(sample[name] for name in names), fp32_path,
+                          input_names=names, output_names=["last_hidden_state"],
+                          dynamic_axes=dynamic_axes, opset_version=opset)
+    quantize_dynamic(fp32_path, os.path.join(output_dir, MODEL_FILE), weight_type=QuantType.QInt8)
+    os.remove(fp32_path)
+
+    shutil.copy(os.path.join(model_path, "tokenizer.json"), os.path.join(output_dir, "tokenizer.json"))
+    config = {
+        "source": os.path.basename(os.path.normpath(model_path)),
+        "max_length": min(model.max_seq_length or MAX_LENGTH, MAX_LENGTH),
+        "dimensions": model.get_sentence_embedding_dimension(),
+        "normalize": any(type(module).__name__ == "Normalize" for module in model),
+    }
+    with open(os.path.join(output_dir, CONFIG_FILE), "w") as f:
+        json.dump(config, f, indent=2)
+    model_artifacts.write_manifest(output_dir, {"source": config["source"], "quantization": "int8"})
+    logger.info(f"Exported {model_path} to {output_dir} ({os.path.getsize(os.path.join(output_dir, MODEL_FILE))} bytes)")
+    return output_dir
+
+
+# --- Encoding (needs onnxruntime and tokenizers) ---
+class QueryEncoder:
+    """Tokenize, run the int8 model, mean-pool and normalize; one call per batch"""
+
+    def __init__(self, model_dir: str = ENCODER_DIR, threads: Optional[int] = None):
+        import onnxruntime
+        from tokenizers import Tokenizer
+
+        model_artifacts.verify_artifacts(model_dir)
+        with open(os.path.join(model_dir, CONFIG_FILE)) as f:
+            self.config = json.load(f)
+        self.tokenizer = Tokenizer.from_file(os.path.join(model_dir, "tokenizer.json"))
+        self.tokenizer.enable_truncation(self.config.get("max_length", MAX_LENGTH))
+        self.tokenizer.enable_padding(pad_id=self.tokenizer.token_to_id("[PAD]") or 0)
+        options = onnxruntime.SessionOptions()
+        options.intra_op_num_threads = threads or int(os.environ.get("RADIOQUEST_ENCODER_THREADS", "0"))
+        self.session = onnxruntime.InferenceSession(os.path.join(model_dir, MODEL_FILE), options,
+                                                    providers=["CPUExecutionProvider"])
+        self.input_names = [i.name for i in self.session.get_inputs()]
+
+    @property
+    def dimensions(self) -> int:
+        return self.config.get("dimensions", 0)
+
+    def encode(self, texts: Sequence[str]) -> np.ndarray:
+        """(len(texts), dimensions) float32 embeddings"""
+        if not texts:
+            return np.zeros((0, self.dimensions), dtype=np.float32)
+        encodings = self.tokenizer.encode_batch(list(texts))
+        arrays = {
+            "input_ids": np.array([e.ids for e in encodings], dtype=np.int64),
+            "attention_mask": np.array([e.attention_mask for e in encodings], dtype=np.int64),
+            "token_type_ids": np.array([e.type_ids for e in encodings], dtype=np.int64),
+        }
+        hidden = self.session.run(None, {name: arrays[name] for name in self.input_names})[0]
+        mask = arrays["attention_mask"][:, :, None].astype(np.float32)
+        pooled = (hidden * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+        if self.config.get("normalize", True):
+            pooled /= np.clip(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12, None)
+        return pooled.astype(np.float32)
+
+
+# --- Micro-batching ---
+class MicroBatcher:
+    """
+    `encode(text)` from any thread; a single worker gathers requests for up to
+    window_ms after the first one (or until max_batch) and encodes them together.
+    While requests arrive one at a time the window is skipped.
+    """
+
+    def __init__(self, encode_batch: Callable[[Sequence[str]], np.ndarray],
+                 window_ms: float = BATCH_WINDOW_MS, max_batch: int = MAX_BATCH):
+        self.encode_batch = encode_batch
+        self.window = window_ms / 1000.0
+        self.max_batch = max_batch
+        self.batches = 0
+        self.encoded = 0
+        self._last_batch = 0
+        self._queue: "queue.Queue" = queue.Queue()
+        self._worker = threading.Thread(target=self._run, name="query-encoder", daemon=True)
+        self._worker.start()
+
+    def submit(self, text: str) -> Future:
+        future: Future = Future()
+        self._queue.put((text, future))
+        return future
+
+    def encode(self, text: str, timeout: Optional[float] = None) -> np.ndarray:
+        return self.submit(text).result(timeout)
+
+    def _collect(self) -> List[Any]:
+        batch = [self._queue.get()]
+        if self._last_batch <= 1 and self._queue.empty():
+            # Sequential traffic: nobody else to wait for, so don't add the window to every call
+            self._last_batch = 1
+            return batch
+        deadline = time.monotonic() + self.window
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        self._last_batch = len(batch)
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            pending = [(text, future) for text, future in batch if future.set_running_or_notify_cancel()]
+            if not pending:
+                continue
+            try:
+                vectors = self.encode_batch([text for text, _ in pending])
+            except Exception as e:
+                logger.error(f"Query encoding failed for a batch of {len(pending)}: {e}")
+                for _, future in pending:
+                    future.set_exception(e)
+                continue
+            self.batches += 1
+            self.encoded += len(pending)
+            for (_, future), vector in zip(pending, vectors):
+                future.set_result(vector)
+
+    def stats(self) -> Dict[str, Any]:
+        return {"batches": self.batches, "encoded": self.encoded,
+                "mean_batch": round(self.encoded / self.batches, 2) if self.batches else 0.0}
+
+
+_batcher: Optional[MicroBatcher] = None
+_batcher_lock = threading.Lock()
+
+
+def get_batcher(model_dir: str = ENCODER_DIR) -> Optional[MicroBatcher]:
+    """Process-wide micro-batched encoder, None when the exported model or runtime is missing"""
+    global _batcher
+    with _batcher_lock:
+        if _batcher is None:
+            try:
+                _batcher = MicroBatcher(QueryEncoder(model_dir).encode)
+                logger.info(f"Query encoder loaded from {model_dir}")
+            except Exception as e:
+                logger.warning(f"Query encoder unavailable ({model_dir}): {e}")
+                return None
+        return _batcher
+
+
+# --- Verification ---
+def segment_text(segment: Dict[str, Any]) -> str:
+    """The text seed_db.py embeds for a segment"""
+    return f"{segment.get('title', '')} {segment.get('text') or segment.get('content') or ''}"
+
+
+def verify(encoder: QueryEncoder, segments: Iterable[Dict[str, Any]], min_cosine: float = MIN_COSINE) -> Dict[str, Any]:
+    """Cosine similarity between encoder output and each segment's stored story_embedding"""
+    segments = [s for s in segments if s.get("story_embedding")]
+    if not segments:
+        return {"segments": 0, "ok": False}
+    stored = np.asarray([s["story_embedding"] for s in segments], dtype=np.float32)
+    stored /= np.clip(np.linalg.norm(stored, axis=1, keepdims=True), 1e-12, None)
+    encoded = encoder.encode([segment_text(s) for s in segments])
+    cosines = (stored * encoded).sum(axis=1)
+    worst = int(np.argmin(cosines))
+    return {
+        "segments": len(segments),
+        "min_cosine": round(float(cosines[worst]), 5),
+        "mean_cosine": round(float(cosines.mean()), 5),
+        "worst_segment": str(segments[worst]["_id"]),
+        "ok": bool(cosines[worst] >= min_cosine),
+    }
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Export and check the ONNX query encoder")
+    parser.add_argument("command", choices=["export", "verify"])
+    parser.add_argument("--model", default=MODEL_PATH, help="saved sentence-transformers model")
+    parser.add_argument("--output", default=ENCODER_DIR, help="exported encoder directory")
+    parser.add_argument("--min-cosine", type=float, default=MIN_COSINE)
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    if args.command == "export":
+        export(args.model, args.output)
+        return 0
+
+    from pymongo import MongoClient
+    mongo_uri = (os.environ.get("MONGO_URI") or "").strip('\'"')
+    if not mongo_uri:
+        logger.error("MONGO_URI is not set.")
+        return 1
+    collection = MongoClient(mongo_uri, serverSelectionTimeoutMS=10000).get_database("RadioQuest").story_segments
+    report = verify(QueryEncoder(args.output), collection.find({}), args.min_cosine)
+    print(json.dumps(report, indent=2))
+    return 0 if report["ok"] else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
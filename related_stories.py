@@ -0,0 +1,161 @@
+"""
+RadioQuest Related Stories - precomputed "you might also like" lists
+Each segment stores its top-k nearest neighbours by cosine similarity of the
+`story_embedding` vectors written by seed_db.py, so the story page renders them
+straight from the segment document with no extra query.
+
+The scores are one matrix product over the normalized embeddings, and the top k
+per row come from np.argpartition, so only k entries per row are ever sorted.
+A segment's own branches are left out: they are already on the page as choices.
+
+After an edit, only the changed segments are recomputed against the corpus,
+plus the segments they could enter or leave: those that listed a changed
+segment, or that score a changed segment above their current k-th neighbour.
+
+    python -m related_stories                      # every segment
+    python -m related_stories intro climb_hill     # after editing these two
+"""
+
+import argparse
+import logging
+import os
+from typing import Any, Dict, Iterable, List, Optional, Set
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+TOP_K = int(os.environ.get("RADIOQUEST_RELATED_K", "3"))
+# Neighbours below this cosine similarity are not worth recommending
+MIN_SCORE = float(os.environ.get("RADIOQUEST_RELATED_MIN_SCORE", "0.2"))
+
+PROJECTION = {"title": 1, "story_embedding": 1, "choices": 1, "related": 1}
+
+
+def choice_targets(segment: Dict[str, Any]) -> Set[str]:
+    targets = set()
+    for choice in segment.get("choices") or []:
+        target = choice.get("next_segment_id") or choice.get("id")
+        if target:
+            targets.add(str(target))
+    return targets
+
+
+class RelatedGraph:
+    """Normalized embedding matrix of the segments that have one"""
+
+    def __init__(self, segments: Iterable[Dict[str, Any]]):
+        self.segments: List[Dict[str, Any]] = []
+        vectors = []
+        for segment in segments:
+            embedding = segment.get("story_embedding")
+            if not embedding:
+                continue
+            if vectors and len(embedding) != len(vectors[0]):
+                logger.warning(f"Skipping segment {segment['_id']}: embedding has {len(embedding)} dimensions")
+                continue
+            self.segments.append(segment)
+            vectors.append(embedding)
+        self.ids = [str(segment["_id"]) for segment in self.segments]
+        self.row = {segment_id: i for i, segment_id in enumerate(self.ids)}
+        matrix = np.asarray(vectors, dtype=np.float32).reshape(len(vectors), -1)
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        self.matrix = matrix / np.where(norms == 0, 1, norms)
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def scores(self, rows: List[int], columns: Optional[List[int]] = None) -> np.ndarray:
+        """Similarity of rows x columns, -inf where a column is the row itself or one of its choices"""
+        columns = list(range(len(self))) if columns is None else columns
+        scores = self.matrix[rows] @ self.matrix[columns].T
+        position = {column: j for j, column in enumerate(columns)}
+        for i, row in enumerate(rows):
+            for excluded in choice_targets(self.segments[row]) | {self.ids[row]}:
+                j = position.get(self.row.get(excluded, -1))
+                if j is not None:
+                    scores[i, j] = -np.inf
+        scores[scores < MIN_SCORE] = -np.inf
+        return scores
+
+    def neighbours(self, rows: List[int], k: int = TOP_K) -> Dict[str, List[Dict[str, Any]]]:
+        """Top-k related entries for each row, best first"""
+        if not rows or not len(self):
+            return {}
+        scores = self.scores(rows)
+        k = min(k, scores.shape[1])
+        # Unordered top k per row in O(n), then a sort of just those k
+        top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        related = {}
+        for i, row in enumerate(rows):
+            picks = sorted(top[i], key=lambda j: (-scores[i, j], self.ids[j]))
+            related[self.ids[row]] = [
+                {"_id": self.ids[j], "title": self.segments[j].get("title", ""), "score": round(float(scores[i, j]), 4)}
+                for j in picks if np.isfinite(scores[i, j])
+            ]
+        return related
+
+    def affected_rows(self, changed: Set[str], k: int = TOP_K) -> List[int]:
+        """Rows whose stored list a change to `changed` could alter"""
+        changed_rows = [self.row[segment_id] for segment_id in changed if segment_id in self.row]
+        rows = set(changed_rows)
+        others = [i for i in range(len(self)) if i not in rows]
+        if not others:
+            return sorted(rows)
+        if changed_rows:
+            best_changed = self.scores(others, changed_rows).max(axis=1)
+        else:
+            best_changed = np.full(len(others), -np.inf)
+        for i, row in enumerate(others):
+            related = self.segments[row].get("related") or []
+            if any(entry.get("_id") in changed for entry in related):
+                rows.add(row)
+            elif np.isfinite(best_changed[i]) and (len(related) < k or best_changed[i] > related[-1]["score"]):
+                rows.add(row)
+        return sorted(rows)
+
+
+def update_related(collection, changed_ids: Optional[Iterable[str]] = None, k: int = TOP_K) -> int:
+    """
+    Recompute and store `related` on every segment, or only where changes to
+    changed_ids (edited, added or deleted segments) can show. Returns the number
+    of documents written; unchanged lists are not rewritten.
+    """
+    graph = RelatedGraph(collection.find({}, PROJECTION))
+    if changed_ids is None:
+        rows = list(range(len(graph)))
+    else:
+        rows = graph.affected_rows({str(segment_id) for segment_id in changed_ids}, k)
+    written = 0
+    for segment_id, related in graph.neighbours(rows, k).items():
+        segment = graph.segments[graph.row[segment_id]]
+        if segment.get("related") == related:
+            continue
+        collection.update_one({"_id": segment["_id"]}, {"$set": {"related": related}})
+        segment["related"] = related
+        written += 1
+    logger.info(f"Related stories: {len(rows)} of {len(graph)} segments recomputed, {written} updated")
+    return written
+
+
+def main(argv: Optional[List[str]] = None):
+    from pymongo import MongoClient
+
+    parser = argparse.ArgumentParser(description="Precompute related stories from segment embeddings")
+    parser.add_argument("segment_ids", nargs="*", help="only update for these changed segments")
+    parser.add_argument("-k", type=int, default=TOP_K, help="related stories per segment")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    mongo_uri = (os.environ.get("MONGO_URI") or "").strip('\'"')
+    if not mongo_uri:
+        logger.error("MONGO_URI is not set.")
+        return 1
+    client = MongoClient(mongo_uri, serverSelectionTimeoutMS=10000)
+    collection = client.get_database("RadioQuest").story_segments
+    update_related(collection, args.segment_ids or None, args.k)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,87 @@
+"""
+RadioQuest Search Cache - shared result cache for story searches
+Kids repeat the same few queries ("forest", "goma", "lake"), and every search is
+a regex scan of the corpus. Results are cached per (normalized query, mode,
+limit) under the current corpus version: when the corpus changes the version
+changes, so old entries are never read again and age out of the LRU.
+
+The corpus version comes from a caller-supplied function, checked at most every
+`check_interval` seconds so a busy search path doesn't pay for it per request.
+"""
+
+import copy
+import logging
+import threading
+import time
+import unicodedata
+from typing import Any, Callable, Dict, Optional, Tuple
+
+import metrics
+from caching import TTLCache
+
+logger = logging.getLogger(__name__)
+
+
+def normalize_query(query: str) -> str:
+    """Case-folded, NFKC-normalized query with whitespace collapsed"""
+    return " ".join(unicodedata.normalize("NFKC", query).casefold().split())
+
+
+class SearchCache:
+    """
+    `get_or_search(query, mode, limit, search_fn)` returns cached results or runs
+    search_fn(normalized_query) -> (results, cacheable). Results degraded by a
+    backend error should come back with cacheable=False.
+    """
+
+    def __init__(self, maxsize: int = 256, ttl: float = 300.0,
+                 version_fn: Optional[Callable[[], str]] = None, check_interval: float = 60.0):
+        self._results = TTLCache(maxsize=maxsize, ttl=ttl)
+        self.version_fn = version_fn
+        self.check_interval = check_interval
+        self.corpus_version = "initial"
+        self._checked_at: Optional[float] = None
+        self._lock = threading.Lock()
+
+    def current_version(self) -> str:
+        if self.version_fn is None:
+            return self.corpus_version
+        now = time.monotonic()
+        with self._lock:
+            if self._checked_at is not None and now - self._checked_at < self.check_interval:
+                return self.corpus_version
+            self._checked_at = now
+        try:
+            version = self.version_fn()
+        except Exception as e:
+            logger.warning(f"Corpus version check failed, keeping {self.corpus_version}: {e}")
+            return self.corpus_version
+        if version != self.corpus_version:
+            logger.info(f"Search corpus version {self.corpus_version} -> {version}")
+            self.corpus_version = version
+        return version
+
+    def get_or_search(self, query: str, mode: str, limit: int,
+                      search_fn: Callable[[str], Tuple[Any, bool]]) -> Any:
+        normalized = normalize_query(query)
+        key = (self.current_version(), normalized, mode, limit)
+        results = self._results.get(key)
+        metrics.record_cache("search", results is not None)
+        if results is None:
+            results, cacheable = search_fn(normalized)
+            if cacheable:
+                self._results.set(key, copy.deepcopy(results))
+                return results
+        else:
+            # Callers decorate results in place; never hand out the cached objects
+            results = copy.deepcopy(results)
+        return results
+
+    def invalidate(self):
+        """Drop every entry and re-check the corpus version on the next search"""
+        self._results.clear()
+        with self._lock:
+            self._checked_at = None
+
+    def stats(self) -> Dict[str, Any]:
+        return dict(self._results.stats(), corpus_version=self.corpus_version)
@@ -4,6 +4,10 @@ from pymongo import MongoClient
 from sentence_transformers import SentenceTransformer
 from bson.objectid import ObjectId
 
+import model_artifacts
+import related_stories
+import versioning
+
 # --- Configuration ---
 MONGO_URI = os.environ.get("MONGO_URI")
 if MONGO_URI:
@@ -136,6 +140,12 @@ def seed_database():
         logging.info("Successfully connected to MongoDB.")
 
         logging.info("Loading sentence-transformer model for embeddings...")
+        try:
+            model_artifacts.verify_artifacts(MODEL_PATH)
+        except model_artifacts.ArtifactError as e:
+            logging.error(f"Model artifacts are missing or corrupt, run download_model.py first: {e}")
+            return
+        # Weights are safetensors, which transformers memory-maps instead of unpickling
         model = SentenceTransformer(MODEL_PATH)
         logging.info("Model loaded.")
 
@@ -150,6 +160,11 @@ def seed_database():
             segment_data['story_embedding'] = embedding
             collection.insert_one(segment_data)
             logging.info(f"Inserted segment: '{segment_id}'")
+        # Tells running servers to drop cached search results and rebuild their indexes
+        versioning.bump_corpus_version(collection)
+
+        logging.info("Computing related stories from the embeddings...")
+        related_stories.update_related(collection)
 
         logging.info("Database seeding completed successfully!")
 
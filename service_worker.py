@@ -0,0 +1,53 @@
+"""
+RadioQuest Service Worker - offline app shell and story prefetching
+Builds the inputs for templates/sw.js (the precache list and a cache version
+derived from it) and the web app manifest. The worker precaches the shell and
+fingerprinted assets on install, serves story pages and segment JSON
+stale-while-revalidate, and on each story page prefetches the segments its
+choices lead to, plus their audio, so the next choice opens without the network.
+"""
+
+from typing import Any, Dict, List
+
+from story_packs import choice_target
+from versioning import content_hash
+
+# Third-party files every page loads; jsDelivr sends CORS headers, so they cache as normal responses
+CDN_SHELL_URLS = [
+    "https://cdn.jsdelivr.net/npm/bootstrap@5.3.3/dist/css/bootstrap.min.css",
+    "https://cdn.jsdelivr.net/npm/bootstrap@5.3.3/dist/js/bootstrap.bundle.min.js",
+]
+# Fingerprinted assets fetched on install; image variants are cached when a page actually uses them
+SHELL_ASSETS = ["css/style.css"]
+# Upper bound on cached pages/segments/audio, trimmed oldest first
+RUNTIME_CACHE_LIMIT = 80
+
+WEB_MANIFEST = {
+    "name": "RadioQuest",
+    "short_name": "RadioQuest",
+    "description": "Interactive African radio stories for kids. Listen, vote, and help shape the adventure!",
+    "start_url": "/",
+    "scope": "/",
+    "display": "standalone",
+    "background_color": "#181e2a",
+    "theme_color": "#181e2a",
+}
+
+
+def shell_urls(asset_url) -> List[str]:
+    """Everything precached on install; `asset_url` resolves logical asset paths"""
+    return ["/"] + [asset_url(path) for path in SHELL_ASSETS] + CDN_SHELL_URLS
+
+
+def cache_version(precache_urls: List[str]) -> str:
+    """Changes whenever a precached URL does, which makes browsers install the new worker"""
+    return content_hash(precache_urls, length=12)
+
+
+def child_ids(segment: Dict[str, Any]) -> List[str]:
+    ids = []
+    for choice in segment.get("choices") or []:
+        target = choice_target(choice)
+        if target and target not in ids:
+            ids.append(target)
+    return ids
@@ -0,0 +1,232 @@
+"""
+RadioQuest Story Packs - offline bundles of a story branch
+A pack is one zip holding every segment reachable from a root segment (as JSON)
+plus the narration audio already rendered for it, so a radio or phone that syncs
+once a day downloads a whole episode in a single request.
+
+The archive is streamed: segment JSON is small, and audio files are copied into
+the zip in chunks, so a pack never sits in memory. Every pack's manifest is kept
+in a PackStore, which lets a client that already has pack version X ask for a
+delta pack containing only the segments that changed since X.
+
+    python -m story_packs intro --output intro.zip [--since <version>] [--profile low]
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+import zipfile
+from collections import deque
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+from versioning import content_hash, segment_version
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_NAME = "manifest.json"
+PACK_FORMAT = 1
+CHUNK_SIZE = 64 * 1024
+DEFAULT_MAX_DEPTH = int(os.environ.get("RADIOQUEST_PACK_MAX_DEPTH", "10"))
+
+
+def choice_target(choice: Dict[str, Any]) -> Optional[str]:
+    """Segment a choice leads to (mock data uses `id`, seeded data `next_segment_id`)"""
+    return choice.get("next_segment_id") or choice.get("id")
+
+
+def walk_story_graph(load_segment: Callable[[str], Optional[Dict[str, Any]]], root: str,
+                     max_depth: int = DEFAULT_MAX_DEPTH) -> List[Dict[str, Any]]:
+    """Breadth-first list of the segments reachable from root via choices"""
+    segments = []
+    seen = {root}
+    queue = deque([(root, 0)])
+    while queue:
+        segment_id, depth = queue.popleft()
+        segment = load_segment(segment_id)
+        if not segment:
+            continue
+        segments.append(segment)
+        if depth >= max_depth:
+            continue
+        for choice in segment.get("choices") or []:
+            child = choice_target(choice)
+            if child and child not in seen:
+                seen.add(child)
+                queue.append((child, depth + 1))
+    return segments
+
+
+class PackStore:
+    """Manifests of previously built packs, kept on disk so delta packs survive restarts"""
+
+    def __init__(self, directory: str, keep: int = 200):
+        self.directory = directory
+        self.keep = keep
+        self._lock = threading.Lock()
+
+    def _path(self, version: str) -> str:
+        return os.path.join(self.directory, f"{version}.json")
+
+    def get(self, version: str) -> Optional[Dict[str, Any]]:
+        if not version or not version.isalnum():
+            return None
+        try:
+            with open(self._path(version)) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logger.error(f"Failed to read pack manifest {version}: {e}")
+            return None
+
+    def save(self, manifest: Dict[str, Any]):
+        path = self._path(manifest["pack_version"])
+        try:
+            with self._lock:
+                os.makedirs(self.directory, exist_ok=True)
+                if os.path.exists(path):
+                    os.utime(path)
+                    return
+                tmp_path = f"{path}.tmp"
+                with open(tmp_path, "w") as f:
+                    json.dump(manifest, f, sort_keys=True)
+                os.replace(tmp_path, path)
+                self._prune()
+        except Exception as e:
+            logger.error(f"Failed to save pack manifest: {e}")
+
+    def _prune(self):
+        manifests = [os.path.join(self.directory, name) for name in os.listdir(self.directory)
+                     if name.endswith(".json")]
+        manifests.sort(key=os.path.getmtime, reverse=True)
+        for stale in manifests[self.keep:]:
+            os.unlink(stale)
+
+
+def build_manifest(segments: List[Dict[str, Any]], root: str, profile: str,
+                   audio_key_for: Callable[[Dict[str, Any]], Optional[str]], store,
+                   base: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """
+    Describe a pack. The pack version covers every segment version and the audio
+    profile, so the same branch always yields the same version. With `base` (the
+    manifest of a pack the client already has) only changed segments are marked
+    for inclusion and deleted ones are listed under `removed`.
+    """
+    entries = {}
+    for segment in segments:
+        segment_id = str(segment["_id"])
+        audio_key = audio_key_for(segment)
+        entry = {"version": segment_version(segment), "file": f"segments/{segment_id}.json"}
+        if audio_key:
+            entry["audio"] = f"audio/{audio_key}"
+            entry["audio_bytes"] = store.size(audio_key)
+        entries[segment_id] = entry
+
+    pack_version = content_hash({"root": root, "profile": profile,
+                                 "segments": {k: [v["version"], v.get("audio")] for k, v in entries.items()}})
+    base_entries = (base or {}).get("segments", {})
+    included = [segment_id for segment_id, entry in entries.items()
+                if base_entries.get(segment_id, {}).get("version") != entry["version"]
+                or base_entries.get(segment_id, {}).get("audio") != entry.get("audio")]
+    # A text fix that leaves the narration unchanged should not resend the audio
+    included_audio = [segment_id for segment_id in included
+                      if entries[segment_id].get("audio")
+                      and base_entries.get(segment_id, {}).get("audio") != entries[segment_id]["audio"]]
+    return {
+        "format": PACK_FORMAT,
+        "pack_version": pack_version,
+        "base_version": base["pack_version"] if base else None,
+        "root": root,
+        "profile": profile,
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "segments": entries,
+        "included": included,
+        "included_audio": included_audio,
+        "removed": sorted(set(base_entries) - set(entries)),
+    }
+
+
+class _StreamBuffer:
+    """Write-only file object whose contents are drained by the generator after each write"""
+
+    def __init__(self):
+        self._chunks: List[bytes] = []
+        self._offset = 0
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        self._offset += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._offset
+
+    def flush(self):
+        pass
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def stream_pack(manifest: Dict[str, Any], segments: List[Dict[str, Any]],
+                audio_key_for: Callable[[Dict[str, Any]], Optional[str]], store) -> Iterator[bytes]:
+    """Yield the zip archive for a manifest chunk by chunk, reading audio from the blob store"""
+    by_id = {str(segment["_id"]): segment for segment in segments}
+    buffer = _StreamBuffer()
+    with zipfile.ZipFile(buffer, "w", compression=zipfile.ZIP_DEFLATED) as archive:
+        archive.writestr(MANIFEST_NAME, json.dumps(manifest, indent=2, sort_keys=True))
+        yield buffer.drain()
+        for segment_id in manifest["included"]:
+            entry = manifest["segments"][segment_id]
+            archive.writestr(entry["file"], json.dumps(by_id[segment_id], default=str, sort_keys=True))
+            yield buffer.drain()
+            audio_key = audio_key_for(by_id[segment_id]) if segment_id in manifest["included_audio"] else None
+            if not audio_key:
+                continue
+            # Audio is already compressed: store it, and copy it through in chunks
+            info = zipfile.ZipInfo(entry["audio"], date_time=time.gmtime()[:6])
+            info.compress_type = zipfile.ZIP_STORED
+            info.file_size = entry["audio_bytes"]
+            with store.open(audio_key) as source, archive.open(info, "w") as target:
+                for chunk in iter(lambda: source.read(CHUNK_SIZE), b""):
+                    target.write(chunk)
+                    yield buffer.drain()
+    yield buffer.drain()
+
+
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Export an offline story pack")
+    parser.add_argument("root", help="segment id to start from")
+    parser.add_argument("--output", help="zip path (default: <root>-<version>.zip)")
+    parser.add_argument("--since", help="pack version the device already has; export only the changes")
+    parser.add_argument("--profile", help="audio profile to bundle (hq, low, opus)")
+    parser.add_argument("--depth", type=int, default=DEFAULT_MAX_DEPTH)
+    parser.add_argument("--render-audio", action="store_true", help="synthesize audio that is not cached yet")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    import app as radioquest
+
+    manifest, segments, audio_key_for = radioquest.prepare_story_pack(
+        args.root, since=args.since, profile_name=args.profile, max_depth=args.depth, render_audio=args.render_audio)
+    if not segments:
+        logger.error(f"Segment not found: {args.root}")
+        return 1
+    output = args.output or f"{args.root}-{manifest['pack_version']}.zip"
+    with open(output, "wb") as f:
+        for chunk in stream_pack(manifest, segments, audio_key_for, radioquest.audio_store):
+            f.write(chunk)
+    kind = f"delta since {manifest['base_version']}" if manifest["base_version"] else "full"
+    logger.info(f"Wrote {output}: {kind} pack {manifest['pack_version']}, "
+                f"{len(manifest['included'])}/{len(manifest['segments'])} segments")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,251 @@
+"""
+RadioQuest Suggest - typeahead over segment titles and salient terms
+Suggestions come from an in-memory radix (compressed prefix) trie, so a lookup
+costs one walk down the typed prefix plus a bounded scan of the subtree below
+it, never a collection scan. Titles are indexed under every word they contain
+("river" finds "The Missing River"); terms are the most frequent non-stopword
+words of each segment.
+
+The index is built from a snapshot of the segments and kept current with
+sync(): only segments whose version changed are re-indexed.
+"""
+
+import logging
+import re
+import threading
+from collections import Counter, deque
+from typing import Any, Dict, Hashable, Iterable, Iterator, List, Optional, Set, Tuple
+
+from search_cache import normalize_query
+from versioning import segment_version
+
+logger = logging.getLogger(__name__)
+
+TERMS_PER_SEGMENT = 8
+MIN_TERM_LENGTH = 4
+# Subtree entries looked at per lookup; bounds the cost of one-letter prefixes
+MAX_CANDIDATES = 200
+
+_WORD_RE = re.compile(r"[^\W\d_]+(?:'[^\W\d_]+)?")
+STOPWORDS = frozenset("""
+    about after again also always another away back been before being from have here into just
+    know like little long made make many more most much must never only other over same should
+    some than that their them then there these they this those through time today until upon very
+    want were what when where which while will with would your you're they're it's let's
+""".split())
+
+
+# --- Radix trie ---
+class _Node:
+    __slots__ = ("children", "values")
+
+    def __init__(self):
+        # first character of the edge label -> (label, child)
+        self.children: Dict[str, Tuple[str, "_Node"]] = {}
+        self.values: Set[Hashable] = set()
+
+
+def _common_prefix(a: str, b: str) -> int:
+    n = min(len(a), len(b))
+    i = 0
+    while i < n and a[i] == b[i]:
+        i += 1
+    return i
+
+
+class RadixTrie:
+    """Prefix tree whose edges carry whole strings; each key maps to a set of values"""
+
+    def __init__(self):
+        self.root = _Node()
+        self.keys = 0
+
+    def insert(self, key: str, value: Hashable):
+        node = self.root
+        while key:
+            edge = node.children.get(key[0])
+            if edge is None:
+                child = _Node()
+                node.children[key[0]] = (key, child)
+                node, key = child, ""
+                self.keys += 1
+                break
+            label, child = edge
+            shared = _common_prefix(label, key)
+            if shared < len(label):
+                # Split the edge at the point where key diverges
+                middle = _Node()
+                middle.children[label[shared]] = (label[shared:], child)
+                node.children[key[0]] = (label[:shared], middle)
+                child = middle
+            node, key = child, key[shared:]
+        else:
+            if not node.values:
+                self.keys += 1
+        node.values.add(value)
+
+    def remove(self, key: str, value: Hashable):
+        self._remove(self.root, key, value)
+
+    def _remove(self, node: _Node, key: str, value: Hashable) -> bool:
+        """Returns True when `node` ended up empty and can be dropped by its parent"""
+        if not key:
+            if value in node.values:
+                node.values.discard(value)
+                if not node.values:
+                    self.keys -= 1
+        else:
+            edge = node.children.get(key[0])
+            if edge is None or not key.startswith(edge[0]):
+                return False
+            label, child = edge
+            if self._remove(child, key[len(label):], value):
+                del node.children[key[0]]
+            elif not child.values and len(child.children) == 1:
+                # Re-compress: merge a valueless single-child node into its parent edge
+                (grand_label, grandchild), = child.children.values()
+                node.children[key[0]] = (label + grand_label, grandchild)
+        return node is not self.root and not node.values and not node.children
+
+    def _find(self, prefix: str) -> Optional[Tuple[_Node, str]]:
+        """Node covering prefix and the key text from the prefix's end to that node"""
+        node = self.root
+        while prefix:
+            edge = node.children.get(prefix[0])
+            if edge is None:
+                return None
+            label, child = edge
+            if label.startswith(prefix):
+                return child, label[len(prefix):]
+            if not prefix.startswith(label):
+                return None
+            node, prefix = child, prefix[len(label):]
+        return node, ""
+
+    def iter_prefix(self, prefix: str, limit: Optional[int] = None) -> Iterator[Tuple[str, Set[Hashable]]]:
+        """(key, values) for keys starting with prefix, shortest first"""
+        found = self._find(prefix)
+        if found is None:
+            return
+        node, rest = found
+        queue = deque([(prefix + rest, node)])
+        seen = 0
+        while queue:
+            key, node = queue.popleft()
+            if node.values:
+                yield key, node.values
+                seen += 1
+                if limit is not None and seen >= limit:
+                    return
+            for label, child in sorted(node.children.values(), key=lambda edge: edge[0]):
+                queue.append((key + label, child))
+
+
+# --- Suggestion index ---
+def salient_terms(text: str, count: int = TERMS_PER_SEGMENT) -> List[str]:
+    words = [w for w in (normalize_query(m) for m in _WORD_RE.findall(text or ""))
+             if len(w) >= MIN_TERM_LENGTH and w not in STOPWORDS]
+    return [word for word, _ in Counter(words).most_common(count)]
+
+
+def title_keys(title: str) -> List[str]:
+    """The normalized title from each word on, so any word of it is a prefix"""
+    words = normalize_query(title).split()
+    return [" ".join(words[i:]) for i in range(len(words))]
+
+
+class SuggestIndex:
+    def __init__(self):
+        self.trie = RadixTrie()
+        self.version: Optional[str] = None
+        self._titles: Dict[str, str] = {}
+        self._term_segments: Dict[str, Set[str]] = {}
+        # segment id -> (segment version, [(trie key, value)]) for incremental removal
+        self._indexed: Dict[str, Tuple[str, List[Tuple[str, Tuple[str, str]]]]] = {}
+        self._lock = threading.RLock()
+
+    def __len__(self) -> int:
+        return len(self._indexed)
+
+    def _remove_segment(self, segment_id: str):
+        _, entries = self._indexed.pop(segment_id)
+        for key, value in entries:
+            if value[0] == "term":
+                segments = self._term_segments.get(value[1], set())
+                segments.discard(segment_id)
+                if segments:
+                    continue
+                self._term_segments.pop(value[1], None)
+            self.trie.remove(key, value)
+        self._titles.pop(segment_id, None)
+
+    def _add_segment(self, segment: Dict[str, Any], version: str):
+        segment_id = str(segment["_id"])
+        entries = []
+        title = segment.get("title") or ""
+        if title:
+            self._titles[segment_id] = title
+            entries += [(key, ("title", segment_id)) for key in title_keys(title)]
+        for term in salient_terms(segment.get("content") or segment.get("text") or ""):
+            self._term_segments.setdefault(term, set()).add(segment_id)
+            entries.append((term, ("term", term)))
+        for key, value in entries:
+            self.trie.insert(key, value)
+        self._indexed[segment_id] = (version, entries)
+
+    def update_segment(self, segment: Dict[str, Any]) -> bool:
+        """(Re-)index one segment; returns False when it was already current"""
+        segment_id = str(segment["_id"])
+        version = segment_version(segment)
+        with self._lock:
+            indexed = self._indexed.get(segment_id)
+            if indexed is not None and indexed[0] == version:
+                return False
+            if indexed is not None:
+                self._remove_segment(segment_id)
+            self._add_segment(segment, version)
+            return True
+
+    def remove_segment(self, segment_id: str):
+        with self._lock:
+            if segment_id in self._indexed:
+                self._remove_segment(segment_id)
+
+    def sync(self, segments: Iterable[Dict[str, Any]], version: Optional[str] = None) -> int:
+        """Bring the index in line with a full snapshot; returns how many segments changed"""
+        with self._lock:
+            current = set()
+            changed = 0
+            for segment in segments:
+                current.add(str(segment["_id"]))
+                changed += self.update_segment(segment)
+            for segment_id in set(self._indexed) - current:
+                self._remove_segment(segment_id)
+                changed += 1
+            self.version = version
+        if changed:
+            logger.info(f"Suggest index: {changed} segments re-indexed, {self.trie.keys} keys")
+        return changed
+
+    def suggest(self, query: str, limit: int = 8) -> List[Dict[str, Any]]:
+        prefix = normalize_query(query)
+        if not prefix:
+            return []
+        titles, terms = [], []
+        with self._lock:
+            seen = set()
+            for key, values in self.trie.iter_prefix(prefix, limit=MAX_CANDIDATES):
+                for kind, ref in values:
+                    if (kind, ref) in seen:
+                        continue
+                    seen.add((kind, ref))
+                    if kind == "title":
+                        # A match at the start of the title ranks above one on a later word
+                        titles.append((not title_keys(self._titles[ref])[0].startswith(prefix), len(key),
+                                       {"text": self._titles[ref], "kind": "title", "segment_id": ref}))
+                    else:
+                        segments = len(self._term_segments.get(ref, ()))
+                        terms.append((-segments, len(key), {"text": ref, "kind": "term", "segments": segments}))
+        titles.sort(key=lambda t: t[:2])
+        terms.sort(key=lambda t: t[:2])
+        return [entry for *_, entry in titles + terms][:limit]
@@ -0,0 +1,139 @@
+// RadioQuest service worker (generated by /sw.js - see service_worker.py)
+const CACHE_VERSION = {{ cache_version|tojson }};
+const SHELL_CACHE = `radioquest-shell-${CACHE_VERSION}`;
+const RUNTIME_CACHE = 'radioquest-runtime';
+const PRECACHE_URLS = {{ precache_urls|tojson }};
+const RUNTIME_CACHE_LIMIT = {{ runtime_cache_limit }};
+// Story pages vary on connection client hints; an offline copy of any variant beats none
+const MATCH_OPTIONS = { ignoreVary: true };
+
+self.addEventListener('install', event => {
+    event.waitUntil(
+        caches.open(SHELL_CACHE)
+            .then(cache => cache.addAll(PRECACHE_URLS.map(url => new Request(url, { mode: 'cors', credentials: 'omit' }))))
+            .then(() => self.skipWaiting())
+    );
+});
+
+self.addEventListener('activate', event => {
+    event.waitUntil(
+        caches.keys()
+            .then(keys => Promise.all(keys
+                .filter(key => key.startsWith('radioquest-shell-') && key !== SHELL_CACHE)
+                .map(key => caches.delete(key))))
+            .then(() => self.clients.claim())
+    );
+});
+
+async function trimRuntimeCache() {
+    const cache = await caches.open(RUNTIME_CACHE);
+    const keys = await cache.keys();
+    for (const request of keys.slice(0, Math.max(0, keys.length - RUNTIME_CACHE_LIMIT))) {
+        await cache.delete(request);
+    }
+}
+
+async function putRuntime(request, response) {
+    if (!response || !response.ok || response.status === 206) {
+        return;
+    }
+    const cache = await caches.open(RUNTIME_CACHE);
+    await cache.put(request, response);
+    await trimRuntimeCache();
+}
+
+async function staleWhileRevalidate(event) {
+    const cached = await caches.match(event.request, MATCH_OPTIONS);
+    const network = fetch(event.request).then(response => {
+        event.waitUntil(putRuntime(event.request, response.clone()));
+        return response;
+    });
+    if (cached) {
+        event.waitUntil(network.catch(() => undefined));
+        return cached;
+    }
+    return network;
+}
+
+// <audio> asks for byte ranges; answer them from the cached full file
+async function rangeResponse(request, response) {
+    const range = /bytes=(\d*)-(\d*)/.exec(request.headers.get('Range') || '');
+    if (!range) {
+        return response;
+    }
+    const body = await response.arrayBuffer();
+    const start = range[1] ? Number(range[1]) : Math.max(0, body.byteLength - Number(range[2]));
+    const end = range[1] && range[2] ? Math.min(Number(range[2]), body.byteLength - 1) : body.byteLength - 1;
+    return new Response(body.slice(start, end + 1), {
+        status: 206,
+        headers: {
+            'Content-Type': response.headers.get('Content-Type') || 'application/octet-stream',
+            'Content-Range': `bytes ${start}-${end}/${body.byteLength}`,
+            'Content-Length': String(end - start + 1),
+        },
+    });
+}
+
+// Fingerprinted assets and content-addressed audio never change
+async function cacheFirst(event) {
+    const cached = await caches.match(event.request.url, MATCH_OPTIONS);
+    if (cached) {
+        return rangeResponse(event.request, cached);
+    }
+    const request = event.request.headers.has('Range') ? new Request(event.request.url) : event.request;
+    const response = await fetch(request);
+    event.waitUntil(putRuntime(event.request.url, response.clone()));
+    return rangeResponse(event.request, response);
+}
+
+// Offline vote: the vote is lost, but the story continues along the chosen branch
+async function submitChoice(event) {
+    const form = await event.request.clone().formData();
+    try {
+        return await fetch(event.request);
+    } catch (error) {
+        return Response.redirect(`/story/${encodeURIComponent(form.get('choice_id'))}`, 303);
+    }
+}
+
+self.addEventListener('fetch', event => {
+    const url = new URL(event.request.url);
+    if (event.request.method === 'POST' && url.pathname === '/submit_choice') {
+        event.respondWith(submitChoice(event));
+        return;
+    }
+    if (event.request.method !== 'GET') {
+        return;
+    }
+    if (url.origin !== self.location.origin) {
+        if (PRECACHE_URLS.includes(event.request.url) || url.hostname.startsWith('fonts.')) {
+            event.respondWith(staleWhileRevalidate(event));
+        }
+        return;
+    }
+    if (url.pathname.startsWith('/assets/') || /^\/audio\/[0-9a-f]{20}\.\w+$/.test(url.pathname)) {
+        event.respondWith(cacheFirst(event));
+    } else if (url.pathname === '/' || url.pathname.startsWith('/story/') || url.pathname.startsWith('/segments/')) {
+        event.respondWith(staleWhileRevalidate(event));
+    }
+});
+
+// Story pages post {type: 'prefetch', url: '/prefetch/<id>.json'} once they have loaded
+self.addEventListener('message', event => {
+    if (!event.data || event.data.type !== 'prefetch') {
+        return;
+    }
+    event.waitUntil((async () => {
+        const response = await fetch(event.data.url);
+        if (!response.ok) {
+            return;
+        }
+        const { urls } = await response.json();
+        const cache = await caches.open(RUNTIME_CACHE);
+        for (const url of urls) {
+            if (!(await cache.match(url, MATCH_OPTIONS))) {
+                await putRuntime(url, await fetch(url).catch(() => null));
+            }
+        }
+    })());
+});
@@ -0,0 +1,124 @@
+"""
+Local tests for the Flask app and its helpers, against the in-memory stand-ins
+in benchmarks/ (no MongoDB, no Google credentials). Run from the repo root:
+
+    python -m pytest test_app.py
+"""
+
+import threading
+import unittest
+
+import admission
+import audio_profiles
+import metrics
+from benchmarks import harness
+from benchmarks.standins import FakeTTSClient, InMemoryCollection, fixed_latency
+
+radioquest = harness.load_app()
+
+
+def observations(histogram, *labels):
+    counts, _ = histogram.labels(*labels).snapshot()
+    return sum(counts)
+
+
+class OrchestratorStepTimingTest(unittest.TestCase):
+    def setUp(self):
+        self.original_collection = radioquest.stories_collection
+
+    def tearDown(self):
+        radioquest.stories_collection = self.original_collection
+
+    def test_interleaved_workflows_each_observe_their_own_steps(self):
+        # Both fetches are inside find_one at once, so their "started" marks overlap
+        barrier = threading.Barrier(2, timeout=5)
+        radioquest.stories_collection = InMemoryCollection(
+            documents=[dict(story, _id=story_id) for story_id, story in radioquest.MOCK_STORIES.items()],
+            latency=lambda: barrier.wait() and 0.0)
+        story_ids = list(radioquest.MOCK_STORIES)[:2]
+        before = observations(metrics.AGENT_STEP_LATENCY, "StoryAgent", "fetch_story", "success")
+        errors = []
+
+        def fetch(story_id):
+            try:
+                radioquest.orchestrator.orchestrate_story_fetch(story_id)
+            except Exception as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=fetch, args=(story_id,)) for story_id in story_ids]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(errors, [])
+        self.assertEqual(observations(metrics.AGENT_STEP_LATENCY, "StoryAgent", "fetch_story", "success"), before + 2)
+
+
+class ClassroomAdmissionTest(unittest.TestCase):
+    def setUp(self):
+        self.original = (radioquest.tts_client, radioquest.tts_admission, radioquest.tts_jobs)
+        radioquest.tts_client = FakeTTSClient(latency=fixed_latency(0.05), payload_bytes=256)
+        # Production defaults, not the harness's unlimited ones
+        radioquest.tts_admission = admission.AdmissionController()
+        radioquest.tts_jobs = admission.SynthesisQueue(radioquest.tts_admission)
+        harness.reset_caches(radioquest)
+
+    def tearDown(self):
+        radioquest.tts_client, radioquest.tts_admission, radioquest.tts_jobs = self.original
+        harness.reset_caches(radioquest)
+
+    def test_class_behind_one_address_gets_every_source(self):
+        # Save-Data classrooms get opus, whose <audio> also offers the low MP3 fallback
+        story_id = next(iter(radioquest.MOCK_STORIES))
+        segment = radioquest.load_segment(story_id)
+        filenames = [radioquest.story_audio_filename(segment, profile)
+                     for profile in audio_profiles.fallback_chain(audio_profiles.PROFILES["opus"])]
+        self.assertEqual(len(filenames), 2)
+        client = radioquest.app.test_client()
+        barrier = threading.Barrier(40, timeout=5)
+        pages = []
+
+        def pupil():
+            barrier.wait()
+            response = client.get(f"/story/{story_id}?profile=opus", headers={"X-Forwarded-For": "203.0.113.7"})
+            pages.append((response.status_code, response.get_data(as_text=True)))
+
+        threads = [threading.Thread(target=pupil) for _ in range(40)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(pages), 40)
+        for status, html in pages:
+            self.assertEqual(status, 200)
+            for filename in filenames:
+                self.assertIn(filename, html)
+
+
+class StoryPackETagTest(unittest.TestCase):
+    def get(self, client, url, **headers):
+        response = client.get(url, headers=headers)
+        response.close()
+        return response
+
+    def test_delta_pack_does_not_revalidate_against_full_pack(self):
+        client = radioquest.app.test_client()
+        story_id = next(iter(radioquest.MOCK_STORIES))
+        full = self.get(client, f"/packs/{story_id}.zip")
+        self.assertEqual(full.status_code, 200)
+        self.assertIn("Save-Data", full.headers["Vary"])
+        version = full.headers["X-RadioQuest-Pack-Version"]
+
+        delta = self.get(client, f"/packs/{story_id}.zip?since={version}", **{"If-None-Match": full.headers["ETag"]})
+        self.assertEqual(delta.status_code, 200)
+        self.assertNotEqual(delta.headers["ETag"], full.headers["ETag"])
+        low = self.get(client, f"/packs/{story_id}.zip?profile=low", **{"If-None-Match": full.headers["ETag"]})
+        self.assertEqual(low.status_code, 200)
+
+        again = self.get(client, f"/packs/{story_id}.zip", **{"If-None-Match": full.headers["ETag"]})
+        self.assertEqual(again.status_code, 304)
+        self.assertIn("Save-Data", again.headers["Vary"])
+
+
+if __name__ == "__main__":
+    unittest.main()
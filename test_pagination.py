@@ -0,0 +1,51 @@
+"""
+Tests for pagination.py: the Mongo and in-memory regex backends must rank, page
+and continue cursors identically. Run from the repo root:
+
+    python -m pytest test_pagination.py
+"""
+
+import unittest
+
+import pagination
+from benchmarks.standins import InMemoryCollection
+
+DOCUMENTS = [
+    {"_id": "s1", "title": "The a.b trail", "content": "Koko follows the path."},
+    {"_id": "s2", "title": "The axb trail", "content": "Not a literal match."},
+    {"_id": "s3", "title": "Bridge", "content": "Mention of a.b in the story (twice: a.b)."},
+    {"_id": "s4", "title": "Smoke (rising)", "content": "Koko sees smoke."},
+    {"_id": "s5", "title": "River", "content": "A dot: a.b, and a bracket ( too."},
+]
+
+
+def pages(hits_for, query, limit):
+    """Every page of a search, following cursors; returns the _ids page by page"""
+    collected, after = [], None
+    while True:
+        results, cursor = pagination.take_page(hits_for(after), limit, query, "regex")
+        collected.append([result["_id"] for result in results])
+        if cursor is None:
+            return collected
+        after = pagination.decode_cursor(cursor, query, "regex")
+
+
+class RegexBackendsTest(unittest.TestCase):
+    def setUp(self):
+        self.collection = InMemoryCollection(documents=DOCUMENTS)
+
+    def assertBackendsAgree(self, query, expected):
+        mongo = pages(lambda after: pagination.iter_regex_hits(self.collection, query, after, 2), query, 1)
+        in_memory = pages(lambda after: pagination.iter_list_hits(DOCUMENTS, query, after), query, 1)
+        self.assertEqual(mongo, in_memory)
+        self.assertEqual([doc_id for page in mongo for doc_id in page], expected)
+
+    def test_dot_matches_only_a_literal_dot(self):
+        self.assertBackendsAgree("a.b", ["s1", "s3", "s5"])
+
+    def test_unbalanced_parenthesis_is_searched_as_text(self):
+        self.assertBackendsAgree("(", ["s4", "s3", "s5"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,50 @@
+"""
+RadioQuest Versioning - content hashes for story segments
+A segment's version changes whenever anything that is rendered from it changes,
+so caches keyed by version never need explicit invalidation.
+
+The corpus as a whole is versioned by a counter document in corpus_meta that
+every writer of searchable fields bumps (bump_corpus_version), so checking
+whether search results may have changed costs one find_one instead of a scan.
+"""
+
+import hashlib
+import json
+from typing import Any, Dict, Optional
+
+# Fields that end up in rendered pages, audio or exported packs
+VERSIONED_FIELDS = ("_id", "title", "content", "text", "choices", "audio_url", "audio_sources",
+                   "related")
+
+
+def content_hash(value: Any, length: int = 16) -> str:
+    """Stable short hash of any JSON-serializable value"""
+    payload = json.dumps(value, sort_keys=True, default=str, separators=(",", ":"))
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:length]
+
+
+def segment_version(segment: Dict[str, Any]) -> str:
+    """Version of a segment derived from the fields that are rendered from it"""
+    return content_hash({field: segment.get(field) for field in VERSIONED_FIELDS})
+
+
+# --- Corpus change counter ---
+CORPUS_META_COLLECTION = "corpus_meta"
+
+
+def bump_corpus_version(collection):
+    """Call after changing the title, content or text of segments in `collection`"""
+    collection.database[CORPUS_META_COLLECTION].update_one(
+        {"_id": collection.name},
+        {"$inc": {"version": 1}, "$currentDate": {"updated_at": True}},
+        upsert=True,
+    )
+
+
+def corpus_counter(collection) -> Optional[int]:
+    """The change counter of `collection`, None when no writer has bumped it yet"""
+    database = getattr(collection, "database", None)
+    if database is None:
+        return None
+    meta = database[CORPUS_META_COLLECTION].find_one({"_id": collection.name}, {"version": 1})
+    return meta.get("version") if meta else None